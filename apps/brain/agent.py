@@ -1,24 +1,73 @@
 import os
-from typing import List, Optional
-from langchain_groq import ChatGroq
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from langchain_core.messages import ToolMessage, AIMessage, message_chunk_to_message
 from dotenv import load_dotenv
 
 # Import Tools
 from apps.brain.tools import tools
+from apps.brain.warmup import timed
+from apps.brain.metrics import span, histogram
+from apps.brain.prefetch import Prefetch, PREFETCH_ENABLED
+from apps.brain.llm import build_llm, LLMUnavailable
+from apps.brain.conversation import (ConversationContext, HISTORY_TOKEN_BUDGET, estimate_tokens,
+                                     compact_tool_schema, schema_tokens, select_tools)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize LLM
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-).bind_tools(tools)
+# Bind only the tools the guest's words point at, as trimmed-down schemas
+TOOL_SELECTION = os.getenv("BRAIN_TOOL_SELECTION", "1") != "0"
+COMPACT_TOOL_SCHEMAS = os.getenv("BRAIN_COMPACT_TOOL_SCHEMAS", "1") != "0"
+
+# Tool loop limits per guest turn
+MAX_TOOL_ROUNDS = int(os.getenv("BRAIN_MAX_TOOL_ROUNDS", "3"))
+MAX_TOOL_CALLS_PER_TURN = int(os.getenv("BRAIN_MAX_TOOL_CALLS", "8"))
+TOOL_TIMEOUT = float(os.getenv("BRAIN_TOOL_TIMEOUT", "10"))  # seconds, per call
+# Calls of one tool in flight at once, timed-out ones included until they return,
+# so a hung backend ties up at most this many _tool_pool workers
+TOOL_MAX_INFLIGHT = int(os.getenv("BRAIN_TOOL_MAX_INFLIGHT", "4"))
+
+# Tool calls from one LLM response run side by side on this pool
+_tool_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="brain-tool")
+_tool_slots = {}
+_tool_slots_lock = threading.Lock()
+
+TOOL_LIMIT_REPLY = "I'm sorry, that took more steps than I can handle right now. Could you ask me again more simply?"
+LLM_UNAVAILABLE_REPLY = "I'm sorry, I'm having trouble answering right now. Please try again in a moment, or ask a member of staff."
+
+# LLM client (primary + fallbacks, see llm.py) is built on first use (or by the background warm-up)
+_llm = None
+_llm_lock = threading.Lock()
+# (model, tool names, compact) -> (model with those tools bound, their schema tokens)
+_bound = {}
+
+def get_llm():
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            with timed("llm"):
+                _llm = build_llm()
+        return _llm
+
+
+def bind_tools(model, tool_list, compact=COMPACT_TOOL_SCHEMAS):
+    """`model` with `tool_list` bound, cached per tool set; models without bind_tools are returned as is."""
+    key = (id(model), tuple(t.name for t in tool_list), compact)
+    bound = _bound.get(key)
+    if bound is None:
+        schemas = [compact_tool_schema(t) for t in tool_list] if compact else list(tool_list)
+        if hasattr(model, "bind_tools"):
+            # The entry holds on to `model` too, so its id can't be reused by another one
+            bound = (model.bind_tools(schemas), schema_tokens(schemas), model)
+        else:
+            bound = (model, 0, model)
+        with _llm_lock:
+            bound = _bound.setdefault(key, bound)
+    return bound[:2]
 
 # System Prompt (Persona)
 SYSTEM_PROMPT = """You are the Hotel Receptionist. You are helpful, warm, and professional. 
@@ -28,50 +77,217 @@ If the user asks about hotel policies (time, wifi, pool), use the 'lookup_hotel_
 Keep responses concise."""
 
 
+def _timed_tool_call(tool_func, tool_args):
+    with span(f"tool.{tool_func.name}"):
+        return tool_func.invoke(tool_args)
+
+
+def _submit_tool(tool_func, tool_args):
+    """Start a tool call on _tool_pool, or None if that tool already has TOOL_MAX_INFLIGHT calls running."""
+    with _tool_slots_lock:
+        slot = _tool_slots.setdefault(tool_func.name, threading.BoundedSemaphore(TOOL_MAX_INFLIGHT))
+    if not slot.acquire(blocking=False):
+        return None
+    # Copy the context so the tool's span lands in this request's trace
+    context = contextvars.copy_context()
+    future = _tool_pool.submit(context.run, _timed_tool_call, tool_func, tool_args)
+    future.add_done_callback(lambda _: slot.release())
+    return future
+
+
 class Agent:
-    def __init__(self):
-        self.messages = [SystemMessage(content=SYSTEM_PROMPT)]
-        self.tool_map = {t.name: t for t in tools}
-        self.model = llm
+    def __init__(self, history_token_budget=HISTORY_TOKEN_BUDGET, model=None, tool_list=None, context=None,
+                 tool_selection=TOOL_SELECTION, compact_schemas=COMPACT_TOOL_SCHEMAS, prefetch=PREFETCH_ENABLED):
+        self.context = context or ConversationContext(SYSTEM_PROMPT, history_token_budget)
+        self.tool_map = {t.name: t for t in (tool_list or tools)}
+        self._model = model
+        self.tool_selection = tool_selection
+        self.compact_schemas = compact_schemas
+        self.turn_tools = list(self.tool_map)
+        self.last_prompt_tokens = 0
+        self.prefetch = prefetch
+        self._prefetch = None
 
-    def process_message(self, text: str):
+    @property
+    def messages(self) -> list:
+        """The prompt as the LLM will see it next."""
+        return self.context.prompt()
+
+    @property
+    def model(self):
+        """The LLM with this turn's tools bound."""
+        model = self._model if self._model is not None else get_llm()
+        return bind_tools(model, [self.tool_map[n] for n in self.turn_tools], self.compact_schemas)[0]
+
+    def history_bytes(self) -> int:
+        """Approximate memory held by this conversation."""
+        return self.context.nbytes()
+
+    def _start_turn(self, text):
+        # System prompt + rolling summary + recent turns, older tool results cut down
+        self.context.start_turn(text)
+        names = list(self.tool_map)
+        self.turn_tools = select_tools(text, names) if self.tool_selection else names
+
+    def _start_prefetch(self, text):
+        """Start the tool calls this turn will probably need while the LLM is still deciding."""
+        self._prefetch = Prefetch(self.tool_map) if self.prefetch else None
+        if self._prefetch is not None:
+            self._prefetch.start(text, self.turn_tools)
+
+    def _end_prefetch(self):
+        if self._prefetch is not None:
+            self._prefetch.close()
+            self._prefetch = None
+
+    def _prompt(self):
+        """Prompt for the next LLM call, with its size recorded."""
+        model = self._model if self._model is not None else get_llm()
+        tool_tokens = bind_tools(model, [self.tool_map[n] for n in self.turn_tools], self.compact_schemas)[1]
+        messages = self.context.prompt()
+        self.last_prompt_tokens = sum(estimate_tokens(m) for m in messages) + tool_tokens
+        return messages
+
+    def _record_usage(self, response):
+        # The provider's count when it reports one, else our estimate
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage.get("input_tokens"):
+            self.last_prompt_tokens = usage["input_tokens"]
+        histogram("llm.prompt_tokens", unit="tokens").record(self.last_prompt_tokens)
+
+    def _run_tool_calls(self, tool_calls, budget):
         """
-        Processes a user message and returns a stream of tokens/updates.
+        Execute one round of tool calls concurrently and append their results
+        in the original order. Calls beyond `budget` are not run. Every call
+        still gets a ToolMessage, since the provider rejects unanswered ones.
+        Each call gets TOOL_TIMEOUT seconds from its start; one that is still
+        queued by then is cancelled, a running one is abandoned (it keeps its
+        tool's in-flight slot until it returns). Returns how many calls were executed.
         """
-        # Force string to avoid Pydantic validation errors
-        safe_text = str(text)
-        
-        # Optimize History: Keep System Prompt + Last 10 messages
-        if len(self.messages) > 11:
-            # Always keep index 0 (System Prompt)
-            self.messages = [self.messages[0]] + self.messages[-10:]
-            
-        self.messages.append(HumanMessage(content=safe_text))
-        
-        # 1. Get initial response from LLM
-        response = self.model.invoke(self.messages)
-        self.messages.append(response)
-
-        # Handle Tool Calls
-        if response.tool_calls:
-            for tool_call in response.tool_calls:
-                tool_name = tool_call["name"]
-                tool_args = tool_call["args"]
-                tool_func = self.tool_map[tool_name]
-                
-                # Execute Tool
+        calls = []  # (future, deadline) or (None, error text)
+        for i, tool_call in enumerate(tool_calls):
+            tool_func = self.tool_map.get(tool_call["name"])
+            if tool_func is None:
+                calls.append((None, f"Error: unknown tool {tool_call['name']}"))
+                continue
+            if i >= budget:
+                calls.append((None, "Error: tool budget for this turn exhausted"))
+                continue
+            # Already running if the prefetch guessed this call
+            future = self._prefetch.claim(tool_call["name"], tool_call["args"]) if self._prefetch else None
+            if future is None:
+                future = _submit_tool(tool_func, tool_call["args"])
+            if future is None:
+                calls.append((None, "Error: tool is busy, try again shortly"))
+                continue
+            calls.append((future, time.monotonic() + TOOL_TIMEOUT))
+
+        for tool_call, (future, outcome) in zip(tool_calls, calls):
+            if future is None:
+                tool_output = outcome
+            else:
                 try:
-                    tool_result = tool_func.invoke(tool_args)
-                    tool_output = str(tool_result)
+                    tool_output = str(future.result(timeout=max(0.0, outcome - time.monotonic())))
+                except FutureTimeout:
+                    future.cancel()
+                    logging.warning(f"Tool {tool_call['name']} timed out after {TOOL_TIMEOUT}s")
+                    tool_output = "Error: tool timed out"
                 except Exception as e:
                     tool_output = f"Error: {e}"
 
-                # Append Tool result
-                self.messages.append(ToolMessage(tool_call_id=tool_call["id"], content=tool_output))
+            # Append Tool result
+            self.context.append(ToolMessage(tool_call_id=tool_call["id"], content=tool_output))
+
+        return sum(1 for future, _ in calls if future is not None)
+
+    def _close_tool_calls(self, tool_calls):
+        """Answer tool calls we refuse to run so the history stays valid."""
+        for tool_call in tool_calls:
+            self.context.append(ToolMessage(tool_call_id=tool_call["id"], content="Error: tool limit reached"))
+        self.context.append(AIMessage(content=TOOL_LIMIT_REPLY))
+
+    def record_turn(self, text: str, reply: str):
+        """Add a turn that was answered without the LLM, so later turns still see it."""
+        self._start_turn(text)
+        self.context.append(AIMessage(content=reply))
+
+    def process_message(self, text: str):
+        """
+        Processes a user message and returns the final reply text.
+        """
+        self._start_turn(text)
+        self._start_prefetch(text)
+        try:
+            return self._tool_loop()
+        except LLMUnavailable as e:
+            return self._give_up(e)
+        finally:
+            self._end_prefetch()
+
+    def _give_up(self, error):
+        """Every LLM backend failed or ran out of time: apologize rather than keep the guest waiting."""
+        logging.error(f"LLM unavailable: {error}")
+        self.context.append(AIMessage(content=LLM_UNAVAILABLE_REPLY))
+        return LLM_UNAVAILABLE_REPLY
+
+    def _tool_loop(self):
+        calls_left = MAX_TOOL_CALLS_PER_TURN
+
+        for depth in range(MAX_TOOL_ROUNDS + 1):
+            messages = self._prompt()
+            with span("llm.invoke"):
+                response = self.model.invoke(messages)
+            self._record_usage(response)
+            self.context.append(response)
+            if not response.tool_calls:
+                return response.content
+
+            # Handle Tool Calls, then re-invoke the LLM with their results
+            if depth == MAX_TOOL_ROUNDS or calls_left <= 0:
+                break
+            calls_left -= self._run_tool_calls(response.tool_calls, calls_left)
+
+        self._close_tool_calls(response.tool_calls)
+        return TOOL_LIMIT_REPLY
+
+    def _stream_reply(self):
+        """Stream one LLM response, yielding text deltas; returns the assembled message."""
+        gathered = None
+        messages = self._prompt()
+        with span("llm.stream"):
+            for chunk in self.model.stream(messages):
+                gathered = chunk if gathered is None else gathered + chunk
+                if chunk.content:
+                    yield chunk.content
+        message = message_chunk_to_message(gathered) if gathered is not None else AIMessage(content="")
+        self._record_usage(message)
+        self.context.append(message)
+        return message
+
+    def stream_message(self, text: str):
+        """
+        Same as process_message, but yields the reply text as it is generated
+        so speech synthesis can start before the LLM has finished.
+        """
+        self._start_turn(text)
+        self._start_prefetch(text)
+        try:
+            yield from self._stream_loop()
+        except LLMUnavailable as e:
+            yield self._give_up(e)
+        finally:
+            self._end_prefetch()
+
+    def _stream_loop(self):
+        calls_left = MAX_TOOL_CALLS_PER_TURN
+
+        for depth in range(MAX_TOOL_ROUNDS + 1):
+            response = yield from self._stream_reply()
+            if not response.tool_calls:
+                return
+            if depth == MAX_TOOL_ROUNDS or calls_left <= 0:
+                break
+            calls_left -= self._run_tool_calls(response.tool_calls, calls_left)
 
-            # Re-invoke LLM to generate final answer
-            final_response = llm.invoke(self.messages)
-            self.messages.append(final_response)
-            return final_response.content
-        
-        return response.content
+        self._close_tool_calls(response.tool_calls)
+        yield TOOL_LIMIT_REPLY
@@ -0,0 +1,93 @@
+"""
+Booking contention stress test.
+
+Many threads race to reserve random date ranges in a small hotel, so most
+attempts collide. Afterwards every pair of bookings is checked for overlap;
+the run fails loudly if any room was double-booked.
+
+    python apps/brain/bench/booking_bench.py --rooms 20 --threads 32 --attempts 200
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from apps.brain.database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=200, help="per thread")
+    parser.add_argument("--days", type=int, default=60, help="length of the booking window")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = Database(os.path.join(folder, "stress.db"))
+        conn = db._get_conn()
+        conn.execute("DELETE FROM rooms")
+        conn.executemany("INSERT INTO rooms (number, price) VALUES (?, 100.0)",
+                         [(str(100 + i),) for i in range(args.rooms)])
+        conn.commit()
+
+        first_day = date.today() + timedelta(days=1)
+        results = {"ok": 0, "rejected": 0}
+        latencies = []
+        lock = threading.Lock()
+        start_gate = threading.Barrier(args.threads)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            ok = rejected = 0
+            local = []
+            start_gate.wait()
+            for _ in range(args.attempts):
+                check_in = first_day + timedelta(days=rng.randrange(args.days))
+                check_out = check_in + timedelta(days=rng.randint(1, 4))
+                room = str(100 + rng.randrange(args.rooms))
+                with Timer() as t:
+                    success, _ = db.book_room(room, f"guest-{seed}", check_in.isoformat(), check_out.isoformat())
+                local.append(t.ms)
+                if success:
+                    ok += 1
+                else:
+                    rejected += 1
+            with lock:
+                results["ok"] += ok
+                results["rejected"] += rejected
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        with Timer() as total:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        double_booked = conn.execute(
+            """
+            SELECT count(*) FROM bookings a JOIN bookings b
+              ON a.room_id = b.room_id AND a.id < b.id
+             AND a.check_in < b.check_out AND a.check_out > b.check_in
+            """
+        ).fetchone()[0]
+        stored = conn.execute("SELECT count(*) FROM bookings").fetchone()[0]
+        db.close()
+
+    attempts = results["ok"] + results["rejected"]
+    print(summarize("book_room attempts", latencies, total.elapsed))
+    print(f"attempts={attempts} booked={results['ok']} rejected={results['rejected']} stored={stored}")
+    print(f"bookings/s={results['ok'] / total.elapsed:.1f}  double bookings={double_booked}")
+    if double_booked or stored != results["ok"]:
+        print("FAILED: lost or double-claimed bookings", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
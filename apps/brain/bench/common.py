@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import random
+
+# Allow running bench scripts directly: `python apps/brain/bench/<script>.py`
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (0 if empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(label, samples_ms, elapsed_s=None):
+    """One-line latency summary, optionally with throughput."""
+    line = (f"{label:<34} n={len(samples_ms):<5} "
+            f"p50={percentile(samples_ms, 50):8.2f}ms "
+            f"p95={percentile(samples_ms, 95):8.2f}ms "
+            f"p99={percentile(samples_ms, 99):8.2f}ms")
+    if elapsed_s:
+        line += f"  {len(samples_ms) / elapsed_s:8.1f} req/s"
+    return line
+
+
+def jitter(mean_ms, rng=random):
+    """Latency sample in seconds: gaussian around `mean_ms` (25% spread), clipped at 0. For a tail use fakes.Latency."""
+    return max(0.0, rng.gauss(mean_ms, mean_ms * 0.25)) / 1000.0
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+    @property
+    def ms(self):
+        return self.elapsed * 1000.0
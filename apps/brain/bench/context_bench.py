@@ -0,0 +1,133 @@
+"""
+Prompt size and turn latency over long scripted conversations, with the
+whole history sent every call (trimmed only by the token budget, every
+tool bound with its full schema) vs. the managed context (rolling
+summary of older turns, stale tool results cut down, compact schemas of
+just the tools the turn's words point at).
+
+Tools run for real against a fresh database; the chat model is scripted
+and takes `--llm-ms` plus `--ms-per-token` for every prompt token, the
+way prefill time grows with the prompt.
+
+    python apps/brain/bench/context_bench.py --conversations 5 --llm-ms 150 --ms-per-token 0.15
+"""
+import os
+import argparse
+import tempfile
+import statistics
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+
+# Before any apps.brain import: the tools open the database at import time, and the script books rooms
+FOLDER = tempfile.mkdtemp(prefix="brain-context-")
+os.environ["BRAIN_DB_PATH"] = os.path.join(FOLDER, "hotel.db")
+
+from fakes import ScriptedChatModel, FakeEmbeddings, tool_call
+from apps.brain import knowledge_base, metrics
+from apps.brain.agent import Agent, SYSTEM_PROMPT
+from apps.brain.conversation import ConversationContext
+
+# (guest line, LLM responses for that turn): a tool round and its answer, or just an answer
+CONVERSATION = [
+    ("Hi there, do you have any rooms available tonight?",
+     [[tool_call("check_room_availability")],
+      "Good evening! Tonight we have several rooms free, from a cosy standard room at $120 up to our "
+      "suites. Would you like me to tell you more about any of them?"]),
+    ("Tell me about room 104.",
+     [[tool_call("describe_specific_room", {"room_number": "104"})],
+      "Room 104 is one of our quietest rooms, facing the inner garden, with a king bed and a reading nook. "
+      "It's a lovely choice if you'd like a peaceful night."]),
+    ("And what is room 102 like?",
+     [[tool_call("describe_specific_room", {"room_number": "102"})],
+      "Room 102 is a bright corner room with a view over the square and a little more space to spread out. "
+      "Guests love the morning light there."]),
+    ("When is the pool open?",
+     [[tool_call("lookup_hotel_policy", {"query": "pool hours"})],
+      "The Grand Pool is open from 6 AM to 10 PM and it's heated. Do bring a swim cap, they're required."]),
+    ("What other facilities does the hotel have?",
+     [[tool_call("get_hotel_amenities")],
+      "Besides the pool there's Mendl's Patisserie in the lobby, open around the clock, the Zero Bar with "
+      "live piano every evening at 8, and the rooftop Observatory for star-gazing."]),
+    ("Is breakfast served in the restaurant?",
+     [[tool_call("lookup_hotel_policy", {"query": "breakfast hours"})],
+      "Breakfast is served every morning in the restaurant. I can note a time for you if you like."]),
+    ("How much is room 101 per night?",
+     [[tool_call("describe_specific_room", {"room_number": "101"})],
+      "Room 101 is $150 per night, a comfortable standard room close to the lift."]),
+    ("Great, please book room 102 for me. My name is Anna Lee.",
+     [[tool_call("book_room", {"room_number": "102", "guest_name": "Anna Lee"})],
+      "All set, Anna! Room 102 is booked for you tonight. Is there anything else I can help with?"]),
+    ("What's the wifi password?",
+     [[tool_call("lookup_hotel_policy", {"query": "wifi password"})],
+      "You'll find the Wi-Fi details on the card in your room; the network is the hotel's name and the "
+      "password is printed just below it."]),
+    ("Can I leave my bags here after I check out?",
+     [[tool_call("lookup_hotel_policy", {"query": "luggage storage after checkout"})],
+      "Of course, reception can keep your bags for the day after check-out, just ask the concierge."]),
+    ("Thank you, that's very kind.",
+     ["You're very welcome! Enjoy your stay with us."]),
+    ("Sorry, which room did I book again?",
+     ["You booked room 102, the bright corner room overlooking the square, for tonight."]),
+]
+
+SCRIPT = [step for _, steps in CONVERSATION for step in steps]
+
+
+def legacy_agent(model):
+    """Everything on the wire: history trimmed by the token budget only, all tools with full schemas."""
+    context = ConversationContext(SYSTEM_PROMPT, recent_turns=0, stale_tool_chars=0, summary_tokens=0)
+    return Agent(model=model, context=context, tool_selection=False, compact_schemas=False)
+
+
+def run(make_agent, args):
+    tokens = metrics.histogram("llm.prompt_tokens", unit="tokens")
+    per_turn = [[] for _ in CONVERSATION]
+    calls, latencies, bound = [], [], []
+    remembered = 0
+    for _ in range(args.conversations):
+        agent = make_agent(ScriptedChatModel(SCRIPT, args.llm_ms, ms_per_token=args.ms_per_token))
+        for turn, (text, _) in enumerate(CONVERSATION):
+            count, total = tokens.count, tokens.total_ms
+            with Timer() as t:
+                agent.process_message(text)
+            latencies.append(t.ms)
+            per_turn[turn].append((tokens.total_ms - total) / (tokens.count - count))
+            calls.extend([(tokens.total_ms - total) / (tokens.count - count)] * (tokens.count - count))
+            bound.append(len(agent.turn_tools))
+        # Is the booking from turn 8 still somewhere in what the model sees?
+        remembered += any("Anna Lee" in str(m.content) or "Anna Lee" in str(getattr(m, "tool_calls", ""))
+                          for m in agent.messages)
+    return per_turn, calls, latencies, bound, remembered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=150.0, help="fixed time per LLM call")
+    parser.add_argument("--ms-per-token", type=float, default=0.15, help="extra LLM time per prompt token")
+    args = parser.parse_args()
+
+    knowledge_base._embedding_function = FakeEmbeddings(0.0)
+    knowledge_base.CHROMA_DB_DIR = os.path.join(FOLDER, "chroma_db")
+    knowledge_base.get_vector_store()
+
+    results = {}
+    for label, make_agent in (("full history", legacy_agent), ("managed", lambda model: Agent(model=model))):
+        per_turn, calls, latencies, bound, remembered = run(make_agent, args)
+        results[label] = per_turn
+        print(f"\n{label}: {len(CONVERSATION)} turns x {args.conversations} conversations")
+        print(f"  prompt tokens per LLM call: mean={statistics.mean(calls):.0f} max={max(calls):.0f}  "
+              f"tools bound per turn: {statistics.mean(bound):.1f}  "
+              f"booking still in context: {remembered}/{args.conversations}")
+        print(summarize("  turn latency", latencies))
+
+    labels = list(results)
+    print("\nmean prompt tokens per LLM call, by turn:")
+    print("  turn  " + "".join(f"{label:>14}" for label in labels))
+    for turn in range(len(CONVERSATION)):
+        print(f"  {turn + 1:>4}  " + "".join(f"{statistics.mean(results[label][turn]):>14.0f}" for label in labels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Database throughput under concurrent mixed load.
+
+Builds a temporary hotel with --rooms rooms and runs availability / detail /
+booking operations from many threads, first with a fresh sqlite3 connection
+per call (the old access pattern) and then through Database's pooled,
+WAL-mode per-thread connections.
+
+    python apps/brain/bench/db_bench.py --rooms 10000 --threads 16 --ops 4000
+"""
+import os
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from apps.brain.database import Database
+
+
+def seed(db, rooms):
+    conn = db._get_conn()
+    conn.execute("DELETE FROM rooms")
+    conn.executemany(
+        "INSERT INTO rooms (number, status, price, description) VALUES (?, 'AVAILABLE', ?, ?)",
+        [(str(1000 + i), 80.0 + i % 300, f"Room {i} description " * 4) for i in range(rooms)],
+    )
+    # A mostly-full hotel makes the availability query selective
+    conn.execute("UPDATE rooms SET status = 'OCCUPIED' WHERE id % 20 != 0")
+    conn.commit()
+
+
+class PerCallConnections:
+    """The old pattern: connect, run one query, close."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def check_availability(self):
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute("SELECT number, type, price FROM rooms WHERE status = 'AVAILABLE'").fetchall()
+        conn.close()
+        return rows
+
+    def get_room_details(self, number):
+        conn = sqlite3.connect(self.path)
+        row = conn.execute("SELECT number, type, price, description, status FROM rooms WHERE number = ?",
+                           (number,)).fetchone()
+        conn.close()
+        return row
+
+    def book_room(self, number, guest):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            row = conn.execute("SELECT id FROM rooms WHERE number = ? AND status = 'AVAILABLE'", (number,)).fetchone()
+            if row:
+                conn.execute("INSERT INTO bookings (guest_name, room_id) VALUES (?, ?)", (guest, row[0]))
+                conn.execute("UPDATE rooms SET status = 'OCCUPIED' WHERE id = ?", (row[0],))
+                conn.commit()
+        finally:
+            conn.close()
+
+
+def hammer(target, rooms, threads, ops):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        local = []
+        for _ in range(ops // threads):
+            number = str(1000 + rng.randrange(rooms))
+            roll = rng.random()
+            with Timer() as t:
+                if roll < 0.3:
+                    target.check_availability()
+                elif roll < 0.95:
+                    target.get_room_details(number)
+                else:
+                    target.book_room(number, "Bench Guest")
+            local.append(t.ms)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    with Timer() as total:
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    return latencies, total.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=4000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for label in ("per-call connections", "pooled Database"):
+            path = os.path.join(folder, f"{label.split()[0]}.db")
+            db = Database(path)
+            seed(db, args.rooms)
+            target = PerCallConnections(path) if label.startswith("per-call") else db
+            latencies, elapsed = hammer(target, args.rooms, args.threads, args.ops)
+            print(summarize(label, latencies, elapsed))
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Drive the brain Dispatcher with hundreds of interleaved requests against
+stubbed LLM / STT / TTS / OCR backends and report throughput + tail latency.
+
+    python apps/brain/bench/dispatch_bench.py --requests 400 --concurrency 8
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, jitter
+from apps.brain.dispatcher import Dispatcher
+
+
+def stub_handlers(dispatcher, llm_ms, stt_ms, tts_ms, ocr_ms):
+    rng = random.Random(7)
+
+    def fake_llm(text):
+        time.sleep(jitter(llm_ms, rng))
+        return f"echo: {text}"
+
+    def fake_ocr(image):
+        time.sleep(jitter(ocr_ms, rng))
+        return "JOHN SMITH"
+
+    async def handle_text(data):
+        reply = await dispatcher.run_blocking(fake_llm, data["text"])
+        return {"type": "ASSISTANT_TEXT", "text": reply}
+
+    async def handle_audio(data):
+        await asyncio.sleep(jitter(stt_ms, rng))
+        reply = await dispatcher.run_blocking(fake_llm, "transcript")
+        await asyncio.sleep(jitter(tts_ms, rng))
+        return {"type": "TTS_AUDIO", "text": reply, "audio": ""}
+
+    async def handle_image(data):
+        text = await dispatcher.run_blocking(fake_ocr, data["image"])
+        reply = await dispatcher.run_blocking(fake_llm, text)
+        return {"type": "ASSISTANT_TEXT", "text": reply}
+
+    return {"PROCESS_TEXT": handle_text, "PROCESS_AUDIO": handle_audio, "PROCESS_IMAGE": handle_image}
+
+
+async def run(num_requests, concurrency, args):
+    rng = random.Random(42)
+    sent = {}
+    latencies = {}
+    done = asyncio.Event()
+
+    def write(line):
+        msg = json.loads(line)
+        kind, start = sent.pop(msg["id"])
+        latencies.setdefault(kind, []).append((time.perf_counter() - start) * 1000.0)
+        if not sent:
+            done.set()
+
+    dispatcher = Dispatcher({}, max_concurrency=concurrency, executor_workers=max(concurrency, 4), write=write)
+    dispatcher.handlers = stub_handlers(dispatcher, args.llm_ms, args.stt_ms, args.tts_ms, args.ocr_ms)
+    mix = ["PROCESS_TEXT"] * 6 + ["PROCESS_AUDIO"] * 3 + ["PROCESS_IMAGE"]
+
+    start = time.perf_counter()
+    for i in range(num_requests):
+        kind = rng.choice(mix)
+        payload = {"id": f"r{i}", "type": kind, "text": f"hello {i}", "audio": "", "image": ""}
+        sent[payload["id"]] = (kind, time.perf_counter())
+        dispatcher.submit(json.dumps(payload))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    dispatcher.shutdown()
+
+    print(f"\nconcurrency={concurrency}  total={elapsed:.2f}s")
+    every = [v for samples in latencies.values() for v in samples]
+    print(summarize("ALL", every, elapsed))
+    for kind, samples in sorted(latencies.items()):
+        print(summarize(kind, samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-ms", type=float, default=40)
+    parser.add_argument("--stt-ms", type=float, default=30)
+    parser.add_argument("--tts-ms", type=float, default=30)
+    parser.add_argument("--ocr-ms", type=float, default=60)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        asyncio.run(run(args.requests, concurrency, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Deterministic local stand-ins for the brain's remote backends."""
+import copy
+import json
+import time
+import random
+import asyncio
+import hashlib
+import itertools
+import threading
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from apps.brain.stt import StubSTT
+
+DIM = 384
+
+
+class Latency:
+    """
+    Latency distribution: gaussian around `mean_ms` (25% spread), and
+    `tail_pct` percent of calls take `tail_mult` times longer, the way a
+    provider occasionally stalls. Seeded, so runs are repeatable.
+    """
+
+    def __init__(self, mean_ms, tail_pct=0.0, tail_mult=4.0, seed=0):
+        self.mean_ms = mean_ms
+        self.tail_pct = tail_pct
+        self.tail_mult = tail_mult
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """One delay, in seconds."""
+        if not self.mean_ms:
+            return 0.0
+        with self._lock:
+            ms = max(0.0, self._rng.gauss(self.mean_ms, self.mean_ms * 0.25))
+            if self._rng.random() * 100 < self.tail_pct:
+                ms *= self.tail_mult
+        return ms / 1000.0
+
+    def sleep(self):
+        time.sleep(self.sample())
+
+    async def asleep(self):
+        await asyncio.sleep(self.sample())
+
+
+def tool_call(name, args=None, call_id=None):
+    return {"name": name, "args": args or {}, "id": call_id or f"call_{name}", "type": "tool_call"}
+
+
+class ScriptedChatModel:
+    """
+    Chat model that replays a fixed script of responses.
+
+    Each script entry is either reply text or a list of tool calls. When the
+    script runs out it starts over, so one model can serve many turns.
+    `latency_ms` (or a `Latency`) is slept on every call to stand in for the provider,
+    plus `ms_per_token` for every prompt token (messages and bound tool schemas).
+    """
+
+    def __init__(self, script, latency_ms=0.0, latency=None, ms_per_token=0.0):
+        self.script = script
+        self.latency_ms = latency_ms
+        self.latency = latency
+        self.ms_per_token = ms_per_token
+        self.tool_chars = 0
+        self._steps = itertools.cycle(script)
+        self.calls = 0
+
+    def bind_tools(self, tools):
+        """Same script (shared position), with the schemas' size counted as prompt."""
+        bound = copy.copy(self)
+        bound.tool_chars = sum(len(json.dumps(t if isinstance(t, dict) else convert_to_openai_tool(t))) for t in tools)
+        return bound
+
+    def prompt_tokens(self, messages):
+        chars = self.tool_chars + sum(len(str(m.content)) + len(str(getattr(m, "tool_calls", None) or ""))
+                                      for m in messages)
+        return chars // 4
+
+    def _next(self, messages=()):
+        self.calls += 1
+        if self.latency is not None:
+            self.latency.sleep()
+        elif self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        if self.ms_per_token:
+            time.sleep(self.ms_per_token * self.prompt_tokens(messages) / 1000.0)
+        step = next(self._steps)
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        return AIMessage(content="", tool_calls=step)
+
+    def invoke(self, messages, **kwargs):
+        return self._next(messages)
+
+    def stream(self, messages, **kwargs):
+        message = self._next(messages)
+        if message.tool_calls:
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": c["name"], "args": str(c["args"]).replace("'", '"'), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ])
+            return
+        for word in message.content.split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+
+class FaultyChatModel:
+    """
+    Wraps a chat model with provider faults: `error_pct` percent of calls
+    fail after `error_ms`, `hang_pct` percent first stall for `hang_s`
+    seconds (a request stuck on the provider's side). Seeded, so runs are
+    repeatable.
+    """
+
+    def __init__(self, model, error_pct=0.0, hang_pct=0.0, hang_s=30.0, error_ms=50.0, seed=0):
+        self.model = model
+        self.error_pct = error_pct
+        self.hang_pct = hang_pct
+        self.hang_s = hang_s
+        self.error_ms = error_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools):
+        bound = copy.copy(self)
+        if hasattr(self.model, "bind_tools"):
+            bound.model = self.model.bind_tools(tools)
+        return bound
+
+    def _fault(self):
+        with self._lock:
+            roll = self._rng.random() * 100
+        if roll < self.error_pct:
+            time.sleep(self.error_ms / 1000.0)
+            raise ConnectionError("provider error")
+        if roll < self.error_pct + self.hang_pct:
+            time.sleep(self.hang_s)
+
+    def invoke(self, messages, **kwargs):
+        self._fault()
+        return self.model.invoke(messages, **kwargs)
+
+    def stream(self, messages, **kwargs):
+        self._fault()
+        yield from self.model.stream(messages, **kwargs)
+
+
+class FakeEmbeddings:
+    """
+    Hash-seeded vectors; `cost_ms` per text plus `call_ms` per call simulate
+    encoder time. Calls run one at a time, like a CPU-bound model.
+    """
+
+    def __init__(self, cost_ms=1.0, call_ms=0.0):
+        self.cost_ms = cost_ms
+        self.call_ms = call_ms
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _encode(self, count):
+        with self._lock:
+            time.sleep((self.call_ms + self.cost_ms * count) / 1000.0)
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        return [rng.uniform(-1, 1) for _ in range(DIM)]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        self._encode(len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts += 1
+        self._encode(1)
+        return self._vector(text)
+
+
+def fake_audio(transcript, size):
+    """Audio bytes that ReplaySTT "hears" as `transcript`, padded to `size`."""
+    head = transcript.encode("utf-8") + b"\0"
+    return head + bytes(max(0, size - len(head)))
+
+
+class ReplaySTT(StubSTT):
+    """STT stand-in: transcribes `fake_audio` back to its text, anything else to the stub transcript."""
+    name = "replay"
+
+    def __init__(self, latency, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    async def _transcribe(self, audio):
+        await self.latency.asleep()
+        head = bytes(audio[:512]).split(b"\0", 1)
+        if len(head) == 2:
+            return head[0].decode("utf-8", "ignore")
+        return self.transcript
+
+
+def fake_tts(latency, bytes_per_char=200):
+    """EdgeTTS stand-in for PhraseCache / speak_stream: sleeps, returns MP3-sized bytes."""
+    async def synth(text, voice):
+        await latency.asleep()
+        return bytearray(len(text) * bytes_per_char)
+    return synth
+
+
+class FakeOCR:
+    """Tesseract stand-in for vision._ocr_image: sleeps and returns the next of `texts`."""
+
+    def __init__(self, latency, texts):
+        self.latency = latency
+        self._texts = itertools.cycle(texts)
+        self._lock = threading.Lock()
+
+    def __call__(self, image, timeout=None):
+        self.latency.sleep()
+        with self._lock:
+            return next(self._texts)
@@ -0,0 +1,145 @@
+"""
+Manager <-> brain transport throughput: newline-delimited JSON with base64
+media vs. length-prefixed binary frames, over a real stdio pipe.
+
+A child brain process runs the Dispatcher with an echo handler that takes
+the request's audio/image bytes and answers with a TTS-sized audio blob,
+so both directions carry multi-megabyte payloads.
+
+    python apps/brain/bench/framing_bench.py --requests 40 --sizes 1,4,8
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import threading
+import subprocess
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize
+from apps.brain.dispatcher import Dispatcher
+from apps.brain.framing import BinaryTransport, as_bytes, get_transport
+
+try:
+    import resource  # Unix only: child CPU time
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def child(transport_name, reply_bytes):
+    """The brain side: decode the request blob, reply with `reply_bytes` of audio."""
+    reply = bytes(reply_bytes)
+
+    async def echo(data):
+        size = len(as_bytes(data.get("audio") or data.get("image")))
+        return {"type": "TTS_AUDIO", "text": f"got {size} bytes", "audio": reply}
+
+    dispatcher = Dispatcher({"PROCESS_AUDIO": echo, "PROCESS_IMAGE": echo}, transport=get_transport(transport_name))
+    asyncio.run(dispatcher.serve())
+
+
+class JsonClient:
+    """What the manager does in JSON mode: base64 in, JSON line out, split lines, base64 back."""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    def send(self, message, blob_key, blob):
+        line = json.dumps({**message, blob_key: base64.b64encode(blob).decode("ascii")}) + "\n"
+        self.proc.stdin.write(line.encode("ascii"))
+        self.proc.stdin.flush()
+
+    def receive(self):
+        line = self.proc.stdout.readline()
+        if not line:
+            return None
+        message = json.loads(line)
+        message["audio"] = base64.b64decode(message["audio"])
+        return message
+
+
+class BinaryClient:
+    def __init__(self, proc):
+        self.proc = proc
+        self.transport = BinaryTransport()
+
+    def send(self, message, blob_key, blob):
+        for part in self.transport.encode_parts({**message, blob_key: blob}):
+            self.proc.stdin.write(part)
+        self.proc.stdin.flush()
+
+    def receive(self):
+        return self.transport.read(self.proc.stdout)
+
+
+def run(transport_name, payload_mb, requests, reply_mb):
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--child", transport_name, "--reply-mb", str(reply_mb)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env,
+    )
+    client = (BinaryClient if transport_name == "binary" else JsonClient)(proc)
+    payload = os.urandom(int(payload_mb * MB))
+    sent_at = {}
+
+    def writer():
+        for i in range(requests):
+            kind, key = ("PROCESS_AUDIO", "audio") if i % 2 else ("PROCESS_IMAGE", "image")
+            sent_at[f"r{i}"] = time.perf_counter()
+            client.send({"type": kind, "id": f"r{i}"}, key, payload)
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    latencies = []
+    received = 0
+    for _ in range(requests):
+        message = client.receive()
+        if message is None:
+            break
+        latencies.append((time.perf_counter() - sent_at[message["id"]]) * 1000)
+        received += len(message["audio"])
+    elapsed = time.perf_counter() - start
+    thread.join()
+
+    proc.stdin.close()
+    proc.wait()
+    moved = (requests * len(payload) + received) / MB
+    return latencies, elapsed, moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--sizes", default="1,4,8", help="request payload sizes in MB")
+    parser.add_argument("--reply-mb", type=float, default=0.5, help="TTS reply size in MB")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, int(args.reply_mb * MB))
+        return
+
+    for size in (float(s) for s in args.sizes.split(",")):
+        for transport_name in ("json", "binary"):
+            cpu_before = children_cpu()
+            latencies, elapsed, moved = run(transport_name, size, args.requests, args.reply_mb)
+            brain_cpu = children_cpu() - cpu_before
+            print(summarize(f"{transport_name} {size:g}MB in/{args.reply_mb:g}MB out", latencies, elapsed)
+                  + f"  {moved / elapsed:7.1f} MB/s  brain cpu {brain_cpu:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
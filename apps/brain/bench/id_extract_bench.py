@@ -0,0 +1,119 @@
+"""
+Local ID field extraction on a synthetic corpus of OCR output: national ID
+cards (labelled fields) and passports (TD3 MRZ), with OCR-style noise.
+
+Reports extraction latency, per-field accuracy, how often check-in could
+skip the LLM, and how often such a confident record was actually wrong:
+for one frame, and for a two-frame burst whose reads are voted together.
+
+    python apps/brain/bench/id_extract_bench.py --docs 2000 --noise 0.03
+"""
+import random
+import argparse
+from datetime import date, timedelta
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from apps.brain.id_fields import FIELDS, IDRecord, check_digit, extract, parse_fields, vote
+
+GIVEN = ["JOHN", "MARIA", "WEI", "AISHA", "LUCAS", "EMMA", "OLIVIA", "NOAH", "ANNA MARIA"]
+SURNAMES = ["SMITH", "GARCIA", "ZHANG", "KHAN", "MARTIN", "JONES", "ERIKSSON", "O'BRIEN"]
+NATIONS = ["GBR", "USA", "DEU", "FRA", "IND", "CHN", "ESP"]
+# What Tesseract typically confuses
+CONFUSIONS = {"0": "O", "O": "0", "1": "I", "I": "1", "5": "S", "S": "5", "8": "B", "B": "8", "<": "K"}
+TODAY = date(2026, 6, 1)
+
+
+def noisy(text, rate, rng):
+    out = []
+    for char in text:
+        roll = rng.random()
+        if roll < rate and char in CONFUSIONS:
+            out.append(CONFUSIONS[char])
+        elif roll < rate * 0.2:
+            continue  # dropped character
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def mrz_date(d):
+    return d.strftime("%y%m%d")
+
+
+def make_doc(rng):
+    given, surname = rng.choice(GIVEN), rng.choice(SURNAMES)
+    born = date(1950, 1, 1) + timedelta(days=rng.randrange(20000))
+    expires = TODAY + timedelta(days=rng.randrange(-400, 3650))
+    nation = rng.choice(NATIONS)
+
+    if rng.random() < 0.5:
+        number = str(rng.randrange(10**8, 10**9))
+        truth = {"name": f"{given} {surname}", "document_number": number,
+                 "date_of_birth": born.isoformat(), "expiry": expires.isoformat()}
+        text = (f"IDENTITY CARD\nNAME {given} {surname}\nID NO {number}\n"
+                f"DOB {born:%d/%m/%Y}\nEXPIRES {expires:%d/%m/%Y}")
+        return text, truth
+
+    number = f"{rng.choice('ABCLPX')}{rng.randrange(10**7, 10**8)}"
+    line1 = f"P<{nation}{surname.replace(chr(39), '')}<<{given.replace(' ', '<')}".ljust(44, "<")
+    fields = (number + str(check_digit(number)) + nation
+              + mrz_date(born) + str(check_digit(mrz_date(born))) + rng.choice("MF")
+              + mrz_date(expires) + str(check_digit(mrz_date(expires))) + "<" * 14 + "0")
+    composite = fields[0:10] + fields[13:20] + fields[21:43]
+    line2 = fields + str(check_digit(composite))
+    truth = {"name": f"{given} {surname.replace(chr(39), '')}", "document_number": number,
+             "date_of_birth": born.isoformat(), "expiry": expires.isoformat(), "nationality": nation}
+    return f"PASSPORT\n{surname} {given}\n{line1}\n{line2}", truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.03, help="per-character OCR confusion rate")
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    corpus = [make_doc(rng) for _ in range(args.docs)]
+    # Two independent OCR reads of each document, as in a burst
+    corpus = [(noisy(text, args.noise, rng), noisy(text, args.noise, rng), truth) for text, truth in corpus]
+
+    latencies = []
+    correct = {key: 0 for key in FIELDS}
+    present = {key: 0 for key in FIELDS}
+    confident = confident_wrong = 0
+    burst_confident = burst_wrong = 0
+
+    def wrong(record, truth):
+        return record.name != truth["name"] or record.document_number != truth["document_number"]
+
+    with Timer() as total:
+        for text, _, truth in corpus:
+            with Timer() as t:
+                record = extract(text, today=TODAY)
+            latencies.append(t.ms * 1000)
+
+            for key, value in truth.items():
+                present[key] += 1
+                correct[key] += getattr(record, key) == value
+            if record.is_confident():
+                confident += 1
+                confident_wrong += wrong(record, truth)
+
+    for text, second, truth in corpus:
+        record = IDRecord(vote([parse_fields(text, TODAY), parse_fields(second, TODAY)]))
+        if record.is_confident():
+            burst_confident += 1
+            burst_wrong += wrong(record, truth)
+
+    print(summarize("extract()", latencies, total.elapsed).replace("ms", "us"))
+    for key in FIELDS:
+        print(f"  {key:<18} accuracy {correct[key] / present[key]:6.1%}  (n={present[key]})")
+    print(f"  skips the LLM      {confident / len(corpus):6.1%}")
+    print(f"  confident but wrong {confident_wrong / max(confident, 1):5.1%}")
+    print(f"  2-frame burst: skips the LLM {burst_confident / len(corpus):6.1%}, "
+          f"confident but wrong {burst_wrong / max(burst_confident, 1):5.1%}")
+
+
+if __name__ == "__main__":
+    main()
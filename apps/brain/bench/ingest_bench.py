@@ -0,0 +1,79 @@
+"""
+Knowledge ingest throughput: full build vs. incremental refresh.
+
+Generates a synthetic manual in a temp folder, builds a fresh Chroma index,
+then re-runs ingest with nothing changed and after editing a fraction of
+the sections. A deterministic fake embedder with a per-text cost stands in
+for MiniLM unless --real-embeddings is given.
+
+    python apps/brain/bench/ingest_bench.py --sections 2000 --edit-fraction 0.02
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+import common  # noqa: F401  (sets up sys.path)
+from fakes import FakeEmbeddings
+from apps.brain.ingest import ingest
+
+
+def section(i, version=0):
+    return (f"SECTION {i} (rev {version})\n"
+            f"- Policy {i}: Guests may use facility {i % 17} between {6 + i % 5}:00 and {18 + i % 4}:00.\n"
+            f"- Contact extension {100 + i} for assistance with item {i}.\n")
+
+
+def write_manual(folder, sections, versions):
+    with open(os.path.join(folder, "manual.txt"), "w", encoding="utf-8") as f:
+        f.write("\n\n".join(section(i, versions.get(i, 0)) for i in range(sections)))
+
+
+def run(label, store, folder, embeddings):
+    before = getattr(embeddings, "texts", 0)
+    start = time.perf_counter()
+    report = ingest(store, folder)
+    elapsed = time.perf_counter() - start
+    embedded = getattr(embeddings, "texts", before + report["added"]) - before
+    rate = report["chunks"] / elapsed if elapsed else 0
+    print(f"{label:<24} {elapsed:7.2f}s  chunks={report['chunks']:<6} added={report['added']:<6} "
+          f"deleted={report['deleted']:<6} embedded={embedded:<6} skipped={report['files_skipped']} file(s) "
+          f"{rate:9.0f} chunks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=2000)
+    parser.add_argument("--edit-fraction", type=float, default=0.02)
+    parser.add_argument("--embed-ms", type=float, default=1.0)
+    parser.add_argument("--real-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+
+    if args.real_embeddings:
+        from apps.brain.knowledge_base import get_embeddings
+        embeddings = get_embeddings()
+    else:
+        embeddings = FakeEmbeddings(args.embed_ms)
+
+    with tempfile.TemporaryDirectory() as folder, tempfile.TemporaryDirectory() as db_dir:
+        versions = {}
+        write_manual(folder, args.sections, versions)
+        store = Chroma(collection_name="bench", persist_directory=db_dir, embedding_function=embeddings)
+
+        run("full build", store, folder, embeddings)
+        run("re-ingest, no changes", store, folder, embeddings)
+
+        rng = random.Random(1)
+        for i in rng.sample(range(args.sections), max(1, int(args.sections * args.edit_fraction))):
+            versions[i] = 1
+        write_manual(folder, args.sections, versions)
+        run(f"re-ingest, {args.edit_fraction:.0%} edited", store, folder, embeddings)
+        # Edited file re-stamped: nothing is read again
+        run("re-ingest after edit", store, folder, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Knowledge search at group scale: recall@k and query latency of the flat
+NumPy index (float32 / float16) vs. Chroma's HNSW at several M / ef_search
+settings as the corpus grows, unfiltered and filtered to one section.
+Then query encoding for concurrent requests, one at a time vs. batched.
+
+Vectors are synthetic (clustered, MiniLM-sized) so no model is needed;
+queries are perturbed corpus chunks and ground truth is exact search.
+
+    python apps/brain/bench/kb_search_bench.py --sizes 1000,5000,20000 --m 16,32 --ef 16,64,128
+"""
+import time
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from fakes import FakeEmbeddings
+from apps.brain.vector_index import FlatIndex, QueryBatcher, to_chroma_where
+
+DIM = 384
+SECTIONS = 8
+LANGUAGES = ["en", "fr", "de"]
+ADD_BATCH = 5000
+
+
+def make_corpus(n, clusters, rng):
+    """Unit vectors around `clusters` topics, plus section / language metadata."""
+    centers = rng.standard_normal((clusters, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + 2.0 * rng.standard_normal((n, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadatas = [{"section": f"s{rng.integers(SECTIONS)}", "language": LANGUAGES[rng.integers(len(LANGUAGES))]}
+                 for _ in range(n)]
+    return vectors, metadatas
+
+
+def make_queries(vectors, count, rng):
+    rows = vectors[rng.integers(len(vectors), size=count)]
+    # Noise about as large as the vector itself: a paraphrase, not a copy
+    queries = rows + rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(DIM)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top(vectors, queries, k, mask=None):
+    scores = queries @ vectors.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def recall(found, truth):
+    return sum(len(f & t) / max(len(t), 1) for f, t in zip(found, truth)) / len(truth)
+
+
+def run(search, queries, truth, where, truth_filtered):
+    latencies, found, found_filtered = [], [], []
+    for query in queries:
+        with Timer() as t:
+            found.append(search(query, None))
+        latencies.append(t.ms)
+    for query in queries:
+        found_filtered.append(search(query, where))
+    return latencies, recall(found, truth), recall(found_filtered, truth_filtered)
+
+
+def flat_search(index, k):
+    def search(query, where):
+        return {int(text) for text, _, _ in index.search(query, k, where)}
+    return search
+
+
+def build_hnsw(client, name, vectors, metadatas, m):
+    collection = client.create_collection(
+        name, embedding_function=None,
+        metadata={"hnsw:space": "cosine", "hnsw:M": m, "hnsw:construction_ef": 200, "hnsw:search_ef": 64})
+    with Timer() as t:
+        for i in range(0, len(vectors), ADD_BATCH):
+            end = min(i + ADD_BATCH, len(vectors))
+            collection.add(ids=[str(j) for j in range(i, end)], embeddings=vectors[i:end],
+                           metadatas=metadatas[i:end])
+    return collection, t.elapsed
+
+
+def hnsw_search(collection, k):
+    def search(query, where):
+        result = collection.query(query_embeddings=[query], n_results=k, where=to_chroma_where(where), include=[])
+        return {int(i) for i in result["ids"][0]}
+    return search
+
+
+def bench_indexes(args, rng):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="kb-bench-"))
+    where = {"section": "s3"}
+    for n in (int(s) for s in args.sizes.split(",")):
+        vectors, metadatas = make_corpus(n, max(8, n // 200), rng)
+        queries = make_queries(vectors, args.queries, rng)
+        mask = np.array([m["section"] == where["section"] for m in metadatas])
+        truth = exact_top(vectors, queries, args.k)
+        truth_filtered = exact_top(vectors, queries, args.k, mask)
+        print(f"\n{n} chunks (recall@{args.k}: unfiltered / filtered to one of {SECTIONS} sections)")
+
+        for dtype in ("float32", "float16"):
+            index = FlatIndex([str(i) for i in range(n)], [str(i) for i in range(n)], metadatas, vectors, dtype)
+            latencies, r, rf = run(flat_search(index, args.k), queries, truth, where, truth_filtered)
+            print(summarize(f"flat {dtype}", latencies)
+                  + f"  recall={r:.3f}/{rf:.3f}  mem={index.nbytes / 2**20:.1f}MB")
+
+        for m in (int(s) for s in args.m.split(",")):
+            collection, build_s = build_hnsw(client, f"bench_{n}_m{m}", vectors, metadatas, m)
+            print(f"  hnsw M={m} built in {build_s:.1f}s")
+            for ef in (int(s) for s in args.ef.split(",")):
+                try:
+                    collection.modify(configuration={"hnsw": {"ef_search": ef}})
+                except Exception as e:
+                    print(f"  (ef_search can't be changed on this Chroma version: {e})")
+                    break
+                label = f"hnsw M={m} ef={ef}"
+                latencies, r, rf = run(hnsw_search(collection, args.k), queries, truth, where, truth_filtered)
+                print(summarize(label, latencies) + f"  recall={r:.3f}/{rf:.3f}")
+            client.delete_collection(collection.name)
+
+
+def bench_batching(args):
+    print(f"\nquery encoding, {args.threads} concurrent requests "
+          f"(encoder: {args.encode_call_ms}ms per call + {args.encode_ms}ms per text)")
+    for window_ms in (0.0, args.batch_ms):
+        batcher = QueryBatcher(lambda e=FakeEmbeddings(args.encode_ms, args.encode_call_ms): e, window_ms)
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(worker_id):
+            for i in range(args.encodes):
+                start = time.perf_counter()
+                batcher.embed(f"question {worker_id}-{i}")
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+        with Timer() as total:
+            threads = [threading.Thread(target=worker, args=(w,)) for w in range(args.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        label = f"batched ({window_ms:g}ms window)" if window_ms else "one at a time"
+        print(summarize(label, latencies, total.elapsed) + f"  {batcher.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,5000,20000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", default="16,32", help="HNSW M values")
+    parser.add_argument("--ef", default="16,64,128", help="HNSW ef_search values")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--encodes", type=int, default=20, help="queries per thread")
+    parser.add_argument("--encode-ms", type=float, default=1.0, help="encoder time per text")
+    parser.add_argument("--encode-call-ms", type=float, default=6.0, help="encoder overhead per call")
+    parser.add_argument("--batch-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    bench_indexes(args, np.random.default_rng(9))
+    bench_batching(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Worst-case LLM latency under provider faults: the primary model called
+directly (no deadline, like a ChatGroq with timeout=None) vs. the
+ResilientLLM (per-attempt deadline, hedging after p95, circuit breaker,
+fallback to a slower local model).
+
+Scenarios: healthy, a slow tail (5% of calls 8x slower), occasional hangs,
+errors, and a black-holed primary. Fake backends only, nothing leaves the
+machine.
+
+    python apps/brain/bench/llm_backend_bench.py --calls 120 --threads 6 --attempt-timeout 2 --hang-s 10
+"""
+import argparse
+import threading
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from fakes import Latency, ScriptedChatModel, FaultyChatModel
+from langchain_core.messages import HumanMessage
+from apps.brain.llm import LLMBackend, ResilientLLM, LLMUnavailable
+
+# name -> (tail_pct, FaultyChatModel kwargs) for the primary
+SCENARIOS = {
+    "healthy": (0.0, {}),
+    "slow tail": (5.0, {}),
+    "hangs": (0.0, {"hang_pct": 3.0}),
+    "errors": (0.0, {"error_pct": 20.0}),
+    "outage": (0.0, {"hang_pct": 100.0}),
+}
+
+
+def run(model, args):
+    latencies, outcomes = [], {"ok": 0, "error": 0, "gave up": 0}
+    lock = threading.Lock()
+    messages = [HumanMessage(content="When is breakfast?")]
+
+    def call():
+        if args.stream:
+            return "".join(chunk.content for chunk in model.stream(messages))
+        return model.invoke(messages).content
+
+    def worker(count):
+        for _ in range(count):
+            with Timer() as t:
+                try:
+                    call()
+                    outcome = "ok"
+                except LLMUnavailable:
+                    outcome = "gave up"
+                except Exception:
+                    outcome = "error"
+            with lock:
+                latencies.append(t.ms)
+                outcomes[outcome] += 1
+
+    per_thread = max(1, args.calls // args.threads)
+    with Timer() as total:
+        threads = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return latencies, outcomes, total.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=120)
+    parser.add_argument("--threads", type=int, default=6)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="primary latency")
+    parser.add_argument("--fallback-ms", type=float, default=600.0, help="local fallback model latency")
+    parser.add_argument("--hang-s", type=float, default=10.0, help="how long a hung request stalls")
+    parser.add_argument("--attempt-timeout", type=float, default=2.0)
+    parser.add_argument("--deadline", type=float, default=4.0)
+    parser.add_argument("--cooldown", type=float, default=5.0, help="circuit breaker cooldown (s)")
+    parser.add_argument("--stream", action="store_true", help="stream replies instead of invoke")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    args = parser.parse_args()
+
+    print(f"primary ~{args.llm_ms:.0f}ms, fallback ~{args.fallback_ms:.0f}ms, hangs last {args.hang_s:.0f}s; "
+          f"attempt timeout {args.attempt_timeout:.1f}s, deadline {args.deadline:.1f}s, "
+          f"{'stream' if args.stream else 'invoke'}")
+    for name in args.scenarios.split(","):
+        tail_pct, faults = SCENARIOS[name]
+        print(f"\n{name}")
+        for mode in ("direct", "resilient"):
+            primary = FaultyChatModel(ScriptedChatModel(["Breakfast is served from 7 to 10."],
+                                                        latency=Latency(args.llm_ms, tail_pct, 8.0, seed=1)),
+                                      hang_s=args.hang_s, seed=2, **faults)
+            if mode == "direct":
+                if faults.get("hang_pct", 0) >= 100:
+                    print(f"  {'direct':<32} every call stalls {args.hang_s:.0f}s")
+                    continue
+                model = primary
+            else:
+                fallback = ScriptedChatModel(["Breakfast is from 7 to 10."], latency=Latency(args.fallback_ms, seed=3))
+                backends = [LLMBackend(f"{name}.primary", primary), LLMBackend(f"{name}.local", fallback)]
+                for backend in backends:
+                    backend.health.breaker.cooldown = args.cooldown
+                model = ResilientLLM(backends, args.attempt_timeout, args.deadline)
+
+            latencies, outcomes, elapsed = run(model, args)
+            failed = {k: v for k, v in outcomes.items() if k != "ok" and v}
+            print(summarize(f"  {mode}", latencies, elapsed) + f"  max={max(latencies):.0f}ms"
+                  + "".join(f"  {k}={v}" for k, v in failed.items()))
+            if mode == "resilient":
+                for backend, stats in model.stats().items():
+                    print(f"    {backend:<22} {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cost of span instrumentation: the per-span overhead in microseconds, and
+what that adds to a request shaped like a real one (STT, a couple of LLM
+calls, tool calls, vector search, SQLite, TTS) across concurrent tasks.
+
+    python apps/brain/bench/metrics_bench.py --spans 200000 --requests 200
+"""
+import random
+import asyncio
+import argparse
+import contextlib
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, jitter, Timer
+from apps.brain import metrics
+
+# (stage, mean ms) for one voice turn that books a room
+STAGES = [("stt.transcribe", 300), ("llm.invoke", 600), ("tool.check_availability", 5),
+          ("sqlite.free_rooms", 2), ("vector.search", 15), ("llm.invoke", 500), ("tts.synthesize", 250)]
+
+
+def per_span_us(count, traced):
+    if traced:
+        metrics.start_trace()
+    with Timer() as t:
+        for _ in range(count):
+            with metrics.span("bench.noop"):
+                pass
+    return t.elapsed / count * 1e6
+
+
+async def request(rng, scale, instrumented):
+    if instrumented:
+        metrics.start_trace()
+    with Timer() as t:
+        for name, ms in STAGES:
+            with (metrics.span(name) if instrumented else contextlib.nullcontext()):
+                await asyncio.sleep(jitter(ms * scale, rng))
+    return t.ms
+
+
+async def run(requests, concurrency, scale, instrumented):
+    rng = random.Random(3)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await request(rng, scale, instrumented)
+
+    with Timer() as total:
+        latencies = await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, total.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=0.01, help="multiplier on stage times (1.0 = realistic)")
+    args = parser.parse_args()
+
+    print(f"span, no trace:   {per_span_us(args.spans, False):6.2f} us")
+    print(f"span, with trace: {per_span_us(args.spans, True):6.2f} us")
+
+    for instrumented in (False, True):
+        latencies, elapsed = asyncio.run(run(args.requests, args.concurrency, args.scale, instrumented))
+        print(summarize("spans on" if instrumented else "spans off", latencies, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Speculative tool prefetch: turn latency of context_bench's scripted
+conversation with tools started only once the LLM asks for them vs.
+started from the guest's words while the first LLM call is in flight.
+
+Tools run for real against a fresh database; the embedding model is a
+stand-in taking `--embed-ms` per query and every tool can be slowed by
+`--tool-ms` (a remote PMS instead of SQLite). Query caches are cleared
+per conversation so each one pays for its searches.
+
+    python apps/brain/bench/prefetch_bench.py --conversations 5 --llm-ms 300 --embed-ms 25 --tool-ms 20
+"""
+import os
+import time
+import argparse
+
+from context_bench import CONVERSATION, SCRIPT, FOLDER  # sets up a scratch database first
+from common import summarize, Timer
+from fakes import ScriptedChatModel, FakeEmbeddings
+from langchain_core.tools import StructuredTool
+from apps.brain import knowledge_base
+from apps.brain.agent import Agent
+from apps.brain.tools import tools
+from apps.brain.prefetch import prefetch_stats
+from apps.brain.metrics import snapshot
+
+
+def slowed(tool, ms):
+    """`tool` with `ms` of extra latency per call, same name and schema."""
+    if not ms:
+        return tool
+
+    def run(**kwargs):
+        time.sleep(ms / 1000.0)
+        return tool.invoke(kwargs)
+    return StructuredTool.from_function(run, name=tool.name, description=tool.description,
+                                        args_schema=tool.args_schema)
+
+
+def run(args, tool_list, prefetch):
+    before = dict(prefetch_stats.stats())
+    per_turn = [[] for _ in CONVERSATION]
+    for _ in range(args.conversations):
+        knowledge_base.get_property().cache.invalidate()
+        agent = Agent(model=ScriptedChatModel(SCRIPT, args.llm_ms), tool_list=tool_list, prefetch=prefetch)
+        for turn, (text, _) in enumerate(CONVERSATION):
+            with Timer() as t:
+                agent.process_message(text)
+            per_turn[turn].append(t.ms)
+    after = prefetch_stats.stats()
+    delta = {k: round(after[k] - before[k], 3) for k in ("started", "hits", "wasted", "saved_ms")}
+    return per_turn, delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="time per LLM call")
+    parser.add_argument("--embed-ms", type=float, default=25.0, help="query embedding time")
+    parser.add_argument("--tool-ms", type=float, default=20.0, help="extra latency on every tool")
+    args = parser.parse_args()
+
+    knowledge_base._embedding_function = FakeEmbeddings(args.embed_ms)
+    knowledge_base.CHROMA_DB_DIR = os.path.join(FOLDER, "chroma_db")
+    knowledge_base.get_vector_store()
+    tool_list = [slowed(t, args.tool_ms) for t in tools]
+
+    results = {}
+    for label, prefetch in (("no prefetch", False), ("prefetch", True)):
+        per_turn, delta = run(args, tool_list, prefetch)
+        results[label] = per_turn
+        print(f"\n{label}: {len(CONVERSATION)} turns x {args.conversations} conversations")
+        print(summarize("  turn latency", [ms for turn in per_turn for ms in turn]))
+        if prefetch:
+            started = delta["started"] or 1
+            print(f"  prefetched {delta['started']:.0f} calls: {delta['hits']:.0f} used "
+                  f"(hit rate {delta['hits'] / started:.2f}), {delta['wasted']:.0f} wasted, "
+                  f"{delta['saved_ms'] / max(delta['hits'], 1):.1f}ms saved per hit")
+    saved = snapshot("prefetch.saved").get("prefetch.saved")
+    if saved:
+        print(f"  prefetch.saved {saved}")
+
+    labels = list(results)
+    print("\nmean turn latency (ms), by turn:")
+    print("  turn  " + "".join(f"{label:>14}" for label in labels) + "  guest")
+    for turn, (text, _) in enumerate(CONVERSATION):
+        means = [sum(results[label][turn]) / len(results[label][turn]) for label in labels]
+        print(f"  {turn + 1:>4}  " + "".join(f"{m:>14.1f}" for m in means) + f"  {text[:40]}")
+
+
+if __name__ == "__main__":
+    main()
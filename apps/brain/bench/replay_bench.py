@@ -0,0 +1,346 @@
+"""
+Offline replay of brain traffic: PROCESS_TEXT / PROCESS_AUDIO / PROCESS_IMAGE
+requests go through main.py's real handlers on the Dispatcher (Agent, tools,
+Database, router, knowledge base, vision preprocessing, phrase cache), with
+deterministic local stand-ins for Groq, Deepgram, Edge TTS, Tesseract and the
+embedding model. Reports throughput, tail latency, CPU and RSS per message
+type (each type replayed on its own), then for the full mixed trace, plus
+the per-stage span histograms.
+
+Traces are JSONL, one request per line with "at" (seconds from the start):
+
+    {"at": 0.0, "type": "PROCESS_TEXT", "session_id": "kiosk-1", "text": "Is the pool heated?"}
+    {"at": 0.4, "type": "PROCESS_AUDIO", "session_id": "kiosk-2", "transcript": "Any rooms free?", "audio_bytes": 64000}
+    {"at": 0.9, "type": "PROCESS_IMAGE", "session_id": "kiosk-1", "card": 2}
+
+Audio is given as a transcript (turned into fake audio the stand-in STT
+"hears") or "audio_file"; images as a synthetic "card" index or "image_file".
+Without --trace a Poisson trace is generated (--save-trace keeps it).
+
+    python apps/brain/bench/replay_bench.py --requests 300 --rate 20
+    python apps/brain/bench/replay_bench.py --trace traffic.jsonl --speed 0 --transport binary
+"""
+import os
+import json
+import time
+import shutil
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import cv2
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize
+
+# Before any apps.brain import: the tools open the database at import time,
+# and the replay books rooms, so it gets a freshly seeded one
+FOLDER = tempfile.mkdtemp(prefix="brain-replay-")
+os.environ["BRAIN_DB_PATH"] = os.path.join(FOLDER, "hotel.db")
+
+from fakes import (Latency, ScriptedChatModel, FakeEmbeddings, FakeOCR, ReplaySTT,
+                   fake_audio, fake_tts, tool_call)
+from vision_bench import make_card
+from apps.brain import main as brain
+from apps.brain import tts, vision, knowledge_base, metrics
+from apps.brain.agent import Agent
+from apps.brain.dispatcher import Dispatcher
+from apps.brain.framing import get_transport
+from apps.brain.router import IntentRouter
+from apps.brain.sessions import SessionStore
+
+try:
+    import resource  # Unix only: peak RSS / OCR worker CPU
+except ImportError:
+    resource = None
+
+TYPES = ["PROCESS_TEXT", "PROCESS_AUDIO", "PROCESS_IMAGE"]
+
+# What guests say; the first few are FAQ / availability turns the router answers without the LLM
+GUEST_LINES = [
+    "What time is check-out?",
+    "When is the pool open?",
+    "What's the wifi password?",
+    "Do you have any rooms available tonight?",
+    "Tell me about room 104.",
+    "Can I book room 102 for tonight? My name is Anna Lee.",
+    "I'd like a quiet room with a nice view, what do you recommend?",
+    "Is there somewhere to get a coffee late at night?",
+    "Can I leave my bags here after I check out?",
+]
+
+# Every session's model cycles through this; a turn consumes either one
+# reply or a tool round plus its reply, so sessions stay in step.
+SCRIPT = [
+    [tool_call("check_room_availability")], "Rooms 101, 102 and 104 are free tonight.",
+    "Of course, I'm happy to help with that.",
+    [tool_call("lookup_hotel_policy", {"query": "late night coffee"})],
+    "Mendl's Patisserie in the lobby is open around the clock.",
+    [tool_call("describe_specific_room", {"room_number": "104"})],
+    "Room 104 faces the inner garden and is very quiet. Shall I book it for you?",
+    [tool_call("book_room", {"room_number": "102", "guest_name": "Anna Lee"})],
+    "All set! Room 102 is yours for tonight.",
+]
+
+
+def synthetic_trace(count, rate, mix, sessions, stream_pct, cards, seed=11):
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    at = 0.0
+    trace = []
+    for _ in range(count):
+        if rate:
+            at += rng.expovariate(rate)
+        kind = rng.choices(kinds, weights)[0]
+        entry = {"at": round(at, 4), "type": kind, "session_id": f"kiosk-{rng.randrange(sessions)}"}
+        if kind == "PROCESS_TEXT":
+            entry["text"] = rng.choice(GUEST_LINES)
+        elif kind == "PROCESS_AUDIO":
+            entry["transcript"] = rng.choice(GUEST_LINES)
+            entry["audio_bytes"] = rng.randrange(32_000, 160_000)
+            if rng.random() * 100 < stream_pct:
+                entry["stream"] = True
+        else:
+            entry["card"] = rng.randrange(cards)
+        trace.append(entry)
+    return trace
+
+
+def load_trace(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_trace(path, trace):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in trace:
+            f.write(json.dumps(entry) + "\n")
+
+
+def materialize(request_id, entry, cards, base_dir):
+    """Trace entry -> protocol message with raw audio / image bytes."""
+    message = {k: v for k, v in entry.items()
+               if k not in ("at", "transcript", "audio_bytes", "audio_file", "card", "image_file")}
+    message["id"] = request_id
+    if "transcript" in entry:
+        message["audio"] = fake_audio(entry["transcript"], entry.get("audio_bytes", 64_000))
+    elif "audio_file" in entry:
+        with open(os.path.join(base_dir, entry["audio_file"]), "rb") as f:
+            message["audio"] = f.read()
+    if "card" in entry:
+        message["image"] = cards[entry["card"] % len(cards)][0]
+    elif "image_file" in entry:
+        with open(os.path.join(base_dir, entry["image_file"]), "rb") as f:
+            message["image"] = f.read()
+    return message
+
+
+def make_cards(count, seed=5):
+    """(JPEG bytes, OCR text) for `count` synthetic ID photos."""
+    rng = random.Random(seed)
+    cards = []
+    for _ in range(count):
+        frame, truth = make_card(rng)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        cards.append((jpeg.tobytes(), truth))
+    return cards
+
+
+def rss_bytes():
+    """Current resident set size (Linux), else peak RSS, else 0."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Brain:
+    """main.py's handlers on a Dispatcher, wired to the stand-ins."""
+
+    def __init__(self, args, folder, cards):
+        if not args.real_embeddings:
+            knowledge_base._embedding_function = FakeEmbeddings(args.embed_ms)
+        knowledge_base.CHROMA_DB_DIR = os.path.join(folder, "chroma_db")
+        knowledge_base.get_vector_store()
+
+        tts.phrase_cache = tts.PhraseCache(os.path.join(folder, "tts_cache"),
+                                           synth=fake_tts(Latency(args.tts_ms, args.tail_pct, args.tail_mult, 3)))
+        if not args.real_ocr:
+            # Inline on the executor: a sleeping stand-in gains nothing from worker processes
+            vision.OCR_WORKERS = 0
+            vision._ocr_image = FakeOCR(Latency(args.ocr_ms, args.tail_pct, args.tail_mult, 4),
+                                        [truth for _, truth in cards])
+
+        llm = Latency(args.llm_ms, args.tail_pct, args.tail_mult, 1)
+        self.sessions = SessionStore(lambda: Agent(model=ScriptedChatModel(SCRIPT, latency=llm)))
+        self.stt = ReplaySTT(Latency(args.stt_ms, args.tail_pct, args.tail_mult, 2))
+        self.transport = get_transport(args.transport)
+        self.dispatcher = Dispatcher({}, max_concurrency=args.concurrency, write=self._on_write,
+                                     transport=self.transport, lock_for=brain.session_lock(self.sessions))
+        self.dispatcher.handlers = brain.build_handlers(self.sessions, self.dispatcher, self.stt, IntentRouter())
+        self._pending = {}
+
+    def encode(self, message):
+        return self.transport.encode(message)
+
+    def submit(self, payload):
+        if isinstance(payload, str):
+            self.dispatcher.submit(payload)
+        else:
+            self.dispatcher.submit_message(self.transport.decode(memoryview(payload)[4:]))
+
+    def _decode(self, encoded):
+        if isinstance(encoded, str):
+            return json.loads(encoded)
+        return self.transport.decode(memoryview(encoded)[4:])
+
+    def _on_write(self, encoded):
+        message = self._decode(encoded)
+        pending = self._pending.get(message.get("id"))
+        if pending is None:
+            return
+        now = time.perf_counter()
+        if message["type"] == "TTS_AUDIO_CHUNK":
+            pending.setdefault("first_audio", now)
+            return
+        pending["done"] = now
+        pending["reply"] = message
+        del self._pending[message["id"]]
+        if not self._pending:
+            self._idle.set()
+
+    async def replay(self, messages, speed):
+        """Send `(at, kind, id, payload)` on the trace's clock (scaled by 1/speed; 0 = all at once)."""
+        results = []
+        self._idle = asyncio.Event()
+        start = time.perf_counter()
+        for at, kind, request_id, payload in messages:
+            if speed:
+                delay = start + at / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            record = {"kind": kind, "sent": time.perf_counter()}
+            self._pending[request_id] = record
+            # Sparse traces drain in between requests; only the last drain counts
+            self._idle.clear()
+            results.append(record)
+            self.submit(payload)
+        if self._pending:
+            await self._idle.wait()
+        return results, time.perf_counter() - start
+
+
+async def run_phase(brain_, label, entries, payloads, speed):
+    messages = [(entry.get("at", 0.0), entry["type"], f"r{i}", payloads[i]) for i, entry in entries]
+    peak = rss_before = rss_bytes()
+    stop = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, rss_bytes())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample_rss())
+    cpu_before, child_before = time.process_time(), children_cpu()
+    results, elapsed = await brain_.replay(messages, speed)
+    cpu = time.process_time() - cpu_before + children_cpu() - child_before
+    stop.set()
+    await sampler
+
+    kinds = sorted({r["kind"] for r in results}, key=lambda k: TYPES.index(k) if k in TYPES else len(TYPES))
+    print(f"\n{label}: {len(results)} requests in {elapsed:.2f}s, cpu {cpu:.2f}s "
+          f"({cpu / max(len(results), 1) * 1000:.1f}ms/request), "
+          f"rss {rss_before / 2**20:.0f}MB -> peak {peak / 2**20:.0f}MB")
+    for kind in kinds:
+        mine = [r for r in results if r["kind"] == kind]
+        latencies = [(r["done"] - r["sent"]) * 1000 for r in mine]
+        errors = sum(1 for r in mine if r["reply"]["type"] == "ERROR")
+        print(summarize(kind, latencies, elapsed) + (f"  errors={errors}" if errors else ""))
+        first_audio = [(r["first_audio"] - r["sent"]) * 1000 for r in mine if "first_audio" in r]
+        if first_audio:
+            print(summarize("  first audio chunk", first_audio))
+
+
+async def main_async(args, trace, cards, folder):
+    brain_ = Brain(args, folder, cards)
+    base_dir = os.path.dirname(os.path.abspath(args.trace)) if args.trace else "."
+    payloads = [brain_.encode(materialize(f"r{i}", entry, cards, base_dir)) for i, entry in enumerate(trace)]
+    indexed = list(enumerate(trace))
+
+    # One untimed request per type: first-use costs (tool stack, router index) aren't the steady state
+    first = {}
+    for i, entry in indexed:
+        first.setdefault(entry["type"], i)
+    await brain_.replay([(0.0, trace[i]["type"], f"r{i}", payloads[i]) for i in first.values()], 0)
+
+    for kind in TYPES:
+        entries = [(i, e) for i, e in indexed if e["type"] == kind]
+        if entries:
+            await run_phase(brain_, f"{kind} only", entries, payloads, args.speed)
+    await run_phase(brain_, "mixed trace", indexed, payloads, args.speed)
+
+    print("\nstages:")
+    for name, stats in metrics.snapshot().items():
+        unit = next(k for k in stats if k.startswith("p50_"))[4:]
+        print(f"  {name:<32} n={stats['count']:<5} p50={stats['p50_' + unit]:>9.2f}{unit} "
+              f"p95={stats['p95_' + unit]:>9.2f}{unit} p99={stats['p99_' + unit]:>9.2f}{unit}")
+    print(f"\nsessions={brain_.sessions.created} tts_cache={tts.phrase_cache.stats()}")
+    brain_.dispatcher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", help="JSONL trace to replay (default: generate one)")
+    parser.add_argument("--save-trace", help="write the generated trace here")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=20.0, help="generated arrivals per second (0 = burst)")
+    parser.add_argument("--mix", default="6,3,1", help="text,audio,image weights for generated traffic")
+    parser.add_argument("--sessions", type=int, default=12, help="kiosks in the generated trace")
+    parser.add_argument("--stream-pct", type=float, default=30.0, help="share of audio requests that stream")
+    parser.add_argument("--cards", type=int, default=4, help="synthetic ID photos to rotate through")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=brain.MAX_CONCURRENCY)
+    parser.add_argument("--transport", choices=["json", "binary"], default="json")
+    parser.add_argument("--llm-ms", type=float, default=600.0)
+    parser.add_argument("--stt-ms", type=float, default=300.0)
+    parser.add_argument("--tts-ms", type=float, default=250.0)
+    parser.add_argument("--ocr-ms", type=float, default=400.0)
+    parser.add_argument("--embed-ms", type=float, default=5.0)
+    parser.add_argument("--tail-pct", type=float, default=5.0, help="share of backend calls that are slow")
+    parser.add_argument("--tail-mult", type=float, default=4.0, help="how much slower those calls are")
+    parser.add_argument("--real-ocr", action="store_true", help="use Tesseract instead of the stand-in")
+    parser.add_argument("--real-embeddings", action="store_true", help="use MiniLM instead of hashed vectors")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level)
+    cards = make_cards(args.cards)
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        mix = dict(zip(TYPES, (float(w) for w in args.mix.split(","))))
+        trace = synthetic_trace(args.requests, args.rate, mix, args.sessions, args.stream_pct, args.cards)
+        if args.save_trace:
+            save_trace(args.save_trace, trace)
+
+    try:
+        asyncio.run(main_async(args, trace, cards, FOLDER))
+    finally:
+        shutil.rmtree(FOLDER, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
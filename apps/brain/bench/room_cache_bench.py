@@ -0,0 +1,60 @@
+"""
+Cached vs. uncached room lookups (the agent's most frequent tool calls).
+
+    python apps/brain/bench/room_cache_bench.py --rooms 200 --lookups 20000
+"""
+import os
+import random
+import argparse
+import tempfile
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from apps.brain.database import Database
+
+
+def run(db, rooms, lookups):
+    rng = random.Random(3)
+    details, availability = [], []
+    for i in range(lookups):
+        number = str(1000 + rng.randrange(rooms))
+        with Timer() as t:
+            db.get_room_details(number)
+        details.append(t.ms)
+        if i % 10 == 0:
+            with Timer() as t:
+                db.check_availability()
+            availability.append(t.ms)
+    return details, availability
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "rooms.db")
+        seed = Database(path, cache=False)
+        conn = seed._get_conn()
+        conn.execute("DELETE FROM rooms")
+        conn.executemany(
+            "INSERT INTO rooms (number, status, price, description) VALUES (?, ?, ?, ?)",
+            [(str(1000 + i), "AVAILABLE" if i % 3 else "OCCUPIED", 100.0 + i, f"Room {i}: " + "lovely " * 20)
+             for i in range(args.rooms)],
+        )
+        conn.commit()
+        seed.close()
+
+        for cached in (False, True):
+            db = Database(path, cache=cached)
+            details, availability = run(db, args.rooms, args.lookups)
+            label = "cached" if cached else "SQLite"
+            print(summarize(f"get_room_details ({label})", [d * 1000 for d in details]).replace("ms", "us"))
+            print(summarize(f"check_availability ({label})", [a * 1000 for a in availability]).replace("ms", "us"))
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
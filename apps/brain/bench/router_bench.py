@@ -0,0 +1,77 @@
+"""
+Intent-router fast path vs. the full agent path.
+
+Replays a mix of guest questions through IntentRouter with local tool
+stand-ins; turns it cannot answer fall through to a fake agent that costs
+two LLM round trips. Reports routing hit rate and latency per path.
+
+    python apps/brain/bench/router_bench.py --llm-ms 700
+"""
+import os
+import argparse
+
+import common
+from common import summarize, Timer
+from apps.brain.router import IntentRouter
+
+MANUAL = os.path.join(common.PROJECT_ROOT, "apps", "brain", "knowledge", "hotel_manual.txt")
+
+QUESTIONS = [
+    "What's the Wi-Fi password?",
+    "wifi?",
+    "When is the pool open?",
+    "What time is checkout?",
+    "Is there late check-out?",
+    "When is breakfast?",
+    "Which rooms are available?",
+    "Do you have any vacancies tonight?",
+    "What amenities do you have?",
+    "I'd like to book room 101 for John Smith.",
+    "Tell me about room 105.",
+    "Can I bring my dog?",
+    "My shower is broken, can someone help?",
+    "Is the pool heated and is there wifi by the pool?",
+]
+
+
+def fake_tools():
+    with open(MANUAL, encoding="utf-8") as f:
+        manual = f.read()
+    rooms = [{"number": "101", "type": "STANDARD", "price": 150.0},
+             {"number": "102", "type": "STANDARD", "price": 120.0}]
+    return {
+        "lookup_hotel_policy": lambda args: manual,
+        "check_room_availability": lambda args: rooms,
+        "get_hotel_amenities": lambda args: "- The Grand Pool: Open 6 AM - 10 PM.",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=700, help="latency of one LLM call")
+    args = parser.parse_args()
+
+    router = IntentRouter(tools=fake_tools())
+    routed, fallthrough, agent_only = [], [], []
+    for _ in range(args.rounds):
+        for question in QUESTIONS:
+            with Timer() as t:
+                reply = router.route(question)
+            if reply is not None:
+                routed.append(t.ms)
+            else:
+                fallthrough.append(t.ms + 2 * args.llm_ms)
+            agent_only.append(2 * args.llm_ms)
+
+    print(summarize("routed (no LLM)", routed))
+    print(summarize("fell through to agent", fallthrough))
+    print(summarize("with router, all turns", routed + fallthrough))
+    print(summarize("agent only, all turns", agent_only))
+    print(f"router stats: {router.stats()}")
+    for question in QUESTIONS:
+        print(f"  {question!r:55} -> {router.route(question)!r}")
+
+
+if __name__ == "__main__":
+    main()
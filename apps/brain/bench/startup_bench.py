@@ -0,0 +1,68 @@
+"""
+Brain cold-start benchmark.
+
+Measures, in fresh interpreters:
+  * cold import time of apps.brain.main
+  * time from spawning main.py until it prints READY
+  * time until the first PROCESS_TEXT-independent request (STATUS) is answered
+
+    python apps/brain/bench/startup_bench.py --runs 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import common
+from common import summarize
+
+MAIN = os.path.join(common.PROJECT_ROOT, "apps", "brain", "main.py")
+
+
+def cold_import():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import apps.brain.main"], cwd=common.PROJECT_ROOT,
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def time_to_ready(warmup):
+    env = dict(os.environ, BRAIN_WARMUP="1" if warmup else "0")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, MAIN], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, env=env, text=True)
+    ready = status = None
+    try:
+        for line in proc.stdout:
+            msg = json.loads(line)
+            if msg["type"] == "READY":
+                ready = (time.perf_counter() - start) * 1000.0
+                proc.stdin.write(json.dumps({"id": "s", "type": "STATUS"}) + "\n")
+                proc.stdin.flush()
+            elif msg.get("id") == "s":
+                status = (time.perf_counter() - start) * 1000.0
+                break
+    finally:
+        proc.stdin.close()
+        proc.kill()
+        proc.wait()
+    return ready, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(summarize("cold import apps.brain.main", [cold_import() for _ in range(args.runs)]))
+    for warm in (False, True):
+        results = [time_to_ready(warm) for _ in range(args.runs)]
+        label = "warm-up on" if warm else "warm-up off"
+        print(summarize(f"READY ({label})", [r for r, _ in results]))
+        print(summarize(f"first STATUS reply ({label})", [s for _, s in results]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+STT latency under concurrent load with an offline stub backend.
+
+All utterances arrive at once; latency is measured from that moment.
+Compares the old pattern (new client + blocking call per utterance, run on
+the event loop) with one shared, pooled async backend.
+
+    python apps/brain/bench/stt_bench.py --utterances 64 --stt-ms 80 --setup-ms 60
+"""
+import time
+import asyncio
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize
+from apps.brain.stt import StubSTT
+
+
+class HandshakeSTT(StubSTT):
+    """Stub that pays a one-off connection setup cost on first use."""
+
+    def __init__(self, setup_ms, **kwargs):
+        super().__init__(**kwargs)
+        self.setup_ms = setup_ms
+        self.connected = False
+
+    async def _transcribe(self, audio):
+        if not self.connected:
+            await asyncio.sleep(self.setup_ms / 1000.0)
+            self.connected = True
+        return await super()._transcribe(audio)
+
+
+async def per_call_blocking(args):
+    """Old path: fresh client each time, synchronous call blocks the loop."""
+    start = time.perf_counter()
+
+    async def one():
+        await asyncio.sleep(0)
+        time.sleep((args.setup_ms + args.stt_ms) / 1000.0)
+        return (time.perf_counter() - start) * 1000.0
+    return await asyncio.gather(*(one() for _ in range(args.utterances)))
+
+
+async def pooled(args):
+    backend = HandshakeSTT(args.setup_ms, latency_ms=args.stt_ms, max_concurrency=args.pool)
+    start = time.perf_counter()
+
+    async def one():
+        await backend.transcribe(b"")
+        return (time.perf_counter() - start) * 1000.0
+    return await asyncio.gather(*(one() for _ in range(args.utterances)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--utterances", type=int, default=64)
+    parser.add_argument("--stt-ms", type=float, default=80)
+    parser.add_argument("--setup-ms", type=float, default=60)
+    parser.add_argument("--pool", type=int, default=8)
+    args = parser.parse_args()
+
+    for label, flow in (("per-call blocking client", per_call_blocking), (f"pooled backend (x{args.pool})", pooled)):
+        start = time.perf_counter()
+        samples = asyncio.run(flow(args))
+        print(summarize(label, samples, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Wall-clock time of multi-tool agent turns.
+
+A scripted chat model asks for several slow tools in one response (and a
+second round after that); with concurrent execution a round should cost
+about the slowest tool instead of the sum of all of them.
+
+    python apps/brain/bench/tool_loop_bench.py --tool-ms 100 200 300
+"""
+import time
+import argparse
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, Timer
+from fakes import ScriptedChatModel, tool_call
+from langchain_core.tools import StructuredTool
+from apps.brain import agent as agent_module
+from apps.brain.agent import Agent
+from apps.brain.metrics import snapshot
+
+
+def slow_tool(name, ms):
+    def run() -> str:
+        time.sleep(ms / 1000.0)
+        return f"{name} done"
+    return StructuredTool.from_function(run, name=name, description=f"Sleeps {ms}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tool-ms", type=float, nargs="+", default=[100, 200, 300])
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    tools = [slow_tool(f"tool_{i}", ms) for i, ms in enumerate(args.tool_ms)]
+    calls = [tool_call(t.name, call_id=f"c{i}") for i, t in enumerate(tools)]
+    # Round 1: every tool at once; round 2: the slowest one again; then answer
+    script = [calls, [tool_call(tools[-1].name, call_id="again")], "All done."]
+
+    expected_sum = sum(args.tool_ms) + args.tool_ms[-1]
+    expected_max = max(args.tool_ms) + args.tool_ms[-1]
+
+    samples = []
+    for _ in range(args.turns):
+        agent = Agent(model=ScriptedChatModel(script), tool_list=tools)
+        with Timer() as t:
+            reply = agent.process_message("do everything")
+        assert reply == "All done.", reply
+        samples.append(t.ms)
+
+    print(f"tool latencies: {args.tool_ms} ms, two rounds "
+          f"(max round {agent_module.MAX_TOOL_ROUNDS}, budget {agent_module.MAX_TOOL_CALLS_PER_TURN} calls)")
+    print(f"sequential would take ~{expected_sum:.0f}ms, concurrent ideal ~{expected_max:.0f}ms")
+    print(summarize("multi-tool turn", samples))
+    for name, stats in snapshot("tool.").items():
+        print(f"  {name:<16} {stats}")
+
+
+if __name__ == "__main__":
+    main()
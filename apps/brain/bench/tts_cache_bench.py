@@ -0,0 +1,92 @@
+"""
+TTS phrase cache: reply latency with and without the cache on a workload
+where a few replies (greetings, FAQ answers, "I didn't hear anything.")
+make up most of the traffic. A fake TTS stands in for EdgeTTS.
+
+The second cached pass uses a fresh cache over the same directory, i.e. a
+restarted brain serving from the memory-mapped disk tier.
+
+    python apps/brain/bench/tts_cache_bench.py --replies 500 --tts-ms 300
+"""
+import random
+import asyncio
+import argparse
+import tempfile
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize, jitter, Timer
+from apps.brain import tts
+
+FIXED = [
+    "I didn't hear anything.",
+    "I'm having trouble hearing you clearly.",
+    "Welcome to the Grand Hotel! How can I help you today?",
+    "Of course! The pool is open from 6 AM to 10 PM.",
+    "Breakfast is served from 7 to 10:30 AM in the Garden Restaurant.",
+    "Check-out is at 11 AM. Late checkout is available on request.",
+    "Is there anything else I can help you with?",
+]
+
+
+def workload(count, rng):
+    """Zipf-ish: a handful of fixed phrases dominate, plus one-off replies."""
+    replies = []
+    for i in range(count):
+        if rng.random() < 0.7:
+            rank = min(int(rng.paretovariate(1.2)) - 1, len(FIXED) - 1)
+            replies.append(FIXED[rank])
+        else:
+            replies.append(f"Your booking reference is {rng.randrange(10**5, 10**6)}. Enjoy your stay!")
+    return replies
+
+
+def fake_synth(tts_ms, rng):
+    async def synth(text, voice):
+        await asyncio.sleep(jitter(tts_ms, rng))
+        # Roughly what EdgeTTS produces per character of MP3
+        return bytearray(len(text) * 200)
+    return synth
+
+
+async def run(replies, synthesize):
+    latencies = []
+    with Timer() as total:
+        for text in replies:
+            with Timer() as t:
+                await synthesize(text)
+            latencies.append(t.ms)
+    return latencies, total.elapsed
+
+
+async def main_async(args):
+    rng = random.Random(17)
+    replies = workload(args.replies, rng)
+    synth = fake_synth(args.tts_ms, rng)
+
+    latencies, elapsed = await run(replies, lambda text: synth(text, tts.VOICE))
+    print(summarize("no cache", latencies, elapsed))
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache = tts.PhraseCache(folder, memory_bytes=args.memory_mb * 1024 * 1024)
+        await cache.prerender(FIXED[:2], synth=synth)
+        latencies, elapsed = await run(replies, lambda text: cache.synthesize(text, synth=synth))
+        print(summarize("phrase cache (cold start)", latencies, elapsed))
+        print(f"  {cache.stats()}")
+
+        restarted = tts.PhraseCache(folder, memory_bytes=args.memory_mb * 1024 * 1024)
+        latencies, elapsed = await run(replies, lambda text: restarted.synthesize(text, synth=synth))
+        print(summarize("phrase cache (restart, disk tier)", latencies, elapsed))
+        print(f"  {restarted.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=500)
+    parser.add_argument("--tts-ms", type=float, default=300.0, help="mean synthesis time per reply")
+    parser.add_argument("--memory-mb", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
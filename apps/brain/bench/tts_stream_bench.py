@@ -0,0 +1,92 @@
+"""
+Time-to-first-audio for the voice reply: whole-reply path (wait for the full
+LLM answer, synthesize it in one go) vs. the sentence-streaming path.
+Uses a fake token stream and a fake TTS generator, so no network is needed.
+
+    python apps/brain/bench/tts_stream_bench.py --runs 5
+"""
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (sets up sys.path)
+from common import summarize
+from apps.brain import tts
+
+REPLY = ("Of course! The pool is on the third floor and it is open from six in the morning "
+         "until ten at night. Towels are provided at the entrance. Would you like me to "
+         "book a spa treatment for you as well? We have a few slots left this evening.")
+
+
+def fake_llm_stream(token_ms):
+    for word in REPLY.split(" "):
+        time.sleep(token_ms / 1000.0)
+        yield word + " "
+
+
+def fake_tts(ms_per_char, first_byte_ms, chunk_bytes=4096):
+    async def stream(text, voice):
+        await asyncio.sleep(first_byte_ms / 1000.0)
+        # Real TTS produces roughly 1KB of MP3 per few characters
+        total = len(text) * 200
+        produced = 0
+        while produced < total:
+            await asyncio.sleep(ms_per_char * chunk_bytes / 200 / 1000.0)
+            size = min(chunk_bytes, total - produced)
+            produced += size
+            yield b"\0" * size
+    return stream
+
+
+async def whole_reply(args, pool):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    text = await loop.run_in_executor(pool, lambda: "".join(fake_llm_stream(args.token_ms)))
+    await tts.synthesize(text, stream=fake_tts(args.tts_ms_per_char, args.tts_first_byte_ms))
+    elapsed = (time.perf_counter() - start) * 1000.0
+    return elapsed, elapsed
+
+
+async def streamed_reply(args, pool):
+    loop = asyncio.get_running_loop()
+    stream = fake_tts(args.tts_ms_per_char, args.tts_first_byte_ms)
+    start = time.perf_counter()
+    first = []
+
+    def emit(message):
+        if not first:
+            first.append((time.perf_counter() - start) * 1000.0)
+
+    async def run_blocking(func, *a):
+        return await loop.run_in_executor(pool, func, *a)
+
+    async def synth(text, voice):
+        return await tts.synthesize(text, voice, stream=stream)
+
+    await tts.speak_stream(fake_llm_stream(args.token_ms), emit, run_blocking, synth=synth)
+    return first[0], (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--tts-ms-per-char", type=float, default=1.5)
+    parser.add_argument("--tts-first-byte-ms", type=float, default=120)
+    args = parser.parse_args()
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    for label, flow in (("whole reply", whole_reply), ("sentence streaming", streamed_reply)):
+        first, total = [], []
+        for _ in range(args.runs):
+            f, t = asyncio.run(flow(args, pool))
+            first.append(f)
+            total.append(t)
+        print(summarize(f"{label} / first audio", first))
+        print(summarize(f"{label} / last audio", total))
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Rough prompt budget for conversation history (system prompt excluded)
+HISTORY_TOKEN_BUDGET = int(os.getenv("BRAIN_HISTORY_TOKENS", "3000"))
+# Turns kept verbatim; older ones are folded into the rolling summary (0 = only the token budget applies)
+RECENT_TURNS = int(os.getenv("BRAIN_RECENT_TURNS", "4"))
+# Cap on the rolling summary, oldest lines go first
+SUMMARY_TOKENS = int(os.getenv("BRAIN_SUMMARY_TOKENS", "250"))
+# Tool results from earlier turns are cut to this many characters (0 = keep them whole)
+STALE_TOOL_CHARS = int(os.getenv("BRAIN_STALE_TOOL_CHARS", "240"))
+
+SUMMARY_HEADER = "Earlier in this conversation:"
+
+# Guest words -> the tools that can help; a turn that matches nothing gets every tool
+BOOKING_WORDS = {"book", "booking", "reserve", "reservation", "stay", "night", "nights", "name", "cancel"}
+ROOM_WORDS = {"room", "rooms", "suite", "available", "availability", "free", "vacancy", "vacancies", "price",
+              "cost", "view", "quiet", "bed", "tonight", "tomorrow"}
+POLICY_WORDS = {"pool", "swim", "wifi", "internet", "password", "breakfast", "checkout", "checkin", "check",
+                "policy", "pet", "pets", "dog", "parking", "park", "luggage", "bags", "time", "open", "hours",
+                "late", "coffee", "menu", "food", "restaurant", "bar", "spa", "gym", "amenities", "facilities",
+                "towel", "smoking"}
+TOOL_INTENTS = [
+    (BOOKING_WORDS, ["check_room_availability", "describe_specific_room", "book_room"]),
+    (ROOM_WORDS, ["check_room_availability", "describe_specific_room"]),
+    (POLICY_WORDS, ["lookup_hotel_policy", "get_hotel_amenities"]),
+]
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(message) -> int:
+    """Cheap token estimate (~4 chars per token) including tool call arguments."""
+    size = len(str(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        size += len(call["name"]) + len(str(call["args"]))
+    return size // 4 + 4
+
+
+def trim_history(messages: list, budget: int) -> list:
+    """
+    Keep the system prompt plus the most recent whole turns that fit in `budget` tokens.
+
+    Cuts only happen in front of a HumanMessage, so an AIMessage with tool_calls
+    is never separated from its ToolMessages (providers reject that). The latest
+    turn is always kept, even if it alone exceeds the budget.
+    """
+    system, history = messages[0], messages[1:]
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        used += estimate_tokens(history[i])
+        if used > budget and start < len(history):
+            break
+        if isinstance(history[i], HumanMessage):
+            start = i
+    if start == 0:
+        return messages
+    return [system] + history[start:]
+
+
+def shorten(text: str, limit: int) -> str:
+    """Collapse whitespace and cut at a word boundary to at most `limit` characters."""
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0] or text[:limit]
+    return cut + " ..."
+
+
+def compact_tool_schema(tool) -> dict:
+    """
+    OpenAI tool schema for `tool` with the bulk taken out: whitespace in
+    descriptions collapsed, `null` defaults and Optional's anyOf-null
+    dropped (not being in "required" already says the argument is optional).
+    """
+    schema = convert_to_openai_tool(tool)
+    function = schema["function"]
+    function["description"] = " ".join(function.get("description", "").split())
+    for prop in function.get("parameters", {}).get("properties", {}).values():
+        options = [o for o in prop.pop("anyOf", []) if o.get("type") != "null"]
+        if len(options) == 1:
+            prop.update(options[0])
+        elif options:
+            prop["anyOf"] = options
+        if prop.get("default", 0) is None:
+            del prop["default"]
+        prop.pop("title", None)
+    return schema
+
+
+def schema_tokens(schemas) -> int:
+    """Estimated prompt tokens taken by bound tool schemas."""
+    return sum(len(json.dumps(s if isinstance(s, dict) else convert_to_openai_tool(s))) // 4 for s in schemas)
+
+
+def select_tools(text: str, names) -> list:
+    """
+    The tools (from `names`, order kept) that the guest's words point at.
+    Falls back to all of them when nothing matches, e.g. "yes please".
+    """
+    words = set(_WORD.findall(str(text).lower()))
+    wanted = set()
+    for keywords, group in TOOL_INTENTS:
+        if words & keywords:
+            wanted.update(group)
+    chosen = [n for n in names if n in wanted]
+    return chosen or list(names)
+
+
+def summarize_turns(turns) -> list:
+    """
+    One or two summary lines per turn, without an LLM call: what the guest
+    said, which tools ran with which arguments, and how the turn was answered.
+    """
+    lines = []
+    for turn in turns:
+        guest = next((m for m in turn if isinstance(m, HumanMessage)), None)
+        if guest is not None:
+            lines.append(f"Guest: {shorten(guest.content, 160)}")
+        for message in turn:
+            for call in getattr(message, "tool_calls", None) or []:
+                args = ", ".join(f"{k}={v}" for k, v in call["args"].items() if v not in (None, ""))
+                lines.append(f"(looked up {call['name']}({args}))")
+        reply = next((m for m in reversed(turn)
+                      if isinstance(m, AIMessage) and m.content and not m.tool_calls), None)
+        if reply is not None:
+            lines.append(f"You: {shorten(reply.content, 200)}")
+    return lines
+
+
+class ConversationContext:
+    """
+    What the LLM sees of a conversation: the system prompt, a rolling
+    summary of older turns, and the last `recent_turns` turns verbatim
+    (still trimmed to `token_budget`). Tool results from earlier turns are
+    cut to `stale_tool_chars`; the model already answered from them, and
+    room lists or manual excerpts are the bulk of a long history.
+
+    `summarizer(lines_so_far, folded_turns)` returns the new summary lines;
+    the default is extractive so summarizing costs no extra LLM round trip.
+    """
+
+    def __init__(self, system_prompt, token_budget=HISTORY_TOKEN_BUDGET, recent_turns=RECENT_TURNS,
+                 stale_tool_chars=STALE_TOOL_CHARS, summary_tokens=SUMMARY_TOKENS, summarizer=None):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.stale_tool_chars = stale_tool_chars
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or (lambda lines, turns: lines + summarize_turns(turns))
+        self.history = []
+        self.summary = []
+        self._system = SystemMessage(content=system_prompt)
+
+    def append(self, message):
+        self.history.append(message)
+
+    def prompt(self) -> list:
+        return [self._system] + self.history
+
+    def prompt_tokens(self) -> int:
+        return sum(estimate_tokens(m) for m in self.prompt())
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this conversation."""
+        return sum(len(str(m.content)) for m in self.prompt())
+
+    def start_turn(self, text):
+        self._compact_tool_results()
+        # Force string to avoid Pydantic validation errors
+        self.history.append(HumanMessage(content=str(text)))
+
+        turns = self._turns()
+        keep = len(turns)
+        if self.recent_turns > 0:
+            keep = min(keep, self.recent_turns)
+        # Then as many whole recent turns as fit the budget (the current one always stays)
+        kept = trim_history([self._system] + [m for t in turns[-keep:] for m in t], self.token_budget)[1:]
+        folded = len(self.history) - len(kept)
+        if folded:
+            self._fold(turns[:len(turns) - self._count_turns(kept)])
+            self.history = kept
+
+    def _turns(self):
+        """The history split in front of every HumanMessage."""
+        turns = []
+        for message in self.history:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    @staticmethod
+    def _count_turns(messages):
+        return sum(1 for m in messages if isinstance(m, HumanMessage))
+
+    def _fold(self, turns):
+        if self.summary_tokens <= 0:
+            return
+        lines = self.summarizer(list(self.summary), turns)
+        while lines and sum(len(line) // 4 + 1 for line in lines) > self.summary_tokens:
+            lines.pop(0)
+        self.summary = lines
+        content = self.system_prompt
+        if lines:
+            content += f"\n\n{SUMMARY_HEADER}\n" + "\n".join(lines)
+        self._system = SystemMessage(content=content)
+
+    def _compact_tool_results(self):
+        if self.stale_tool_chars <= 0:
+            return
+        for i, message in enumerate(self.history):
+            if (isinstance(message, ToolMessage) and len(str(message.content)) > self.stale_tool_chars
+                    and not message.additional_kwargs.get("compacted")):
+                self.history[i] = ToolMessage(
+                    tool_call_id=message.tool_call_id,
+                    content=shorten(message.content, self.stale_tool_chars),
+                    additional_kwargs={"compacted": True})
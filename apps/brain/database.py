@@ -1,47 +1,249 @@
 import sqlite3
 import os
 import logging
+import time
+import threading
+from datetime import date, timedelta
+from apps.brain.metrics import span, traced
+
+# Define path relative to this script (BRAIN_DB_PATH overrides, e.g. for benchmarks)
+DB_PATH = os.getenv("BRAIN_DB_PATH") or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'hotel.db')
+
+# Tuned for many short reads from several worker threads
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",      # readers never block the writer
+    "PRAGMA synchronous=NORMAL",    # safe with WAL, far fewer fsyncs
+    "PRAGMA cache_size=-8000",      # ~8MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",     # wait for a lock instead of failing
+]
+
+
+def _add_description_column(cursor):
+    # Early databases were created before rooms had a description
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(rooms)")]
+    if "description" not in columns:
+        cursor.execute("ALTER TABLE rooms ADD COLUMN description TEXT")
+
+
+def _date_legacy_occupancy(cursor):
+    # Bookings used to carry no dates and set rooms.status to OCCUPIED instead. Now
+    # that status is only the front desk's flag, turn an undated booking on an
+    # occupied room into a stay for tonight, and clear OCCUPIED on every room a
+    # booking had put there (or that has no booking left to explain it).
+    today = date.today()
+    cursor.execute(
+        """
+        UPDATE bookings SET check_in = ?, check_out = ?
+        WHERE check_in IS NULL AND room_id IN (SELECT id FROM rooms WHERE status = 'OCCUPIED')
+        """,
+        (today.isoformat(), (today + timedelta(days=1)).isoformat()),
+    )
+    cursor.execute("UPDATE rooms SET status = 'AVAILABLE' WHERE status = 'OCCUPIED'")
+
+
+# Schema migrations, applied in order and tracked in PRAGMA user_version.
+# Each entry is a list of SQL statements or callables taking a cursor.
+MIGRATIONS = [
+    # 1: base schema
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            number TEXT NOT NULL UNIQUE,
+            type TEXT DEFAULT 'STANDARD',
+            status TEXT DEFAULT 'AVAILABLE',
+            price REAL DEFAULT 100.0,
+            description TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guest_name TEXT NOT NULL,
+            room_id INTEGER,
+            FOREIGN KEY(room_id) REFERENCES rooms(id)
+        )
+        ''',
+        _add_description_column,
+    ],
+    # 2: indexes for the hot queries
+    [
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_id ON bookings(room_id)",
+        "CREATE INDEX IF NOT EXISTS idx_rooms_status ON rooms(status)",
+    ],
+    # 3: date-range reservations. Dates are ISO 'YYYY-MM-DD' text, so string
+    # comparison is date comparison; stays are half-open [check_in, check_out).
+    [
+        "ALTER TABLE bookings ADD COLUMN check_in TEXT",
+        "ALTER TABLE bookings ADD COLUMN check_out TEXT",
+        # Covers the per-room overlap probe: room_id = ? AND check_in < ? AND check_out > ?
+        "CREATE INDEX IF NOT EXISTS idx_bookings_room_dates ON bookings(room_id, check_in, check_out)",
+        # Window scans across all rooms
+        "CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings(check_in, check_out)",
+        _date_legacy_occupancy,
+    ],
+]
+
+# A booking [in, out) overlaps the stay [?, ?) unless it ends before or starts after it
+OVERLAP = "b.room_id = r.id AND b.check_in < ? AND b.check_out > ?"
+# rooms.status is the front desk's flag (walk-in, out of order); bookings never
+# change it. A room is free tonight if it is flagged AVAILABLE and no booking
+# covers tonight. Bound to (covers_tonight, today, today).
+FREE_TONIGHT = ("(? = 0 OR (r.status = 'AVAILABLE' AND NOT EXISTS "
+                "(SELECT 1 FROM bookings b WHERE b.room_id = r.id AND b.check_in <= ? AND b.check_out > ?)))")
+
+
+def parse_stay(check_in=None, check_out=None, future=False):
+    """
+    Normalize a stay to ISO date strings. No dates means tonight;
+    a missing check-out means one night. With `future`, a check-in
+    before today is rejected.
+    """
+    start = date.fromisoformat(str(check_in)) if check_in else date.today()
+    end = date.fromisoformat(str(check_out)) if check_out else start + timedelta(days=1)
+    if future and start < date.today():
+        raise ValueError("Check-in can't be in the past.")
+    if end <= start:
+        raise ValueError("Check-out must be after check-in.")
+    return start.isoformat(), end.isoformat()
+
+
+# How often (seconds) the room cache asks SQLite whether another writer changed the file
+CACHE_CHECK_INTERVAL = float(os.getenv("BRAIN_ROOM_CACHE_CHECK", "0.5"))
+
+
+class RoomRecord:
+    """Cached row of the rooms table."""
+    __slots__ = ("id", "number", "type", "price", "description", "status")
+
+    def __init__(self, id, number, type, price, description, status):
+        self.id = id
+        self.number = number
+        self.type = type
+        self.price = price
+        self.description = description
+        self.status = status
+
+    def summary(self):
+        return {'number': self.number, 'type': self.type, 'price': self.price}
+
+    def details(self):
+        return {
+            "number": self.number,
+            "type": self.type,
+            "price": self.price,
+            "description": self.description,
+            "status": self.status
+        }
 
-# Define path relative to this script
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'hotel.db')
 
 class Database:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, cache=True):
         self.db_path = db_path
+        # One persistent connection per thread (sqlite3 connections are not shareable)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        # Read-through room cache: metadata by number plus the set free tonight.
+        # book_room writes through; PRAGMA data_version catches other writers
+        # and the set is rebuilt when the date rolls over.
+        self.cache_enabled = cache
+        self._cache_lock = threading.Lock()
+        self._rooms = None
+        self._available = None
+        self._available_list = None
+        self._cache_day = None
+        self._monitor = None
+        self._data_version = None
+        self._next_check = 0.0
         self._initialize()
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every pooled connection (call on shutdown)."""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Created in another thread; it goes away with that thread
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+        with self._cache_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+            self._rooms = None
+
+    @traced("sqlite.load_rooms")
+    def _load_rooms(self):
+        # Caller holds _cache_lock
+        if self._monitor is None:
+            # Dedicated connection: its data_version changes whenever any other connection commits
+            self._monitor = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._data_version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._monitor.execute(
+            "SELECT id, number, type, price, description, status FROM rooms ORDER BY id"
+        ).fetchall()
+        self._rooms = {row[1]: RoomRecord(*row) for row in rows}
+        today = date.today().isoformat()
+        booked = {row[0] for row in self._monitor.execute(
+            "SELECT r.number FROM bookings b JOIN rooms r ON r.id = b.room_id WHERE b.check_in <= ? AND b.check_out > ?",
+            (today, today))}
+        self._available = {r.number for r in self._rooms.values() if r.status == 'AVAILABLE' and r.number not in booked}
+        self._available_list = None
+        self._cache_day = today
+        self._next_check = time.monotonic() + CACHE_CHECK_INTERVAL
+
+    def _room_cache(self):
+        """Current room cache, reloaded if the database changed underneath it."""
+        with self._cache_lock:
+            if self._rooms is None or self._cache_day != date.today().isoformat():
+                self._load_rooms()
+            elif time.monotonic() >= self._next_check:
+                version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+                if version != self._data_version:
+                    self._load_rooms()
+                else:
+                    self._next_check = time.monotonic() + CACHE_CHECK_INTERVAL
+            return self._rooms
+
+    def _migrate(self, conn):
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, steps in enumerate(MIGRATIONS[version:], start=version + 1):
+            logging.info(f"Applying database migration {number}...")
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            # user_version can't be bound as a parameter
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
 
     def _initialize(self):
         """Initialize database schema and seed data if empty."""
         # Ensure data directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
+
         conn = self._get_conn()
+        self._migrate(conn)
         cursor = conn.cursor()
 
-        # Create Tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rooms (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                number TEXT NOT NULL UNIQUE,
-                type TEXT DEFAULT 'STANDARD',
-                status TEXT DEFAULT 'AVAILABLE',
-                price REAL DEFAULT 100.0,
-                description TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guest_name TEXT NOT NULL,
-                room_id INTEGER,
-                FOREIGN KEY(room_id) REFERENCES rooms(id)
-            )
-        ''')
-        conn.commit()
-
         # Seed Data if table is empty
         cursor.execute('SELECT count(*) FROM rooms')
         if cursor.fetchone()[0] == 0:
@@ -64,26 +266,47 @@ class Database:
             
             conn.commit()
             logging.info("Database seeded.")
-        
-        conn.close()
 
-    def check_availability(self):
-        """Return list of available room numbers with basic info."""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT number, type, price FROM rooms WHERE status = 'AVAILABLE'")
-        rooms = [{'number': r[0], 'type': r[1], 'price': r[2]} for r in cursor.fetchall()]
-        conn.close()
-        return rooms
+    def check_availability(self, check_in=None, check_out=None):
+        """
+        Return list of room numbers free tonight with basic info.
+        With dates, lists rooms with no booking overlapping that stay.
+        """
+        if check_in or check_out or not self.cache_enabled:
+            return self.free_rooms(check_in, check_out)
+
+        rooms = self._room_cache()
+        with self._cache_lock:
+            if self._available_list is None:
+                self._available_list = [r.summary() for r in rooms.values() if r.number in self._available]
+            return [dict(room) for room in self._available_list]
 
     def get_room_details(self, room_number):
-        """Get the full description of a specific room."""
-        conn = self._get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT number, type, price, description, status FROM rooms WHERE number = ?", (room_number,))
-        row = cursor.fetchone()
-        conn.close()
-        
+        """Get the full description of a specific room; status is tonight's."""
+        if self.cache_enabled:
+            record = self._room_cache().get(str(room_number))
+            if record is None:
+                return None
+            details = record.details()
+            with self._cache_lock:
+                if record.status == 'AVAILABLE' and record.number not in self._available:
+                    details["status"] = 'OCCUPIED'
+            return details
+
+        today = date.today().isoformat()
+        with span("sqlite.get_room_details"):
+            conn = self._get_conn()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT number, type, price, description,
+                       CASE WHEN status = 'AVAILABLE' AND NOT {FREE_TONIGHT} THEN 'OCCUPIED' ELSE status END
+                FROM rooms r WHERE number = ?
+                """,
+                (1, today, today, room_number),
+            )
+            row = cursor.fetchone()
+
         if row:
             return {
                 "number": row[0],
@@ -94,30 +317,100 @@ class Database:
             }
         return None
 
-    def book_room(self, room_number, guest_name):
-        """Book a room for a guest."""
+    @traced("sqlite.free_rooms")
+    def free_rooms(self, check_in, check_out):
+        """
+        Rooms with no booking overlapping [check_in, check_out), in one indexed
+        query. A stay that covers tonight also needs the room free tonight,
+        the same rule book_room applies.
+        """
+        check_in, check_out = parse_stay(check_in, check_out, future=True)
+        today = date.today().isoformat()
+        cursor = self._get_conn().execute(
+            f"""
+            SELECT r.number, r.type, r.price FROM rooms r
+            WHERE NOT EXISTS (SELECT 1 FROM bookings b WHERE {OVERLAP})
+              AND {FREE_TONIGHT}
+            ORDER BY r.number
+            """,
+            (check_out, check_in, int(check_in <= today < check_out), today, today),
+        )
+        return [{'number': r[0], 'type': r[1], 'price': r[2]} for r in cursor.fetchall()]
+
+    @traced("sqlite.occupancy")
+    def occupancy(self, start, end):
+        """
+        Bulk view of a date window: {room_number: [(check_in, check_out), ...]}
+        for every booking overlapping [start, end). Rooms with no bookings map to [].
+        """
+        start, end = parse_stay(start, end)
+        conn = self._get_conn()
+        result = {row[0]: [] for row in conn.execute("SELECT number FROM rooms ORDER BY number")}
+        cursor = conn.execute(
+            """
+            SELECT r.number, b.check_in, b.check_out
+            FROM bookings b JOIN rooms r ON r.id = b.room_id
+            WHERE b.check_in < ? AND b.check_out > ?
+            ORDER BY r.number, b.check_in
+            """,
+            (end, start),
+        )
+        for number, booked_in, booked_out in cursor:
+            result[number].append((booked_in, booked_out))
+        return result
+
+    @traced("sqlite.book_room")
+    def book_room(self, room_number, guest_name, check_in=None, check_out=None):
+        """
+        Book a room for a guest for [check_in, check_out) (default: tonight).
+
+        The availability check and the insert are one conditional statement
+        inside a BEGIN IMMEDIATE transaction, so two kiosks racing for the
+        same room can never both win.
+        """
+        try:
+            check_in, check_out = parse_stay(check_in, check_out, future=True)
+        except ValueError as e:
+            return False, str(e)
+
+        today = date.today().isoformat()
+        starts_now = check_in <= today < check_out
         conn = self._get_conn()
         cursor = conn.cursor()
-        
+
         try:
-            # Check availability first
-            cursor.execute("SELECT id FROM rooms WHERE number = ? AND status = 'AVAILABLE'", (room_number,))
-            row = cursor.fetchone()
-            if not row:
+            # Take the write lock up front; other writers wait (busy_timeout) instead of racing
+            cursor.execute("BEGIN IMMEDIATE")
+
+            # Claim the room only if nothing overlaps (and, for a stay covering
+            # tonight, the front desk hasn't marked it occupied)
+            cursor.execute(
+                f"""
+                INSERT INTO bookings (guest_name, room_id, check_in, check_out)
+                SELECT ?, r.id, ?, ? FROM rooms r
+                WHERE r.number = ?
+                  AND {FREE_TONIGHT}
+                  AND NOT EXISTS (SELECT 1 FROM bookings b WHERE {OVERLAP})
+                """,
+                (guest_name, check_in, check_out, room_number, int(starts_now), today, today, check_out, check_in),
+            )
+            if cursor.rowcount != 1:
+                conn.rollback()
                 return False, "Room not available or does not exist."
-            
-            room_id = row[0]
-            
-            # Create booking
-            cursor.execute("INSERT INTO bookings (guest_name, room_id) VALUES (?, ?)", (guest_name, room_id))
-            
-            # Update room status
-            cursor.execute("UPDATE rooms SET status = 'OCCUPIED' WHERE id = ?", (room_id,))
-            
+
             conn.commit()
-            return True, f"Room {room_number} booked for {guest_name}."
+            if starts_now:
+                self._cache_mark_booked(room_number)
+            return True, f"Room {room_number} booked for {guest_name} from {check_in} to {check_out}."
         except Exception as e:
             conn.rollback()
             return False, str(e)
-        finally:
-            conn.close()
+
+    def _cache_mark_booked(self, room_number):
+        # Write-through so the next read sees the booking right away. The commit
+        # also bumps data_version, so the cache is re-validated on the next check.
+        with self._cache_lock:
+            if self._rooms is None:
+                return
+            self._available.discard(room_number)
+            self._available_list = None
@@ -0,0 +1,160 @@
+import json
+import asyncio
+import logging
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional
+from apps.brain.framing import JsonTransport
+from apps.brain import metrics
+
+# Default number of requests the brain works on at the same time.
+# Anything above this waits in line instead of piling onto the LLM / OCR.
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_EXECUTOR_WORKERS = 16
+
+Handler = Callable[[dict], Awaitable[Optional[dict]]]
+
+
+class Dispatcher:
+    """
+    Reads requests (newline-delimited JSON by default, see framing.py for the
+    binary transport) and runs them concurrently.
+
+    Every request may carry an "id"; the response echoes it back so the
+    manager can match answers to callers regardless of completion order.
+    Blocking work (LLM calls, OCR, SQLite, embeddings) should go through
+    `run_blocking` so it never stalls the event loop.
+
+    Each request is timed as a `request.<TYPE>` span; a request with
+    "trace": true gets the spans of its stages back in the response.
+
+    `lock_for(data)` may return an asyncio.Lock the request has to hold
+    (its session's, say). It is taken before a concurrency slot, so requests
+    queued behind a busy session don't sit on slots other sessions could use.
+    """
+
+    def __init__(self, handlers: Dict[str, Handler], max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 executor_workers=DEFAULT_EXECUTOR_WORKERS, default_type="PROCESS_TEXT", write=None,
+                 transport=None, lock_for: Optional[Callable[[dict], Optional[asyncio.Lock]]] = None):
+        self.handlers = handlers
+        self.lock_for = lock_for
+        self.transport = transport or JsonTransport()
+        self.default_type = default_type
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="brain")
+        self._semaphore = None
+        self._tasks = set()
+        # Output sink for encoded responses (str lines / bytes frames); defaults to stdout
+        self._write = write
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking callable on the worker pool (spans there count toward this request)."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, context.run, func, *args)
+
+    def emit(self, message: dict):
+        """
+        Write one response. Must be called from the event loop thread.
+        Blob fields may be raw bytes; the transport decides how they go on the wire.
+        """
+        if self._write:
+            self._write(self.transport.encode(message))
+        else:
+            self.transport.write(message)
+
+    def reply_to(self, data: dict):
+        """Emitter for intermediate messages (e.g. streamed audio) tagged with the request id."""
+        request_id = data.get("id")
+
+        def emit(message: dict):
+            if request_id is not None:
+                message["id"] = request_id
+            self.emit(message)
+        return emit
+
+    async def dispatch(self, data: dict) -> Optional[dict]:
+        """Run the handler for a single decoded request and tag the response with its id."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if not isinstance(data, dict):
+            # Valid JSON, but not a request (e.g. a bare list); there is no id to answer to
+            logging.error(f"Request is not a JSON object: {str(data)[:200]}")
+            return {"type": "ERROR", "text": "Request must be a JSON object"}
+
+        request_id = data.get("id")
+        msg_type = data.get("type", self.default_type)
+        handler = self.handlers.get(msg_type)
+        lock = self.lock_for(data) if self.lock_for and handler is not None else None
+
+        trace = metrics.start_trace()
+        async with lock or nullcontext():
+            async with self._semaphore:
+                if handler is None:
+                    logging.warning(f"Unknown message type: {msg_type}")
+                    response = {"type": "ERROR", "text": f"Unknown message type: {msg_type}"}
+                else:
+                    try:
+                        with metrics.span(f"request.{msg_type}"):
+                            response = await handler(data)
+                    except Exception as e:
+                        logging.error(f"Error processing {msg_type}: {e}")
+                        response = {"type": "ERROR", "text": str(e)}
+
+        if response is not None:
+            if request_id is not None:
+                response["id"] = request_id
+            if data.get("trace"):
+                response["spans"] = trace
+        return response
+
+    async def _handle(self, data: dict):
+        response = await self.dispatch(data)
+        if response is not None:
+            self.emit(response)
+
+    def submit_message(self, data: dict):
+        """Schedule a decoded request without waiting for it to finish."""
+        task = asyncio.ensure_future(self._handle(data))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def submit(self, line: str):
+        """Schedule a raw JSON request line without waiting for it to finish."""
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            logging.error(f"Invalid JSON: {line[:200]}")
+            return None
+        return self.submit_message(data)
+
+    async def serve(self, stream=None):
+        """
+        Main loop: read messages from `stream` (stdin by default) on a
+        dedicated reader thread and fan them out as concurrent tasks.
+        """
+        stream = stream or self.transport.input()
+        loop = asyncio.get_running_loop()
+        # Separate single thread so a blocked read never eats a worker slot;
+        # decoding happens there too, off the event loop
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="brain-stdin")
+
+        try:
+            while True:
+                data = await loop.run_in_executor(reader, self.transport.read, stream)
+                if data is None:
+                    break
+                self.submit_message(data)
+
+            # EOF: let in-flight requests finish before shutting down
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            reader.shutdown(wait=False)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
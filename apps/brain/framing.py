@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import base64
+import struct
+import logging
+from typing import Optional
+
+# "json": newline-delimited JSON, blobs as base64 (the original protocol)
+# "binary": length-prefixed frames, blobs as raw bytes
+TRANSPORT = os.getenv("BRAIN_TRANSPORT", "json")
+# Refuse frames larger than this instead of trying to buffer them
+MAX_FRAME_BYTES = int(os.getenv("BRAIN_MAX_FRAME_BYTES", str(64 * 1024 * 1024)))
+
+BLOB_TYPES = (bytes, bytearray, memoryview)
+_U32 = struct.Struct(">I")
+
+# Where responses go once `claim_stdout` has run; until then, sys.stdout
+_responses = None
+
+
+def claim_stdout():
+    """
+    Reserve fd 1 for responses: it is duplicated for the transport, and fd 1
+    and sys.stdout are pointed at stderr. A stray print or library message
+    then lands in the log instead of between two frames (which would desync
+    the manager's binary reader for good).
+    """
+    global _responses
+    if _responses is None:
+        sys.stdout.flush()
+        _responses = os.fdopen(os.dup(1), "w", encoding="utf-8")
+        os.dup2(2, 1)
+        sys.stdout = sys.stderr
+    return _responses
+
+
+def _output():
+    return _responses or sys.stdout
+
+
+def as_bytes(value):
+    """Raw bytes for a blob field: base64 text (JSON mode) is decoded, bytes pass through."""
+    if isinstance(value, str):
+        return base64.b64decode(value)
+    return value
+
+
+def _b64(value):
+    return base64.b64encode(value).decode("ascii")
+
+
+class JsonTransport:
+    """
+    Newline-delimited JSON. Blob fields (bytes values, or lists of them)
+    are base64-encoded on the way out, so the wire format is unchanged.
+    """
+    name = "json"
+
+    def input(self):
+        return sys.stdin
+
+    def read(self, stream) -> Optional[dict]:
+        """Next message from `stream`, or None at EOF. Bad lines are logged and skipped."""
+        while True:
+            line = stream.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line)
+            except json.JSONDecodeError:
+                logging.error(f"Invalid JSON: {line[:200]}")
+
+    def encode(self, message: dict) -> str:
+        out = {}
+        for key, value in message.items():
+            if isinstance(value, BLOB_TYPES):
+                value = _b64(value)
+            elif isinstance(value, list) and value and isinstance(value[0], BLOB_TYPES):
+                value = [_b64(v) for v in value]
+            out[key] = value
+        return json.dumps(out)
+
+    def write(self, message: dict):
+        print(self.encode(message), file=_output(), flush=True)
+
+
+class BinaryTransport:
+    """
+    Length-prefixed frames:
+
+        u32 frame length | u32 header length | header JSON | blob 0 | blob 1 | ...
+
+    (big-endian). The header is the message with its blob fields left out and
+    a "_blobs" list of [field, index or null, length] describing the bytes
+    that follow. Incoming blobs are handed to handlers as memoryviews into
+    the frame buffer; outgoing blobs are written as-is, without encoding.
+    """
+    name = "binary"
+
+    def input(self):
+        return sys.stdin.buffer
+
+    def _read_exact(self, stream, size) -> Optional[bytearray]:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return None
+            filled += n
+        return buffer
+
+    def read(self, stream) -> Optional[dict]:
+        while True:
+            prefix = self._read_exact(stream, 4)
+            if prefix is None:
+                return None
+            (size,) = _U32.unpack(prefix)
+            if size > MAX_FRAME_BYTES:
+                # Can't resync after a bogus length: treat it as a broken pipe
+                logging.error(f"Frame of {size} bytes exceeds BRAIN_MAX_FRAME_BYTES; closing input.")
+                return None
+            frame = self._read_exact(stream, size)
+            if frame is None:
+                return None
+            try:
+                return self.decode(frame)
+            except (ValueError, KeyError, struct.error) as e:
+                logging.error(f"Invalid frame ({size} bytes): {e}")
+
+    def decode(self, frame) -> dict:
+        view = memoryview(frame)
+        (header_size,) = _U32.unpack_from(view, 0)
+        message = json.loads(bytes(view[4:4 + header_size]))
+        if not isinstance(message, dict):
+            # Not a request; the dispatcher answers it with an ERROR
+            return message
+        offset = 4 + header_size
+        for key, index, length in message.pop("_blobs", ()):
+            blob = view[offset:offset + length]
+            if len(blob) != length:
+                raise ValueError(f"blob {key} truncated")
+            offset += length
+            if index is None:
+                message[key] = blob
+            else:
+                # List items are framed in order
+                message.setdefault(key, []).append(blob)
+        return message
+
+    def encode_parts(self, message: dict) -> list:
+        """[prefix + header, blob, blob, ...] so large blobs are written without a join copy."""
+        header, blobs, specs = {}, [], []
+        for key, value in message.items():
+            if isinstance(value, BLOB_TYPES):
+                specs.append([key, None, len(value)])
+                blobs.append(value)
+            elif isinstance(value, list) and value and all(isinstance(v, BLOB_TYPES) for v in value):
+                for index, item in enumerate(value):
+                    specs.append([key, index, len(item)])
+                    blobs.append(item)
+            else:
+                header[key] = value
+        if specs:
+            header["_blobs"] = specs
+        encoded = json.dumps(header).encode("utf-8")
+        size = 4 + len(encoded) + sum(len(b) for b in blobs)
+        return [_U32.pack(size) + _U32.pack(len(encoded)) + encoded] + blobs
+
+    def encode(self, message: dict) -> bytes:
+        return b"".join(self.encode_parts(message))
+
+    def write(self, message: dict):
+        out = _output().buffer
+        for part in self.encode_parts(message):
+            out.write(part)
+        out.flush()
+
+
+TRANSPORTS = {"json": JsonTransport, "binary": BinaryTransport}
+
+
+def get_transport(name: str = None):
+    name = (name or TRANSPORT).lower()
+    if name not in TRANSPORTS:
+        logging.warning(f"Unknown transport '{name}', using json.")
+        name = "json"
+    return TRANSPORTS[name]()
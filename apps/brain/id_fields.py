@@ -0,0 +1,247 @@
+import os
+import re
+from datetime import date
+
+# Both name and document number at or above this are trusted without a retry. Only
+# check-digit-verified MRZ fields reach it from a single frame; printed labels (0.9 at
+# best, and a dropped letter looks just as good) need another frame agreeing in a burst
+FIELD_CONFIDENCE = float(os.getenv("BRAIN_ID_CONFIDENCE", "0.95"))
+
+FIELDS = ("name", "document_number", "date_of_birth", "expiry", "nationality")
+
+LABELS = r"(?:NAME|SURNAME|GIVEN NAMES?|ID|DOC(?:UMENT)?|NO|NUMBER|DOB|DATE|BIRTH|EXP(?:IRES|IRY)?|SEX|NATIONALITY)"
+NAME_RE = re.compile(r"\b(?:FULL\s+)?NAME\s*[:.]?\s*([A-Z0-9][A-Z0-9' -]{1,40}?)\s*(?=\b" + LABELS + r"\b|$)", re.M)
+# The label needs a "NO"/"NUMBER"/":" so words like "IDENTITY" don't count, and the value a digit
+ID_RE = re.compile(r"\b(?:ID|DOC(?:UMENT)?|CARD|PASSPORT)\s*(?:(?:NO|NUMBER|#)\.?\s*:?|:)\s*((?=[A-Z]*\d)[A-Z0-9]{6,12})\b")
+DATE = r"(\d{1,2}[/.\- ]\d{1,2}[/.\- ]\d{4}|\d{4}-\d{2}-\d{2}|\d{1,2} [A-Z]{3} \d{4})"
+DOB_RE = re.compile(r"\b(?:DOB|DATE OF BIRTH|BIRTH(?: ?DATE)?)\s*[:.]?\s*" + DATE)
+EXPIRY_RE = re.compile(r"\b(?:EXP(?:IRES|IRY)?|EXPIRY DATE|DATE OF EXPIRY|VALID UNTIL)\s*[:.]?\s*" + DATE)
+MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+
+# Digits Tesseract commonly reads in place of letters, and the reverse
+NAME_DIGITS = str.maketrans("0158", "OISB")
+MRZ_DIGITS = str.maketrans("OQDIL|SBZG", "0001115826")
+
+# Passport (TD3) machine-readable zone: two lines of 44 characters
+MRZ_LINE_RE = re.compile(r"[A-Z0-9<]{44}")
+
+
+def _name_confidence(name):
+    words = name.split()
+    if not words:
+        return 0.0
+    # "JOHN SMITH" is far more believable than a lone token or a run of fragments
+    confidence = 0.9 if 2 <= len(words) <= 4 else 0.5
+    if any(len(w) < 2 for w in words):
+        confidence -= 0.3
+    return max(confidence, 0.0)
+
+
+def _id_number(number):
+    """(number, confidence); stray look-alike letters in an otherwise numeric run are repaired."""
+    letters = [c for c in number if not c.isdigit()]
+    if not letters:
+        return number, 0.9
+    # OCR noise is usually letters mixed into what should be a numeric run
+    if len(letters) <= 2 and number[0].isdigit() and all(c in "OQDIL" for c in letters):
+        return number.translate(MRZ_DIGITS), 0.85
+    return number, 0.9 if len(letters) <= 2 and number[0].isalpha() else 0.6
+
+
+def parse_date(text):
+    """DD/MM/YYYY, YYYY-MM-DD or DD MMM YYYY -> date (None if not a real date)."""
+    try:
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+            return date.fromisoformat(text)
+        day, month, year = re.split(r"[/.\- ]", text)
+        month = MONTHS.index(month) + 1 if month.isalpha() else int(month)
+        return date(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+def _date_confidence(key, value, today):
+    if key == "date_of_birth":
+        return 0.9 if 0 <= today.year - value.year <= 120 and value <= today else 0.3
+    # Expiry dates more than 15 years out are almost certainly misreads
+    return 0.9 if value.year - today.year <= 15 else 0.3
+
+
+# --- MRZ ------------------------------------------------------------------
+
+def check_digit(field: str) -> int:
+    """ICAO 9303 check digit: weights 7, 3, 1; A-Z = 10-35, '<' = 0."""
+    total = 0
+    for i, char in enumerate(field):
+        if char.isdigit():
+            value = int(char)
+        elif char.isalpha():
+            value = ord(char) - 55
+        else:
+            value = 0
+        total += value * (7, 3, 1)[i % 3]
+    return total % 10
+
+
+def _mrz_date(text, today, future):
+    try:
+        year, month, day = int(text[0:2]), int(text[2:4]), int(text[4:6])
+        century = 2000 if future or 2000 + year <= today.year else 1900
+        return date(century + year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_mrz(text: str, today=None) -> dict:
+    """
+    Fields from a passport MRZ, with confidence from the check digits.
+    OCR usually keeps each MRZ line as one whitespace-free token.
+    """
+    today = today or date.today()
+    tokens = re.findall(r"[A-Z0-9<]+", text.upper().replace("«", "<"))
+    lines = [t for t in tokens if MRZ_LINE_RE.fullmatch(t)]
+    for first, second in zip(lines, lines[1:]):
+        if not first.startswith("P"):
+            continue
+
+        # Numeric positions of line 2 get letter->digit repairs before checking
+        second = (second[:9] + second[9].translate(MRZ_DIGITS) + second[10:13]
+                  + second[13:20].translate(MRZ_DIGITS) + second[20]
+                  + second[21:28].translate(MRZ_DIGITS) + second[28:])
+
+        def checked(value, digit):
+            return 0.99 if digit.isdigit() and check_digit(value) == int(digit) else 0.4
+
+        fields = {}
+        # '<' fillers are often read as 'K'; a lone K between fillers is never part of a name
+        names = re.sub(r"(?<=<)K+(?=<)", lambda m: "<" * len(m.group()), first[5:])
+        surname, _, given = names.partition("<<")
+        parts = [p for p in given.split("<") if p] + [p for p in surname.split("<") if p]
+        name = " ".join(parts)
+        if name:
+            composite = second[0:10] + second[13:20] + second[21:43]
+            # The name has no check digit; trust it as much as the overall line, unless a
+            # K next to a filler may really be a '<' (then "SMITHK<JOHN" is ambiguous)
+            ambiguous = not given or re.search(r"(?<=<)K|K(?=<)", names) is not None
+            confidence = 0.95 if checked(composite, second[43]) > 0.9 else 0.6
+            fields["name"] = (name.translate(NAME_DIGITS), 0.7 if ambiguous else confidence)
+
+        number = second[0:9].rstrip("<")
+        if number:
+            fields["document_number"] = (number, checked(second[0:9], second[9]))
+        born = _mrz_date(second[13:19], today, future=False)
+        if born:
+            fields["date_of_birth"] = (born.isoformat(), checked(second[13:19], second[19]))
+        expires = _mrz_date(second[21:27], today, future=True)
+        if expires:
+            fields["expiry"] = (expires.isoformat(), checked(second[21:27], second[27]))
+        if second[10:13].isalpha():
+            fields["nationality"] = (second[10:13], 0.9)
+        return fields
+    return {}
+
+
+# --- Labelled fields ------------------------------------------------------
+
+def parse_labels(text: str, today=None) -> dict:
+    """Fields printed next to labels ("NAME", "ID NO", "DOB", ...) on ID cards."""
+    today = today or date.today()
+    text = text.upper()
+    fields = {}
+
+    match = NAME_RE.search(text)
+    if match:
+        raw = " ".join(match.group(1).split())
+        name = raw.translate(NAME_DIGITS)
+        confidence = _name_confidence(name)
+        if name != raw:
+            confidence -= 0.2
+        fields["name"] = (name, round(confidence, 3))
+
+    match = ID_RE.search(text)
+    if match:
+        fields["document_number"] = _id_number(match.group(1))
+
+    for key, pattern in (("date_of_birth", DOB_RE), ("expiry", EXPIRY_RE)):
+        match = pattern.search(text)
+        value = parse_date(match.group(1)) if match else None
+        if value:
+            fields[key] = (value.isoformat(), _date_confidence(key, value, today))
+    return fields
+
+
+def parse_fields(text: str, today=None) -> dict:
+    """
+    Pull ID fields out of raw OCR text, preferring whichever of the MRZ and
+    the printed labels reads each field more confidently.
+    Returns {field: (value, confidence)} for the fields that were found.
+    """
+    fields = parse_labels(text, today)
+    for key, (value, confidence) in parse_mrz(text, today).items():
+        if confidence >= fields.get(key, (None, 0.0))[1]:
+            fields[key] = (value, confidence)
+    return fields
+
+
+def is_confident(fields: dict, threshold=FIELD_CONFIDENCE) -> bool:
+    return all(fields.get(key, (None, 0.0))[1] >= threshold for key in ("name", "document_number"))
+
+
+def vote(parses) -> dict:
+    """
+    Merge per-frame parses: each field takes the value with the most
+    confidence-weighted votes. Agreement between frames raises confidence,
+    disagreement lowers it.
+    """
+    merged = {}
+    keys = {key for fields in parses for key in fields}
+    for key in keys:
+        weights, confidences = {}, {}
+        for fields in parses:
+            if key in fields:
+                value, confidence = fields[key]
+                weights[value] = weights.get(value, 0.0) + confidence
+                confidences.setdefault(value, []).append(confidence)
+
+        value = max(weights, key=weights.get)
+        miss = 1.0
+        for confidence in confidences[value]:
+            miss *= 1.0 - confidence
+        share = weights[value] / sum(weights.values())
+        merged[key] = (value, round((1.0 - miss) * share, 3))
+    return merged
+
+
+class IDRecord:
+    """Typed result of an ID scan; `confidence` holds a 0..1 score per field found."""
+    __slots__ = FIELDS + ("confidence",)
+
+    def __init__(self, fields=None):
+        fields = fields or {}
+        for key in FIELDS:
+            setattr(self, key, fields[key][0] if key in fields else None)
+        self.confidence = {key: fields[key][1] for key in FIELDS if key in fields}
+
+    @classmethod
+    def from_text(cls, text, today=None):
+        return cls(parse_fields(text, today))
+
+    def is_confident(self, threshold=FIELD_CONFIDENCE) -> bool:
+        return all(self.confidence.get(key, 0.0) >= threshold for key in ("name", "document_number"))
+
+    def is_expired(self, today=None) -> bool:
+        if not self.expiry or self.confidence.get("expiry", 0.0) < FIELD_CONFIDENCE:
+            return False
+        return date.fromisoformat(self.expiry) < (today or date.today())
+
+    @property
+    def display_name(self):
+        return self.name.title() if self.name else None
+
+    def to_dict(self) -> dict:
+        return {key: {"value": getattr(self, key), "confidence": self.confidence[key]}
+                for key in FIELDS if key in self.confidence}
+
+
+def extract(text: str, today=None) -> IDRecord:
+    return IDRecord.from_text(text, today)
@@ -0,0 +1,187 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import logging
+
+# Allow running this file directly: `python apps/brain/ingest.py`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_DIR = os.path.join(CURRENT_DIR, "knowledge")
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+# Files directly in knowledge/ belong to the default property; every other
+# property has its own folder under knowledge/properties/<property id>/.
+DEFAULT_PROPERTY = os.getenv("BRAIN_PROPERTY", "default")
+PROPERTIES_DIR = "properties"
+# Language of files without a ".<lang>" suffix (e.g. menu.fr.txt)
+DEFAULT_LANGUAGE = os.getenv("BRAIN_DEFAULT_LANGUAGE", "en")
+LANGUAGE_SUFFIX = re.compile(r"\.([a-z]{2})\.[^.]+$", re.IGNORECASE)
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Chunks per embed_documents call
+EMBED_BATCH_SIZE = int(os.getenv("BRAIN_EMBED_BATCH", "64"))
+
+
+def property_dir(property_id=DEFAULT_PROPERTY, knowledge_dir=KNOWLEDGE_DIR):
+    if property_id == DEFAULT_PROPERTY:
+        return knowledge_dir
+    return os.path.join(knowledge_dir, PROPERTIES_DIR, property_id)
+
+
+def section_of(source: str) -> str:
+    """Top-level folder of a source file ("menus/dinner.txt" -> "menus"); "general" at the root."""
+    return source.split("/", 1)[0] if "/" in source else "general"
+
+
+def language_of(source: str) -> str:
+    match = LANGUAGE_SUFFIX.search(source)
+    return match.group(1).lower() if match else DEFAULT_LANGUAGE
+
+
+def iter_source_files(knowledge_dir=KNOWLEDGE_DIR):
+    """All .txt / .pdf files under `knowledge_dir` (other properties' folders excluded), in a stable order."""
+    for root, dirs, files in os.walk(knowledge_dir):
+        if root == knowledge_dir:
+            dirs[:] = [d for d in dirs if d != PROPERTIES_DIR]
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def load_documents(path):
+    if path.lower().endswith(".pdf"):
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path).load()
+    from langchain_community.document_loaders import TextLoader
+    return TextLoader(path, encoding="utf-8").load()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Content-addressed id: identical text from the same file always gets the same id."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def source_of(path, knowledge_dir=KNOWLEDGE_DIR) -> str:
+    return os.path.relpath(path, knowledge_dir).replace(os.sep, "/")
+
+
+def file_stamp(path) -> str:
+    """Cheap change marker for a source file (mtime and size), kept on each of its chunks."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _splitter():
+    from langchain_text_splitters import CharacterTextSplitter
+
+    # Split text into chunks ensures we get relevant paragraphs
+    return CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def split_file(path, source, property_id=DEFAULT_PROPERTY, text_splitter=None):
+    """{chunk_id: (text, metadata)} for one source file."""
+    text_splitter = text_splitter or _splitter()
+    stamp = file_stamp(path)
+    chunks = {}
+    for doc in text_splitter.split_documents(load_documents(path)):
+        cid = chunk_id(source, doc.page_content)
+        metadata = {"source": source, "content_hash": cid, "property": property_id,
+                    "section": section_of(source), "language": language_of(source), "file_stamp": stamp}
+        if "page" in doc.metadata:
+            metadata["page"] = doc.metadata["page"]
+        chunks[cid] = (doc.page_content, metadata)
+    return chunks
+
+
+def split_chunks(knowledge_dir=KNOWLEDGE_DIR, property_id=DEFAULT_PROPERTY):
+    """
+    Load and split every source document.
+    Returns {chunk_id: (text, metadata)}; duplicate chunks collapse into one entry.
+    Metadata carries the property, section and language used by filtered search.
+    """
+    text_splitter = _splitter()
+    chunks = {}
+    for path in iter_source_files(knowledge_dir):
+        chunks.update(split_file(path, source_of(path, knowledge_dir), property_id, text_splitter))
+    return chunks
+
+
+def _stored_files(vector_store):
+    """{source: (chunk ids, file stamps seen on them)} for everything already in the store."""
+    stored = vector_store.get(include=["metadatas"])
+    files = {}
+    for cid, metadata in zip(stored["ids"], stored["metadatas"]):
+        metadata = metadata or {}
+        ids, stamps = files.setdefault(metadata.get("source"), ([], set()))
+        ids.append(cid)
+        stamps.add(metadata.get("file_stamp"))
+    return files
+
+
+def ingest(vector_store, knowledge_dir=KNOWLEDGE_DIR, batch_size=EMBED_BATCH_SIZE,
+           property_id=DEFAULT_PROPERTY) -> dict:
+    """
+    Bring `vector_store` in line with the files in `knowledge_dir`.
+
+    Files whose mtime and size match the stamp on their stored chunks are
+    not even read. Changed files are re-split: only chunks whose content
+    hash is not in the store yet are embedded (in batches), the others just
+    get the new stamp; chunks that no longer exist in any file are deleted.
+    """
+    start = time.perf_counter()
+    stored = _stored_files(vector_store)
+    existing = {cid for ids, _ in stored.values() for cid in ids}
+
+    text_splitter = None
+    chunks, kept, skipped = {}, set(), 0
+    for path in iter_source_files(knowledge_dir):
+        source = source_of(path, knowledge_dir)
+        ids, stamps = stored.get(source, ((), set()))
+        if ids and stamps == {file_stamp(path)}:
+            kept.update(ids)
+            skipped += 1
+            continue
+        text_splitter = text_splitter or _splitter()
+        chunks.update(split_file(path, source, property_id, text_splitter))
+
+    new_ids = [cid for cid in chunks if cid not in existing]
+    restamp_ids = [cid for cid in chunks if cid in existing]
+    stale_ids = [cid for cid in existing if cid not in chunks and cid not in kept]
+
+    for i in range(0, len(stale_ids), batch_size):
+        vector_store.delete(ids=stale_ids[i:i + batch_size])
+
+    # Same text in an edited file: keep the embedding, record the file's new stamp
+    for i in range(0, len(restamp_ids), batch_size):
+        batch = restamp_ids[i:i + batch_size]
+        vector_store._collection.update(ids=batch, metadatas=[chunks[cid][1] for cid in batch])
+
+    for i in range(0, len(new_ids), batch_size):
+        batch = new_ids[i:i + batch_size]
+        vector_store.add_texts(
+            texts=[chunks[cid][0] for cid in batch],
+            metadatas=[chunks[cid][1] for cid in batch],
+            ids=batch,
+        )
+
+    report = {
+        "chunks": len(chunks) + len(kept),
+        "added": len(new_ids),
+        "deleted": len(stale_ids),
+        "unchanged": len(chunks) + len(kept) - len(new_ids),
+        "files_skipped": skipped,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    logging.info(f"Knowledge ingest ({property_id}): {report}")
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='[INGEST] %(message)s')
+    from apps.brain.knowledge_base import refresh_knowledge
+    print(refresh_knowledge())
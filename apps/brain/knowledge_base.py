@@ -1,65 +1,355 @@
 import os
+import re
+import json
+import time
 import logging
 import sys
-from langchain_community.document_loaders import TextLoader
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_text_splitters import CharacterTextSplitter
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future
+# Allow running this file directly for the self-test below
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from apps.brain.warmup import timed
+from apps.brain.metrics import span
+from apps.brain.ingest import ingest, property_dir, KNOWLEDGE_DIR, DEFAULT_PROPERTY
+from apps.brain.vector_index import FlatIndex, QueryBatcher, to_chroma_where
 
 # Define paths
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-# Ensure absolute path to the knowledge file
-KNOWLEDGE_FILE = os.path.join(CURRENT_DIR, "knowledge", "hotel_manual.txt")
 CHROMA_DB_DIR = os.path.join(CURRENT_DIR, "chroma_db")
 
-# Initialize embeddings (using a small, fast model)
-# running on CPU is fine for this scale
-embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-def load_knowledge():
-    # Helper to load and vectorize knowledge
-    
-    # Check if DB exists to avoid re-ingesting every restart 
-    # (Simple check: if dir exists and has files)
-    if os.path.exists(CHROMA_DB_DIR) and os.listdir(CHROMA_DB_DIR):
-        print("Loading existing knowledge base...", file=sys.stderr)
-        return Chroma(persist_directory=CHROMA_DB_DIR, embedding_function=embedding_function)
-
-    print("Creating new knowledge base...", file=sys.stderr)
-    if not os.path.exists(KNOWLEDGE_FILE):
-        raise FileNotFoundError(f"Knowledge file not found at {KNOWLEDGE_FILE}")
-        
-    loader = TextLoader(KNOWLEDGE_FILE)
-    documents = loader.load()
-    
-    # Split text into chunks ensures we get relevant paragraphs
-    text_splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = text_splitter.split_documents(documents)
-
-    # Create Chroma DB
-    db = Chroma.from_documents(docs, embedding_function, persist_directory=CHROMA_DB_DIR)
-    # logging.info to stderr
-    print(f"Knowledge base created with {len(docs)} chunks.", file=sys.stderr)
-    return db
-
-# Initialize the vector store globally
-try:
-    vector_store = load_knowledge()
-except Exception as e:
-    print(f"Failed to load knowledge base: {e}", file=sys.stderr)
-    vector_store = None
-
-def search_manual(query: str):
+# Query cache sizing. Guests ask the same handful of questions all day.
+QUERY_CACHE_SIZE = int(os.getenv("BRAIN_QUERY_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("BRAIN_SEMANTIC_CACHE_SIZE", "128"))
+# Cosine similarity above which two queries are treated as the same question
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("BRAIN_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEARCH_K = 2
+
+# HNSW graph per collection: M links per node, candidate lists at build / query time.
+# Only applied when a collection is created.
+HNSW_M = int(os.getenv("BRAIN_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("BRAIN_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("BRAIN_HNSW_EF_SEARCH", "64"))
+# "auto": exact in-memory search (vector_index.FlatIndex) for properties with up to
+# FLAT_MAX_CHUNKS chunks and HNSW above that; "flat" / "hnsw" force one or the other
+INDEX_MODE = os.getenv("BRAIN_KB_INDEX", "auto")
+FLAT_MAX_CHUNKS = int(os.getenv("BRAIN_KB_FLAT_MAX_CHUNKS", "20000"))
+FLAT_DTYPE = os.getenv("BRAIN_KB_FLAT_DTYPE", "float32")
+# Queries from concurrent requests arriving within this window are encoded together
+QUERY_BATCH_MS = float(os.getenv("BRAIN_QUERY_BATCH_MS", "2"))
+QUERY_BATCH_MAX = int(os.getenv("BRAIN_QUERY_BATCH_MAX", "32"))
+
+# Heavy objects are built on first use (or by the background warm-up),
+# so importing this module costs nothing.
+_embedding_function = None
+_embeddings_lock = threading.Lock()
+# property id -> Future of its PropertyKnowledge (None when loading failed).
+# The lock only guards the dict; each property loads outside it.
+_properties = {}
+_properties_lock = threading.Lock()
+
+# Property the current request is for (set per request by main; follows
+# the request onto worker threads like the metrics trace)
+_current_property = contextvars.ContextVar("brain_property", default=None)
+
+def set_property(property_id):
+    """Scope knowledge searches in the current request to `property_id` (None = default)."""
+    _current_property.set(property_id or None)
+
+def current_property():
+    return _current_property.get() or DEFAULT_PROPERTY
+
+def get_embeddings():
+    """Embedding model (small, fast; running on CPU is fine for this scale)."""
+    global _embedding_function
+    with _embeddings_lock:
+        if _embedding_function is None:
+            with timed("embeddings"):
+                from langchain_huggingface import HuggingFaceEmbeddings
+                _embedding_function = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        return _embedding_function
+
+query_batcher = QueryBatcher(get_embeddings, QUERY_BATCH_MS, QUERY_BATCH_MAX)
+
+# Also keeps "kb_<id>" a valid Chroma collection name
+PROPERTY_ID = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9_-]{0,62}[A-Za-z0-9])?")
+
+def collection_name(property_id):
+    return f"kb_{property_id}"
+
+class QueryCache:
     """
-    Search the hotel manual for the given query.
-    Returns the top 2 matching paragraphs.
+    Two-level cache in front of the vector search.
+
+    Level 1: exact match on the normalized query text (no encoder call at all).
+    Level 2: nearest neighbour over recent query embeddings; a hit above
+    `threshold` skips the vector search. Both levels are dropped whenever the
+    index changes.
+    """
+
+    def __init__(self, max_exact=QUERY_CACHE_SIZE, max_semantic=SEMANTIC_CACHE_SIZE,
+                 threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.max_exact = max_exact
+        self.max_semantic = max_semantic
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._exact = OrderedDict()
+        self._vectors = None  # (max_semantic, dim) unit vectors, filled as a ring
+        self._semantic_results = []
+        self._next_slot = 0
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self.latency_ms = {"exact_hits": 0.0, "semantic_hits": 0.0, "misses": 0.0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    def get_exact(self, key):
+        with self._lock:
+            results = self._exact.get(key)
+            if results is not None:
+                self._exact.move_to_end(key)
+            return results
+
+    def get_similar(self, vector):
+        import numpy as np
+
+        with self._lock:
+            if not self._semantic_results:
+                return None
+            filled = len(self._semantic_results)
+            query = np.asarray(vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            scores = self._vectors[:filled] @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._semantic_results[best]
+            return None
+
+    def put(self, key, vector, results, generation):
+        import numpy as np
+
+        with self._lock:
+            # The index changed while this search was running; don't cache stale results
+            if generation != self.generation:
+                return
+            self._exact[key] = results
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_exact:
+                self._exact.popitem(last=False)
+
+            if vector is None or not self.max_semantic:
+                return
+            vec = np.asarray(vector, dtype=np.float32)
+            vec /= np.linalg.norm(vec) or 1.0
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_semantic, vec.shape[0]), dtype=np.float32)
+            slot = self._next_slot
+            self._vectors[slot] = vec
+            if slot < len(self._semantic_results):
+                self._semantic_results[slot] = results
+            else:
+                self._semantic_results.append(results)
+            self._next_slot = (slot + 1) % self.max_semantic
+
+    def record(self, outcome, elapsed_ms):
+        with self._lock:
+            self.counters[outcome] += 1
+            self.latency_ms[outcome] += elapsed_ms
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._exact.clear()
+            self._vectors = None
+            self._semantic_results = []
+            self._next_slot = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.counters.values())
+            hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "avg_ms": {k: round(self.latency_ms[k] / n, 3) for k, n in self.counters.items() if n},
+                "entries": len(self._exact),
+            }
+
+
+query_cache = QueryCache()
+
+
+class PropertyKnowledge:
     """
-    if not vector_store:
+    One property's manuals: its knowledge folder, its own Chroma collection
+    (HNSW-indexed, persisted) and query cache, plus a FlatIndex snapshot of
+    the collection when the property is small enough to search exactly.
+    """
+
+    def __init__(self, property_id, knowledge_dir, cache):
+        self.property_id = property_id
+        self.knowledge_dir = knowledge_dir
+        self.cache = cache
+        self.store = None
+        self.flat = None
+        # One ingest at a time per property; other properties and searches go on
+        self._refresh_lock = threading.Lock()
+
+    def load(self):
+        from langchain_chroma import Chroma
+
+        self.store = Chroma(
+            collection_name=collection_name(self.property_id),
+            persist_directory=CHROMA_DB_DIR,
+            embedding_function=get_embeddings(),
+            collection_metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": HNSW_M,
+                "hnsw:construction_ef": HNSW_EF_CONSTRUCTION,
+                "hnsw:search_ef": HNSW_EF_SEARCH,
+            },
+        )
+        return self.refresh()
+
+    def refresh(self):
+        # Incremental: only new or edited chunks are embedded, removed ones are deleted
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        report = ingest(self.store, self.knowledge_dir, property_id=self.property_id)
+        if report["added"] or report["deleted"] or self.flat is None:
+            self._build_flat(report["chunks"])
+        if report["added"] or report["deleted"]:
+            self.cache.invalidate()
+        return report
+
+    def _build_flat(self, chunks):
+        if INDEX_MODE == "flat" or (INDEX_MODE == "auto" and chunks <= FLAT_MAX_CHUNKS):
+            self.flat = FlatIndex.from_store(self.store, FLAT_DTYPE)
+        else:
+            self.flat = None
+
+    def search(self, vector, k=SEARCH_K, where=None):
+        flat = self.flat
+        if flat is not None:
+            return [text for text, _, _ in flat.search(vector, k, where)]
+        docs = self.store.similarity_search_by_vector(vector, k=k, filter=to_chroma_where(where))
+        return [doc.page_content for doc in docs]
+
+    def stats(self) -> dict:
+        flat = self.flat
+        return {
+            "index": f"flat/{flat.matrix.dtype}" if flat is not None else "hnsw",
+            "chunks": len(flat) if flat is not None else self.store._collection.count(),
+            "flat_bytes": flat.nbytes if flat is not None else 0,
+            "query_cache": self.cache.stats(),
+        }
+
+
+def get_property(property_id=None):
+    """
+    The loaded knowledge base for `property_id` (default: the current
+    request's property). Callers arriving while another thread is loading
+    it (e.g. the warm-up) wait for that load instead of starting their own;
+    requests for other properties don't wait on it.
+    Returns None for unknown properties or when loading failed.
+    """
+    property_id = property_id or current_property()
+    with _properties_lock:
+        future = _properties.get(property_id)
+    if future is not None:
+        return future.result()
+
+    # The id comes from the request: it must name an existing folder, nothing else
+    knowledge_dir = property_dir(property_id, KNOWLEDGE_DIR)
+    if not PROPERTY_ID.fullmatch(property_id) or not os.path.isdir(knowledge_dir):
+        logging.warning(f"No knowledge folder for property '{property_id}'.")
+        return None
+    with _properties_lock:
+        future = _properties.get(property_id)
+        loading = future is None
+        if loading:
+            future = _properties[property_id] = Future()
+    if not loading:
+        return future.result()
+
+    kb = PropertyKnowledge(property_id, knowledge_dir,
+                           query_cache if property_id == DEFAULT_PROPERTY else QueryCache())
+    try:
+        with timed("vector_store" if property_id == DEFAULT_PROPERTY else f"vector_store.{property_id}"):
+            report = kb.load()
+        print(f"Knowledge base ready ({property_id}): {report}", file=sys.stderr)
+    except Exception as e:
+        print(f"Failed to load knowledge base for {property_id}: {e}", file=sys.stderr)
+        kb = None
+    future.set_result(kb)
+    return kb
+
+def get_vector_store(property_id=DEFAULT_PROPERTY):
+    """The Chroma store for `property_id`, loaded once (the warm-up loads the default one)."""
+    kb = get_property(property_id)
+    return kb.store if kb else None
+
+def refresh_knowledge(property_id=None):
+    """Re-sync a property's index after files in its folder were added, edited or removed."""
+    kb = get_property(property_id)
+    if not kb:
+        return {"error": "Knowledge base not available."}
+    return kb.refresh()
+
+def knowledge_stats() -> dict:
+    """Stats of the loaded properties; may count an HNSW collection, so keep it off the event loop."""
+    with _properties_lock:
+        done = [(pid, future.result()) for pid, future in _properties.items() if future.done()]
+    loaded = {pid: kb for pid, kb in done if kb is not None}
+    return {"properties": {pid: kb.stats() for pid, kb in loaded.items()},
+            "query_batching": query_batcher.stats()}
+
+def search_manual(query: str, section=None, language=None, k=SEARCH_K, property_id=None):
+    """
+    Search the current property's manuals for the given query, optionally
+    limited to one section (top-level folder) and/or language.
+    Returns the top `k` matching paragraphs.
+    """
+    start = time.perf_counter()
+    where = {key: value for key, value in (("section", section), ("language", language)) if value}
+    key = QueryCache.normalize(query)
+    if where:
+        key = f"{key}|{json.dumps(where, sort_keys=True)}"
+    if k != SEARCH_K:
+        key = f"{key}|k={k}"
+
+    kb = get_property(property_id)
+    if not kb:
         return ["Knowledge base not available."]
-        
+
+    cache = kb.cache
+    results = cache.get_exact(key)
+    if results is not None:
+        cache.record("exact_hits", (time.perf_counter() - start) * 1000.0)
+        return list(results)
+
     try:
-        results = vector_store.similarity_search(query, k=2)
-        return [doc.page_content for doc in results]
+        generation = cache.generation
+        # Encode once (batched with concurrent queries); the vector serves both the semantic cache and the search
+        with span("vector.embed"):
+            vector = query_batcher.embed(query)
+        # The semantic ring holds unfiltered top-k answers only
+        semantic = not where and k == SEARCH_K
+        results = cache.get_similar(vector) if semantic else None
+        outcome = "semantic_hits"
+        if results is None:
+            with span("vector.search"):
+                results = kb.search(vector, k, where)
+            outcome = "misses"
+        # Semantic hits only add the exact key; the ring keeps distinct questions
+        cache.put(key, vector if outcome == "misses" and semantic else None, results, generation)
+        cache.record(outcome, (time.perf_counter() - start) * 1000.0)
+        return list(results)
     except Exception as e:
         return [f"Error searching knowledge base: {e}"]
 
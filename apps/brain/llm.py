@@ -0,0 +1,362 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from apps.brain.metrics import histogram
+
+# "provider:model" entries, tried in order: the first is the primary, the rest are fallbacks
+LLM_BACKENDS = os.getenv("BRAIN_LLM_BACKENDS", "groq:llama-3.3-70b-versatile")
+# Seconds one backend gets (hedge included) and one LLM call gets across all backends
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("BRAIN_LLM_ATTEMPT_TIMEOUT", "8"))
+LLM_DEADLINE = float(os.getenv("BRAIN_LLM_DEADLINE", "15"))
+# Send a duplicate request when the first is slower than the backend's p95 (never sooner than HEDGE_MIN_MS)
+LLM_HEDGE = os.getenv("BRAIN_LLM_HEDGE", "1") != "0"
+HEDGE_MIN_MS = float(os.getenv("BRAIN_LLM_HEDGE_MIN_MS", "500"))
+# Calls a backend must have answered before its p95 is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+# Consecutive failures that open a backend's circuit, and how long it stays open (seconds)
+BREAKER_FAILURES = int(os.getenv("BRAIN_LLM_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BRAIN_LLM_BREAKER_COOLDOWN", "30"))
+# Provider-side retries (429 / 5xx) when BRAIN_LLM_BACKENDS has no fallback to fail over to
+LLM_SOLO_RETRIES = int(os.getenv("BRAIN_LLM_SOLO_RETRIES", "2"))
+
+# Exception classes (matched by name, so no provider SDK is imported) that mean the
+# backend is unreachable rather than that the request was bad
+TRANSIENT_ERRORS = {"TimeoutError", "ConnectionError", "APIConnectionError", "APITimeoutError", "TransportError"}
+
+# Provider calls are blocking; requests that blew their deadline finish here unobserved
+_llm_pool = ThreadPoolExecutor(max_workers=int(os.getenv("BRAIN_LLM_WORKERS", "32")), thread_name_prefix="brain-llm")
+
+_DONE = object()
+
+
+class LLMUnavailable(RuntimeError):
+    """No backend answered within the deadline."""
+
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+
+def is_transient(error) -> bool:
+    """True for timeouts, connection errors, 429 and 5xx; False for caller errors such as a bad request."""
+    if isinstance(error, LLMTimeout):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. `failures` failures in a row open it; while
+    open the backend is skipped, and after `cooldown` seconds one trial call
+    is let through (half-open) which closes it again or re-opens it.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failed = 0
+            self._probing = False
+
+    def record(self, error):
+        """Count `error` against the backend only if it says the backend is in trouble."""
+        if is_transient(error):
+            self.failure()
+        else:
+            # The backend answered, just not with a result
+            self.success()
+
+    def failure(self):
+        with self._lock:
+            self._failed += 1
+            if self.state == "half_open" or self._failed >= self.failures:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+class BackendHealth:
+    """Breaker, latency and counters for one backend, shared by all its tool bindings."""
+
+    def __init__(self, name):
+        self.breaker = CircuitBreaker()
+        self.latency = histogram(f"llm.backend.{name}")
+        # Streams are timed to their first chunk, kept apart from the invoke latencies hedging uses
+        self.first_chunk = histogram(f"llm.backend.{name}.first_chunk")
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "skipped": 0}
+
+    def count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None until enough calls were seen."""
+        if self.latency.count < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_MS, self.latency.percentile(95)) / 1000.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "breaker": self.breaker.state, "breaker_opened": self.breaker.opened,
+                    "p95_ms": round(self.latency.percentile(95), 3),
+                    "first_chunk_p95_ms": round(self.first_chunk.percentile(95), 3)}
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def backend_health(name) -> BackendHealth:
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = BackendHealth(name)
+        return health
+
+
+def llm_stats() -> dict:
+    with _health_lock:
+        backends = dict(_health)
+    return {name: health.stats() for name, health in backends.items()}
+
+
+class LLMBackend:
+    """One chat model endpoint; `name` keys its health, so re-binding tools keeps the history."""
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.health = backend_health(name)
+
+    def bind_tools(self, tools):
+        if not hasattr(self.model, "bind_tools"):
+            return self
+        return LLMBackend(self.name, self.model.bind_tools(tools))
+
+
+class ResilientLLM:
+    """
+    Chat model facade over `backends`, tried in order.
+
+    Every call has a deadline: one backend gets at most `attempt_timeout`
+    seconds, the whole call at most `deadline`, whatever the provider does.
+    A request still running after the backend's p95 latency gets one hedged
+    duplicate and the first answer wins. Backends whose circuit is open are
+    skipped. A stream fails over only until its first chunk; after that a
+    stall raises LLMTimeout instead of repeating half a reply.
+    """
+
+    def __init__(self, backends, attempt_timeout=LLM_ATTEMPT_TIMEOUT, deadline=LLM_DEADLINE, hedge=LLM_HEDGE):
+        self.backends = list(backends)
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge = hedge
+
+    def bind_tools(self, tools, **kwargs):
+        return ResilientLLM([b.bind_tools(tools) for b in self.backends],
+                            self.attempt_timeout, self.deadline, self.hedge)
+
+    @staticmethod
+    def _allowed(backend):
+        if backend.health.breaker.allow():
+            return True
+        backend.health.count("skipped")
+        return False
+
+    def invoke(self, messages, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        error = None
+        for backend in self.backends:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self._allowed(backend):
+                continue
+            try:
+                return self._attempt(backend, messages, min(self.attempt_timeout, remaining), kwargs)
+            except Exception as e:
+                error = e
+                logging.warning(f"LLM backend {backend.name} failed: {e!r}")
+        raise LLMUnavailable(f"no LLM backend answered ({error!r})")
+
+    def _attempt(self, backend, messages, timeout, kwargs):
+        health = backend.health
+        health.count("calls")
+        start = time.monotonic()
+        first = _llm_pool.submit(backend.model.invoke, messages, **kwargs)
+        pending = {first}
+        hedge_at = health.hedge_delay() if self.hedge else None
+        error = None
+        while pending:
+            now = time.monotonic()
+            if now >= start + timeout:
+                break
+            wait_for = start + timeout - now
+            if hedge_at is not None:
+                wait_for = min(wait_for, max(0.0, start + hedge_at - now))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    health.latency.record((time.monotonic() - start) * 1000.0)
+                    health.breaker.success()
+                    if future is not first:
+                        health.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+            if hedge_at is not None and pending and time.monotonic() >= start + hedge_at:
+                health.count("hedges")
+                pending.add(_llm_pool.submit(backend.model.invoke, messages, **kwargs))
+                hedge_at = None
+
+        if error is not None and not pending:
+            health.breaker.record(error)
+            health.count("errors")
+            raise error
+        health.breaker.failure()
+        health.count("timeouts")
+        raise LLMTimeout(f"{backend.name} took longer than {timeout:.1f}s")
+
+    def stream(self, messages, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        error = None
+        for backend in self.backends:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self._allowed(backend):
+                continue
+            health = backend.health
+            health.count("calls")
+            start = time.monotonic()
+            chunks, cancel = queue.Queue(), threading.Event()
+            _llm_pool.submit(self._pump, backend.model, messages, kwargs, chunks, cancel)
+            try:
+                first = chunks.get(timeout=min(self.attempt_timeout, remaining))
+            except queue.Empty:
+                first = LLMTimeout(f"{backend.name} sent nothing for {min(self.attempt_timeout, remaining):.1f}s")
+            if isinstance(first, Exception):
+                cancel.set()
+                health.breaker.record(first)
+                health.count("timeouts" if isinstance(first, LLMTimeout) else "errors")
+                error = first
+                logging.warning(f"LLM backend {backend.name} failed: {first!r}")
+                continue
+
+            health.first_chunk.record((time.monotonic() - start) * 1000.0)
+            # Committed to this backend from here on
+            try:
+                chunk = first
+                while chunk is not _DONE:
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield chunk
+                    wait_for = min(self.attempt_timeout, deadline - time.monotonic())
+                    try:
+                        chunk = chunks.get(timeout=max(0.0, wait_for))
+                    except queue.Empty:
+                        health.count("timeouts")
+                        raise LLMTimeout(f"{backend.name} stalled mid-reply")
+            except GeneratorExit:
+                # The caller stopped reading; the backend was answering, so a half-open probe passed
+                health.breaker.success()
+                raise
+            except Exception as e:
+                if not isinstance(e, LLMTimeout):
+                    health.count("errors")
+                health.breaker.record(e)
+                raise
+            finally:
+                cancel.set()
+            health.breaker.success()
+            return
+        raise LLMUnavailable(f"no LLM backend answered ({error!r})")
+
+    @staticmethod
+    def _pump(model, messages, kwargs, chunks, cancel):
+        try:
+            for chunk in model.stream(messages, **kwargs):
+                if cancel.is_set():
+                    return
+                chunks.put(chunk)
+            chunks.put(_DONE)
+        except Exception as e:
+            chunks.put(e)
+
+    def stats(self) -> dict:
+        return {b.name: b.health.stats() for b in self.backends}
+
+
+def _groq(model, timeout, retries):
+    from langchain_groq import ChatGroq
+    return ChatGroq(model=model, temperature=0, max_tokens=None, timeout=timeout, max_retries=retries)
+
+
+def _openai(model, timeout, retries):
+    # Any OpenAI-compatible endpoint: a second provider or a local vLLM / llama.cpp server
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=0, timeout=timeout, max_retries=retries,
+                      base_url=os.getenv("BRAIN_LLM_OPENAI_BASE_URL") or None)
+
+
+def _ollama(model, timeout, retries):
+    # Small local model on the kiosk host
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=model, temperature=0, base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+                      client_kwargs={"timeout": timeout})
+
+
+PROVIDERS = {
+    "groq": _groq,
+    "openai": _openai,
+    "ollama": _ollama,
+}
+
+
+def build_llm(spec=None) -> ResilientLLM:
+    """ResilientLLM over the "provider:model" list in `spec` or BRAIN_LLM_BACKENDS."""
+    backends = []
+    entries = [entry.strip() for entry in (spec or LLM_BACKENDS).split(",") if entry.strip()]
+    # With a fallback, a failed request moves on to it instead of being retried at the same provider
+    retries = 0 if len(entries) > 1 else LLM_SOLO_RETRIES
+    for entry in entries:
+        provider, _, model = entry.partition(":")
+        if provider not in PROVIDERS or not model:
+            raise ValueError(f"Unknown LLM backend: {entry}")
+        try:
+            backends.append(LLMBackend(entry, PROVIDERS[provider](model, LLM_ATTEMPT_TIMEOUT, retries)))
+        except ImportError as e:
+            logging.warning(f"LLM backend {entry} unavailable: {e}")
+    if not backends:
+        raise ValueError("No usable LLM backend configured (BRAIN_LLM_BACKENDS)")
+    return ResilientLLM(backends)
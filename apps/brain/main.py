@@ -3,170 +3,306 @@ import os
 # Add project root to sys.path to allow 'apps.brain' imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-import json
+import time
 import logging
 import asyncio
-import base64
-import nest_asyncio
+# Startup clock for the READY message
+_started = time.perf_counter()
 from dotenv import load_dotenv
-from deepgram import DeepgramClient
-import edge_tts
-from apps.brain.vision import scan_id_card
-
-from apps.brain.agent import Agent
-
-# Apply nest_asyncio to allow nested event loops if needed (though we try to stick to one main loop)
-nest_asyncio.apply()
+from apps.brain import tts
+from apps.brain.stt import get_stt_backend
+from apps.brain.vision import scan_id_card, scan_burst, configure_tesseract
+from apps.brain import warmup, metrics
+from apps.brain.knowledge_base import get_vector_store, refresh_knowledge, query_cache, set_property, knowledge_stats
+from apps.brain.prefetch import prefetch_stats
+from apps.brain.llm import llm_stats
+from apps.brain.dispatcher import Dispatcher, DEFAULT_MAX_CONCURRENCY
+from apps.brain.framing import as_bytes, get_transport, claim_stdout
+from apps.brain.sessions import SessionStore
+from apps.brain.router import IntentRouter
+from apps.brain.id_fields import extract
 
 # Configure logging to stderr
 logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='[BRAIN] %(message)s')
 
 load_dotenv()
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+MAX_CONCURRENCY = int(os.getenv("BRAIN_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+# Load the LLM client, vector store and OCR in the background right after startup
+WARMUP = os.getenv("BRAIN_WARMUP", "1") != "0"
+
+NO_SPEECH_REPLY = "I didn't hear anything."
+MISHEARD_REPLY = "I'm having trouble hearing you clearly."
+# Fixed voice replies rendered into the TTS phrase cache during warm-up
+PRERENDER_PHRASES = [NO_SPEECH_REPLY, MISHEARD_REPLY]
+
+# As the hotel manual names it
+HOTEL_NAME = os.getenv("BRAIN_HOTEL_NAME", "Grand Budapest Hotel")
+CHECKIN_REPLY = "Welcome to the " + HOTEL_NAME + ", {name}! Your ID checks out and you're all checked in. Is there anything I can help you with?"
+EXPIRED_ID_REPLY = "Thanks, {name}. This ID appears to have expired on {expiry}, so I can't use it for check-in. Could you scan a valid ID?"
 
-async def process_audio_flow(agent, audio_b64):
+def spoken_reply(text):
+    """Voice a fixed reply if its audio is already cached; never waits on TTS."""
+    audio = tts.phrase_cache.get(text)
+    if audio is None:
+        return {"type": "ASSISTANT_TEXT", "text": text}
+    return {"type": "TTS_AUDIO", "text": text, "audio": audio}
+
+async def process_audio_flow(audio, stt, run_agent, speak_stream=None):
     """
-    1. STT: Deepgram
+    1. STT: Deepgram (or whichever backend `stt` is)
     2. Logic: Agent
     3. TTS: EdgeTTS
+
+    `audio` is base64 text (JSON transport) or raw bytes (binary transport).
+
+    With `speak_stream`, steps 2 and 3 overlap: audio is sent sentence by
+    sentence as TTS_AUDIO_CHUNK messages and the reply ends with TTS_AUDIO_END.
     """
     try:
-        # 1. STT via Deepgram
-        if not DEEPGRAM_API_KEY:
-             return {"type": "ERROR", "text": "Deepgram API Key missing"}
-
-        # Initialize
-        deepgram = DeepgramClient(api_key=DEEPGRAM_API_KEY)
-        audio_data = base64.b64decode(audio_b64)
-        
-        # The 'transcribe_file' method in this namespace expects raw bytes for 'request'.
-        # We pass the raw audio_data directly. Deepgram detects WAV/WebM automatically.
-        options = {
-            "model": "nova-2",
-            "smart_format": True
-        }
-        
-        logging.info("Sending audio to Deepgram...")
-        
-        # Correct Call: User suggested passing raw bytes directly
-        response = deepgram.listen.v1.media.transcribe_file(
-            request=audio_data, 
-            **options
-        )
-
-        transcript = str(response.results.channels[0].alternatives[0].transcript)
+        # 1. STT (shared, pooled client; runs concurrently with other requests)
+        error = stt.check()
+        if error:
+             return {"type": "ERROR", "text": error}
+
+        audio_data = as_bytes(audio)
+        transcript = await stt.transcribe(audio_data)
         logging.info(f"Transcript: {transcript}")
 
         if not transcript or transcript == "None" or not transcript.strip():
-             return {"type": "ASSISTANT_TEXT", "text": "I didn't hear anything."}
+             return spoken_reply(NO_SPEECH_REPLY)
+
+        if speak_stream:
+            reply_text = await speak_stream(transcript)
+            logging.info(f"Agent Reply (streamed): {reply_text}")
+            return {"type": "TTS_AUDIO_END", "text": reply_text}
 
         # 2. Agent Logic
-        reply_text = agent.process_message(transcript)
+        reply_text = await run_agent(transcript)
         logging.info(f"Agent Reply: {reply_text}")
 
-        # 3. TTS via EdgeTTS
-        communicate = edge_tts.Communicate(reply_text, "en-US-AvaNeural")
-        
-        mp3_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                mp3_data += chunk["data"]
-        
-        mp3_b64 = base64.b64encode(mp3_data).decode('utf-8')
+        # 3. TTS via EdgeTTS (repeated replies come from the phrase cache)
+        mp3_data = await tts.phrase_cache.synthesize(reply_text)
 
+        # Raw bytes: the transport base64-encodes them only in JSON mode
         return {
             "type": "TTS_AUDIO",
             "text": reply_text,
-            "audio": mp3_b64
+            "audio": mp3_data
         }
 
     except Exception as e:
         logging.error(f"Voice Flow Error: {e}")
         # Return a polite error to the UI so the user knows something happened
-        return {"type": "ASSISTANT_TEXT", "text": "I'm having trouble hearing you clearly."}
+        return spoken_reply(MISHEARD_REPLY)
+
+# Message types that read or extend a session's conversation
+SESSION_TYPES = {"PROCESS_TEXT", "PROCESS_AUDIO", "PROCESS_IMAGE", "PROCESS_IMAGE_BURST"}
+
+def session_lock(sessions, default_type="PROCESS_TEXT"):
+    """
+    Dispatcher `lock_for`: turns of one session run one at a time, in arrival
+    order; different sessions run freely. Handlers rely on it and don't lock.
+    """
+    def lock_for(data):
+        if data.get("type", default_type) in SESSION_TYPES:
+            return sessions.get(data.get("session_id")).lock
+        return None
+    return lock_for
+
+def build_handlers(sessions, dispatcher, stt, router):
+    """Map each protocol message type to an async handler (see `session_lock`)."""
+
+    async def try_route(session, text):
+        # FAQ / availability fast path: answer from the tools, no LLM round trip
+        reply = await dispatcher.run_blocking(router.route, text)
+        if reply is not None:
+            session.agent.record_turn(text, reply)
+        return reply
+
+    async def run_agent(session_id, text, route=True):
+        # Each kiosk/guest has its own history (the dispatcher holds its lock)
+        session = sessions.get(session_id)
+        if route:
+            reply = await try_route(session, text)
+            if reply is not None:
+                return reply
+        return await dispatcher.run_blocking(session.agent.process_message, text)
+
+    async def handle_text(data):
+        text = data.get("text", "")
+        logging.info(f"Processing Text: {text}")
+        reply = await run_agent(data.get("session_id"), text)
+        return {"type": "ASSISTANT_TEXT", "text": reply}
+
+    async def handle_audio(data):
+        audio = data.get("audio", "")
+        logging.info(f"Processing Audio ({len(audio)} bytes)")
+        session_id = data.get("session_id")
+
+        speak_stream = None
+        if data.get("stream"):
+            async def speak_stream(transcript):
+                session = sessions.get(session_id)
+                reply = await try_route(session, transcript)
+                return await tts.speak_stream(
+                    iter([reply]) if reply is not None else session.agent.stream_message(transcript),
+                    dispatcher.reply_to(data),
+                    dispatcher.run_blocking,
+                )
+
+        return await process_audio_flow(audio, stt, lambda text: run_agent(session_id, text), speak_stream)
+
+    async def check_in(session_id, extracted_text, record=None):
+        if not extracted_text.strip():
+            logging.warning("OCR failed to extract text.")
+            return "I couldn't read the ID. Please hold it steady and try again."
+
+        # Confident local parse: templated reply, no LLM call
+        record = record or extract(extracted_text)
+        if record.is_confident():
+            template = EXPIRED_ID_REPLY if record.is_expired() else CHECKIN_REPLY
+            reply = template.format(name=record.display_name, expiry=record.expiry)
+            # A one-line note keeps the guest's name in history without the OCR dump
+            sessions.get(session_id).agent.record_turn(f"SYSTEM: Guest scanned their ID: {record.display_name}.", reply)
+            return reply
+
+        # Otherwise we inject the OCR text into the chat context so the LLM can decide
+        prompt = f"SYSTEM: A guest just scanned their ID. The OCR text read: '{extracted_text}'. If this contains a name, welcome the guest by name and confirm check-in. If it's unclear, ask them to retry."
+        return await run_agent(session_id, prompt, route=False)
+
+    async def handle_image(data):
+        image = data.get("image", "")
+        logging.info(f"Processing ID Scan...")
+
+        # 1. Scan the Image (Tesseract is blocking)
+        extracted_text = await dispatcher.run_blocking(scan_id_card, image)
+        logging.info(f"OCR Result: {extracted_text}")
+
+        # 2. Parse the ID fields; the Agent only verifies what we couldn't read confidently
+        record = extract(extracted_text)
+        reply = await check_in(data.get("session_id"), extracted_text, record)
+        return {"type": "ASSISTANT_TEXT", "text": reply, "id": record.to_dict()}
+
+    async def handle_image_burst(data):
+        # Several frames of one ID: blurry ones are skipped, the rest are OCR'd until one reads cleanly
+        frames = data.get("frames") or []
+        logging.info(f"Processing ID Scan burst ({len(frames)} frames)...")
+
+        scan = await dispatcher.run_blocking(scan_burst, frames)
+        record = scan["record"]
+        logging.info(f"Burst OCR: {scan['ocr']}/{scan['frames']} frames read, fields {record.to_dict()}")
+
+        reply = await check_in(data.get("session_id"), scan["text"], record)
+        stats = {key: scan[key] for key in ("frames", "sharp", "ocr", "early_exit")}
+        return {"type": "ASSISTANT_TEXT", "text": reply, "id": record.to_dict(), "scan": stats}
+
+    async def handle_status(data):
+        return {
+            "type": "STATUS",
+            "warm": warmup.is_warm(),
+            "timings": warmup.timings(),
+            "query_cache": query_cache.stats(),
+            "router": router.stats(),
+            "tools": metrics.snapshot("tool."),
+            "tts_cache": tts.phrase_cache.stats(),
+            "sessions": sessions.stats(),
+        }
+
+    async def handle_stats(data):
+        # Per-stage latency histograms (request.*, llm.*, tool.*, ocr.*, ...)
+        # Off the event loop: knowledge stats may hit Chroma
+        stats = await dispatcher.run_blocking(cache_stats, router, sessions)
+        return {"type": "STATS", "spans": metrics.snapshot(data.get("prefix", "")), **stats}
+
+    async def handle_refresh_knowledge(data):
+        # Re-embeds only chunks whose content changed in the property's knowledge folder
+        report = await dispatcher.run_blocking(refresh_knowledge, data.get("property"))
+        return {"type": "KNOWLEDGE_REFRESHED", "report": report}
+
+    handlers = {
+        "PROCESS_TEXT": handle_text,
+        "PROCESS_AUDIO": handle_audio,
+        "PROCESS_IMAGE": handle_image,
+        "PROCESS_IMAGE_BURST": handle_image_burst,
+        "STATUS": handle_status,
+        "STATS": handle_stats,
+        "REFRESH_KNOWLEDGE": handle_refresh_knowledge,
+    }
+    return {name: for_property(handler) for name, handler in handlers.items()}
+
+def for_property(handler):
+    """Knowledge searches made while handling a request use its "property" (default if absent)."""
+    async def run(data):
+        set_property(data.get("property"))
+        return await handler(data)
+    return run
+
+def cache_stats(router, sessions):
+    return {
+        "sessions": sessions.stats(),
+        "query_cache": query_cache.stats(),
+        "router": router.stats(),
+        "tts_cache": tts.phrase_cache.stats(),
+        "knowledge": knowledge_stats(),
+        "prefetch": prefetch_stats.stats(),
+        "llm": llm_stats(),
+    }
+
+def make_agent():
+    # Imported on first use: langchain + the tool stack dominate cold start
+    from apps.brain.agent import Agent
+    return Agent()
+
+def prerender_phrases():
+    # Warm-up runs on its own thread, so it gets its own event loop
+    with warmup.timed("tts_phrases"):
+        asyncio.run(tts.phrase_cache.prerender(PRERENDER_PHRASES))
+
+def warm_llm():
+    from apps.brain.agent import get_llm
+    return get_llm()
+
+async def serve(sessions):
+    # Responses only on fd 1 from here on; everything else printed goes to the log
+    claim_stdout()
+    dispatcher = Dispatcher({}, max_concurrency=MAX_CONCURRENCY, transport=get_transport(),
+                            lock_for=session_lock(sessions))
+    stt = get_stt_backend()
+    router = IntentRouter()
+    dispatcher.handlers = build_handlers(sessions, dispatcher, stt, router)
+    logging.info(f"Dispatcher ready (max concurrency {MAX_CONCURRENCY}, STT: {stt.name}, "
+                 f"transport: {dispatcher.transport.name}).")
+
+    if WARMUP:
+        warmup.start_background_warmup([
+            ("llm", warm_llm),
+            ("vector_store", get_vector_store),
+            ("tesseract", configure_tesseract),
+            ("tts_phrases", prerender_phrases),
+        ])
+
+    # No-op unless BRAIN_STATS_FILE is set
+    metrics.start_periodic_dump(extra=lambda: cache_stats(router, sessions))
+
+    # Requests that need a component which is still warming up simply wait for it
+    startup = round(time.perf_counter() - _started, 3)
+    dispatcher.emit({"type": "READY", "startup_seconds": startup})
+    logging.info(f"Brain ready in {startup:.2f}s.")
+    try:
+        await dispatcher.serve()
+    finally:
+        await stt.aclose()
+        dispatcher.shutdown()
 
 def main():
     logging.info("Brain process started (Voice Enabled).")
-    
-    try:
-        agent = Agent()
-        logging.info("Agent initialized.")
-    except Exception as e:
-        logging.error(f"Failed to initialize Agent: {e}")
-        agent = None
 
-    # We need an asyncio loop for async STT/TTS
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    sessions = SessionStore(make_agent)
 
     try:
-        for line in sys.stdin:
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                data = json.loads(line)
-                msg_type = data.get("type", "PROCESS_TEXT")
-                
-                if msg_type == "PROCESS_TEXT":
-                    text = data.get("text", "")
-                    logging.info(f"Processing Text: {text}")
-                    if agent:
-                        reply = agent.process_message(text)
-                        response = {"type": "ASSISTANT_TEXT", "text": reply}
-                    else:
-                        response = {"type": "ERROR", "text": "Agent offline"}
-                    print(json.dumps(response), flush=True)
-
-                elif msg_type == "PROCESS_AUDIO":
-                    audio_b64 = data.get("audio", "")
-                    logging.info(f"Processing Audio ({len(audio_b64)} bytes)")
-                    
-                    if agent:
-                        # Run async flow synchronously here
-                        response = loop.run_until_complete(process_audio_flow(agent, audio_b64))
-                    else:
-                        response = {"type": "ERROR", "text": "Agent offline"}
-                        
-                    print(json.dumps(response), flush=True)
-
-                elif msg_type == "PROCESS_IMAGE":
-                    image_b64 = data.get("image", "")
-                    logging.info(f"Processing ID Scan...")
-                    
-                    # 1. Scan the Image
-                    extracted_text = scan_id_card(image_b64)
-                    logging.info(f"OCR Result: {extracted_text}")
-                    
-                    if not extracted_text.strip():
-                        logging.warning("OCR failed to extract text.")
-                        response = {"type": "ASSISTANT_TEXT", "text": "I couldn't read the ID. Please hold it steady and try again."}
-                    else:
-                        # 2. Ask the Agent to Verify
-                        # We inject the OCR text into the chat context so the LLM can decide
-                        prompt = f"SYSTEM: A guest just scanned their ID. The OCR text read: '{extracted_text}'. If this contains a name, welcome the guest by name and confirm check-in. If it's unclear, ask them to retry."
-                        
-                        if agent:
-                            reply = agent.process_message(prompt)
-                            response = {"type": "ASSISTANT_TEXT", "text": reply}
-                        else:
-                            response = {"type": "ERROR", "text": "Agent offline"}
-                        
-                    print(json.dumps(response), flush=True)
-
-                else:
-                    logging.warning(f"Unknown message type: {msg_type}")
-
-            except json.JSONDecodeError:
-                logging.error(f"Invalid JSON: {line}")
-            except Exception as e:
-                logging.error(f"Error processing line: {e}")
-                
+        asyncio.run(serve(sessions))
     except KeyboardInterrupt:
         logging.info("Brain stopping...")
-    finally:
-        loop.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Bucket upper bounds in milliseconds (roughly x1.5 apart, 0.05ms .. ~2min).
+# Fixed buckets keep recording O(log n) and memory constant.
+BUCKETS_MS = [0.05 * 1.5 ** i for i in range(38)]
+
+
+class Histogram:
+    """Thread-safe latency histogram with fixed buckets; `unit` only names the snapshot keys."""
+
+    def __init__(self, name, unit="ms"):
+        self.name = name
+        self.unit = unit
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float):
+        index = bisect.bisect_left(BUCKETS_MS, ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th sample (max for the overflow bucket)."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = pct / 100.0 * self.count
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if seen >= target:
+                    if index < len(BUCKETS_MS):
+                        return min(BUCKETS_MS[index], self.max_ms)
+                    return self.max_ms
+            return self.max_ms
+
+    def snapshot(self) -> dict:
+        unit = self.unit
+        return {
+            "count": self.count,
+            f"avg_{unit}": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            f"p50_{unit}": round(self.percentile(50), 3),
+            f"p95_{unit}": round(self.percentile(95), 3),
+            f"p99_{unit}": round(self.percentile(99), 3),
+            f"max_{unit}": round(self.max_ms, 3),
+        }
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, unit: str = "ms") -> Histogram:
+    """Get or create the process-wide histogram called `name`."""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram(name, unit))
+    return hist
+
+
+def snapshot(prefix: str = "") -> dict:
+    return {name: h.snapshot() for name, h in sorted(_histograms.items()) if name.startswith(prefix)}
+
+
+# --- Spans ----------------------------------------------------------------
+
+# Spans of the request being handled, as a list of (name, ms). Context
+# variables follow asyncio tasks; Dispatcher.run_blocking carries the
+# context onto worker threads.
+_trace = contextvars.ContextVar("brain_trace", default=None)
+
+
+def start_trace() -> list:
+    """Begin collecting spans for the current request (task / context)."""
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage: feeds the `name` histogram and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000.0
+        histogram(name).record(ms)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, round(ms, 3)))
+
+
+def traced(name: str):
+    """Decorator form of `span` for plain functions."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Periodic dump --------------------------------------------------------
+
+STATS_FILE = os.getenv("BRAIN_STATS_FILE")
+STATS_INTERVAL = float(os.getenv("BRAIN_STATS_INTERVAL", "60"))
+
+
+def dump(path: str, extra: dict = None):
+    """Write all histograms (plus `extra`) to `path` as JSON, atomically."""
+    payload = {"time": time.time(), "spans": snapshot(), **(extra or {})}
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
+
+
+def start_periodic_dump(path: str = None, interval: float = STATS_INTERVAL, extra=None):
+    """
+    Dump stats to `path` (BRAIN_STATS_FILE) every `interval` seconds on a
+    daemon thread. `extra` is an optional callable returning more fields.
+    Does nothing when no path is configured.
+    """
+    path = path or STATS_FILE
+    if not path:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(path, extra() if extra else None)
+            except Exception as e:
+                logging.warning(f"Stats dump to {path} failed: {e}")
+
+    thread = threading.Thread(target=run, name="brain-stats", daemon=True)
+    thread.start()
+    return thread
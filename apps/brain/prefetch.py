@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.brain.metrics import span, histogram
+from apps.brain.router import INTENTS, normalize
+
+# Start likely tool calls while the first LLM call of a turn is in flight
+PREFETCH_ENABLED = os.getenv("BRAIN_PREFETCH", "1") != "0"
+# Speculative calls get their own small pool and a cap on calls in flight, so
+# guesses never queue in front of the tool calls the LLM actually asked for
+PREFETCH_WORKERS = int(os.getenv("BRAIN_PREFETCH_WORKERS", "2"))
+PREFETCH_MAX_INFLIGHT = int(os.getenv("BRAIN_PREFETCH_MAX_INFLIGHT", "4"))
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="brain-prefetch")
+_inflight = threading.BoundedSemaphore(PREFETCH_MAX_INFLIGHT)
+
+# Only tools without side effects are ever run speculatively
+AVAILABILITY_WORDS = {"book", "booking", "reserve", "reservation", "available", "availability",
+                      "free", "vacancy", "vacancies", "tonight"}
+ROOM_NUMBER = re.compile(r"\broom\s*(?:number\s*|no\.?\s*|#\s*)?(\d{2,4})\b", re.IGNORECASE)
+# Only named topics trigger a speculative manual search, with the query the LLM
+# usually sends for them (the router's lookups): the guest's own words are never
+# the exact query, and a search for them could not be handed over
+POLICY_QUERIES = [(intent.keywords, intent.query) for intent in INTENTS if intent.tool == "lookup_hotel_policy"]
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def predict(text: str, names) -> list:
+    """(tool name, args) the LLM is likely to ask for, limited to the tools in `names`."""
+    predictions = []
+    words = set(_WORD.findall(text.lower()))
+    if "check_room_availability" in names and words & AVAILABILITY_WORDS:
+        predictions.append(("check_room_availability", {}))
+    if "describe_specific_room" in names:
+        for number in dict.fromkeys(ROOM_NUMBER.findall(text)):
+            predictions.append(("describe_specific_room", {"room_number": number}))
+    if "lookup_hotel_policy" in names:
+        padded = f" {normalize(text)} "
+        for keywords, query in POLICY_QUERIES:
+            if any(f" {k} " in padded for k in keywords):
+                predictions.append(("lookup_hotel_policy", {"query": query}))
+    return predictions
+
+
+def _normalized(args) -> dict:
+    # Same normalization as the knowledge base's query cache key: case, punctuation, spacing
+    return {k: " ".join(_WORD.findall(v.lower())) if isinstance(v, str) else v
+            for k, v in args.items() if v not in (None, "")}
+
+
+def _same_args(predicted, actual) -> bool:
+    """A prefetched result is only used for the very call the LLM asked for."""
+    return _normalized(predicted) == _normalized(actual)
+
+
+class PrefetchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"started": 0, "skipped": 0, "hits": 0, "wasted": 0, "saved_ms": 0.0}
+
+    def add(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.counters["started"]
+            return {**self.counters,
+                    "saved_ms": round(self.counters["saved_ms"], 3),
+                    "hit_rate": round(self.counters["hits"] / started, 3) if started else 0.0}
+
+
+prefetch_stats = PrefetchStats()
+
+
+class _Speculation:
+    __slots__ = ("name", "args", "future", "started", "finished")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.future = None
+        self.started = time.perf_counter()
+        self.finished = None
+
+
+class Prefetch:
+    """
+    Speculative tool calls for one guest turn.
+
+    `start` submits the predicted calls to `pool` (at most
+    PREFETCH_MAX_INFLIGHT across all turns); when the LLM then asks for the
+    same tool with the same arguments, `claim` hands over the running (or
+    finished) future instead of starting the call again. Whatever is not
+    claimed by `close` is counted as wasted and its result dropped.
+    """
+
+    def __init__(self, tool_map, pool=None, inflight=None):
+        self.tool_map = tool_map
+        self.pool = pool or _prefetch_pool
+        self.inflight = inflight or _inflight
+        self._pending = []
+
+    def start(self, text, names):
+        for name, args in predict(str(text), names):
+            tool_func = self.tool_map.get(name)
+            if tool_func is None:
+                continue
+            if not self.inflight.acquire(blocking=False):
+                prefetch_stats.add("skipped")
+                continue
+            speculation = _Speculation(name, args)
+            # Same context as the turn: the knowledge lookup needs the request's property
+            context = contextvars.copy_context()
+            speculation.future = self.pool.submit(context.run, self._run, speculation, tool_func)
+            speculation.future.add_done_callback(lambda _: self.inflight.release())
+            self._pending.append(speculation)
+            prefetch_stats.add("started")
+
+    def _run(self, speculation, tool_func):
+        try:
+            with span(f"prefetch.{speculation.name}"):
+                return tool_func.invoke(speculation.args)
+        finally:
+            speculation.finished = time.perf_counter()
+
+    def claim(self, name, args):
+        """The prefetched future for this call, or None if nothing matching was started."""
+        for speculation in self._pending:
+            if speculation.name == name and _same_args(speculation.args, args):
+                self._pending.remove(speculation)
+                claimed = time.perf_counter()
+                speculation.future.add_done_callback(lambda _, s=speculation: self._saved(s, claimed))
+                prefetch_stats.add("hits")
+                return speculation.future
+        return None
+
+    @staticmethod
+    def _saved(speculation, claimed):
+        # Time the call had already been running when the LLM asked for it
+        saved_ms = (min(speculation.finished or claimed, claimed) - speculation.started) * 1000.0
+        prefetch_stats.add("saved_ms", saved_ms)
+        histogram("prefetch.saved").record(saved_ms)
+
+    def close(self):
+        if self._pending:
+            prefetch_stats.add("wasted", len(self._pending))
+        self._pending = []
@@ -0,0 +1,246 @@
+import os
+import re
+import time
+import logging
+import threading
+
+# Minimum confidence for answering without the LLM
+ROUTER_THRESHOLD = float(os.getenv("BRAIN_ROUTER_THRESHOLD", "0.75"))
+# Also score against MiniLM prototypes once the embedding model is loaded
+ROUTER_USE_EMBEDDINGS = os.getenv("BRAIN_ROUTER_EMBEDDINGS", "1") != "0"
+# Long, chatty turns are more likely to need the LLM
+MAX_ROUTABLE_WORDS = 14
+# A keyword hit alone stays below the threshold: the rest of the turn must also
+# look like one of the intent's prototype questions
+KEYWORD_SCORE = 0.5
+
+# Ignored when comparing a turn's words with an intent's prototypes
+FILLER_WORDS = {"a", "an", "the", "is", "are", "am", "be", "do", "does", "you", "your", "i", "we", "me",
+                "what", "whats", "s", "when", "where", "which", "how", "there", "any", "have", "has",
+                "can", "could", "please", "of", "to", "in", "on", "at", "for", "and", "it", "this", "that"}
+
+# Words that turn a question into a request the LLM has to handle (booking, complaints, ...)
+ACTION_WORDS = {"book", "reserve", "cancel", "change", "complain", "broken", "refund", "upgrade", "my",
+                "want", "need"}
+
+# The availability fast path only knows tonight; a turn naming other dates goes to the
+# LLM, which passes check_in / check_out to check_room_availability
+DATE_WORDS = {"tomorrow", "weekend", "week", "month", "next", "nights", "from", "until", "till", "through",
+              "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+              "january", "february", "march", "april", "may", "june", "july", "august", "september",
+              "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+              "sept", "oct", "nov", "dec"}
+# 12/05 and 2026-10-20 (normalized to "12 05", "2026 10 20"), 3rd, 21st
+DATE_PATTERN = re.compile(r"\b\d{1,4} \d{1,2}\b|\b\d{1,2}(st|nd|rd|th)\b")
+
+
+def mentions_dates(norm: str) -> bool:
+    """True if the (normalized) turn names a day other than tonight or a length of stay."""
+    return bool(DATE_WORDS.intersection(norm.split())) or bool(DATE_PATTERN.search(norm))
+
+
+def content_words(text: str) -> set:
+    """Words of a normalized text minus filler, with a trailing plural 's' dropped."""
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in text.split()} - FILLER_WORDS
+
+
+def is_section_header(line: str) -> bool:
+    """Manual headings like "1. CHECK-IN/OUT", which name a topic but answer nothing."""
+    line = line.strip()
+    return bool(re.match(r"\d+\.\s", line)) or (line.isupper() and ":" not in line)
+
+
+class Intent:
+    """A question the router can answer straight from a tool."""
+    __slots__ = ("name", "keywords", "prototypes", "tool", "query", "line_keys", "template")
+
+    def __init__(self, name, keywords, prototypes, tool, template, query=None, line_keys=None):
+        self.name = name
+        self.keywords = keywords
+        self.prototypes = prototypes
+        self.tool = tool
+        self.query = query
+        # For manual lookups: only answer if a line mentioning one of these is found
+        self.line_keys = line_keys
+        self.template = template
+
+
+INTENTS = [
+    Intent("wifi", {"wifi", "wi fi", "internet", "wireless", "network"},
+           ["what is the wifi password", "how do I get on the internet"],
+           "lookup_hotel_policy", "Here are the Wi-Fi details: {answer}",
+           query="wifi password", line_keys=("wi-fi", "wifi")),
+    Intent("pool", {"pool", "swim", "swimming"},
+           ["when is the pool open", "pool hours"],
+           "lookup_hotel_policy", "Of course! {answer}",
+           query="pool hours", line_keys=("pool",)),
+    Intent("checkout", {"checkout", "check out", "late checkout"},
+           ["what time is check out", "when do I have to leave"],
+           "lookup_hotel_policy", "Of course! {answer}",
+           query="check-out time", line_keys=("check-out", "late checkout")),
+    Intent("checkin", {"checkin", "check in", "checkin time", "check in time", "early checkin", "early check in"},
+           ["what time is check in", "when can I check in"],
+           "lookup_hotel_policy", "Of course! {answer}",
+           query="check-in time", line_keys=("check-in",)),
+    Intent("breakfast", {"breakfast"},
+           ["when is breakfast served", "where is breakfast"],
+           "lookup_hotel_policy", "Of course! {answer}",
+           query="breakfast hours", line_keys=("breakfast",)),
+    Intent("amenities", {"amenities", "facilities", "bar"},
+           ["what facilities does the hotel have", "what amenities do you offer"],
+           "get_hotel_amenities", "Here's what we offer:\n{answer}"),
+    Intent("availability", {"available", "availability", "free rooms", "vacancy", "vacancies"},
+           ["which rooms are available", "do you have any free rooms tonight"],
+           "check_room_availability", "{answer}"),
+]
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower().replace("-", " ")).split())
+
+
+def format_rooms(rooms):
+    if not rooms:
+        return "I'm sorry, we have no rooms available right now."
+    listing = ", ".join(f"room {r['number']} (${r['price']:.0f}/night)" for r in rooms)
+    return f"We currently have {listing} available. Would you like me to book one for you?"
+
+
+class IntentRouter:
+    """
+    Answers high-confidence FAQ / availability turns directly from the tools.
+
+    A keyword hit scores KEYWORD_SCORE, raised by how much of the rest of the
+    turn is covered by the intent's prototype questions; turns without a
+    keyword are scored by cosine similarity to the prototypes using the MiniLM
+    model the knowledge base already loads. Anything below `threshold`
+    returns None and goes to the LLM.
+    """
+
+    def __init__(self, tools=None, threshold=ROUTER_THRESHOLD, intents=INTENTS, embeddings=None):
+        self._tools = tools
+        self.threshold = threshold
+        self.intents = intents
+        self._embeddings = embeddings
+        self._prototype_vectors = None
+        self._vocabulary = {i.name: content_words(normalize(" ".join([*i.prototypes, *i.keywords])))
+                            for i in intents}
+        self._lock = threading.Lock()
+        self.counters = {"routed": 0, "fallthrough": 0}
+        self.by_intent = {}
+        self.route_ms = 0.0
+
+    @property
+    def tools(self):
+        if self._tools is None:
+            from apps.brain.tools import tools
+            self._tools = {t.name: t.invoke for t in tools}
+        return self._tools
+
+    def _keyword_scores(self, text):
+        padded = f" {text} "
+        words = content_words(text)
+        scores = {}
+        for intent in self.intents:
+            if any(f" {k} " in padded for k in intent.keywords):
+                covered = len(words & self._vocabulary[intent.name]) / len(words) if words else 1.0
+                scores[intent.name] = KEYWORD_SCORE + (1.0 - KEYWORD_SCORE) * covered
+        return scores
+
+    def _embedding_scores(self, text):
+        embeddings = self._embeddings
+        if embeddings is None and ROUTER_USE_EMBEDDINGS:
+            # Only reuse the model if it is already loaded; never block a turn on it
+            from apps.brain import knowledge_base
+            embeddings = knowledge_base._embedding_function
+        if embeddings is None:
+            return {}
+
+        import numpy as np
+
+        if self._prototype_vectors is None:
+            names, phrases = [], []
+            for intent in self.intents:
+                for phrase in intent.prototypes:
+                    names.append(intent.name)
+                    phrases.append(phrase)
+            vectors = np.asarray(embeddings.embed_documents(phrases), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._prototype_vectors = (names, vectors)
+
+        names, vectors = self._prototype_vectors
+        query = np.asarray(embeddings.embed_query(text), dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = {}
+        for name, score in zip(names, vectors @ query):
+            scores[name] = max(scores.get(name, 0.0), float(score))
+        return scores
+
+    def classify(self, text):
+        """Return (intent, confidence) for the best match, or (None, 0.0)."""
+        norm = normalize(text)
+        words = norm.split()
+        if not words or len(words) > MAX_ROUTABLE_WORDS or ACTION_WORDS.intersection(words):
+            return None, 0.0
+
+        scores = self._keyword_scores(norm)
+        if len(scores) > 1:
+            # Two different topics in one turn: let the LLM combine them
+            return None, 0.0
+        if not scores:
+            scores = self._embedding_scores(text)
+        if not scores:
+            return None, 0.0
+
+        name = max(scores, key=scores.get)
+        intent = next(i for i in self.intents if i.name == name)
+        # Only tonight's full list is known here: dates, room numbers and party sizes need the LLM
+        if intent.tool == "check_room_availability" and (mentions_dates(norm) or re.search(r"\d", norm)):
+            return None, 0.0
+        return intent, scores[name]
+
+    def _answer(self, intent):
+        tool = self.tools[intent.tool]
+        if intent.tool == "check_room_availability":
+            return format_rooms(tool({}))
+        if intent.tool == "lookup_hotel_policy":
+            text = tool({"query": intent.query})
+            # Quote only the manual line(s) about this topic; otherwise defer to the LLM
+            lines = [line.strip(" -") for line in text.splitlines()
+                     if any(key in line.lower() for key in intent.line_keys) and not is_section_header(line)]
+            return " ".join(l if l.endswith((".", "!", "?")) else f"{l}." for l in lines) or None
+        return "\n".join(line.strip() for line in str(tool({})).splitlines() if line.strip())
+
+    def route(self, text):
+        """Reply text if this turn can be answered without the LLM, else None."""
+        start = time.perf_counter()
+        reply = None
+        intent, confidence = self.classify(text)
+        if intent is not None and confidence >= self.threshold:
+            try:
+                answer = self._answer(intent)
+                if answer:
+                    reply = intent.template.format(answer=answer)
+            except Exception as e:
+                logging.warning(f"Router tool {intent.tool} failed: {e}")
+
+        with self._lock:
+            self.route_ms += (time.perf_counter() - start) * 1000.0
+            if reply is None:
+                self.counters["fallthrough"] += 1
+            else:
+                self.counters["routed"] += 1
+                self.by_intent[intent.name] = self.by_intent.get(intent.name, 0) + 1
+        if reply is not None:
+            logging.info(f"Routed '{text}' to {intent.name} ({confidence:.2f})")
+        return reply
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.counters["routed"] + self.counters["fallthrough"]
+            return {
+                **self.counters,
+                "hit_rate": round(self.counters["routed"] / total, 3) if total else 0.0,
+                "avg_ms": round(self.route_ms / total, 3) if total else 0.0,
+                "by_intent": dict(self.by_intent),
+            }
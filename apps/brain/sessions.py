@@ -0,0 +1,85 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+# Keep memory flat no matter how many guests walk past the kiosks in a day
+MAX_SESSIONS = int(os.getenv("BRAIN_MAX_SESSIONS", "500"))
+SESSION_IDLE_TTL = float(os.getenv("BRAIN_SESSION_TTL", "1800"))  # seconds
+DEFAULT_SESSION_ID = "default"
+
+
+class Session:
+    """Conversation state for one kiosk / guest."""
+    __slots__ = ("session_id", "agent", "lock", "last_used")
+
+    def __init__(self, session_id, agent):
+        self.session_id = session_id
+        self.agent = agent
+        # Turns of the same session must not interleave; different sessions run freely
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Maps a session/kiosk id to its own Agent.
+
+    Sessions idle for longer than `idle_ttl` are dropped, and once `max_sessions`
+    is reached the least recently used one is evicted. The OrderedDict is kept in
+    last-use order, so both checks only ever look at the front.
+    """
+
+    def __init__(self, agent_factory, max_sessions=MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL, clock=time.monotonic):
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+        self.evicted_bytes = 0
+
+    def get(self, session_id=None) -> Session:
+        """Return the session for `session_id`, creating it if needed."""
+        session_id = session_id or DEFAULT_SESSION_ID
+        now = self.clock()
+        self._expire(now)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            while len(self._sessions) >= self.max_sessions:
+                self._evict_oldest()
+            session = Session(session_id, self.agent_factory())
+            self._sessions[session_id] = session
+            self.created += 1
+        else:
+            self._sessions.move_to_end(session_id)
+
+        session.last_used = now
+        return session
+
+    def _expire(self, now):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used < self.idle_ttl:
+                break
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        session_id, session = self._sessions.popitem(last=False)
+        self.evicted += 1
+        self.evicted_bytes += session.agent.history_bytes()
+        logging.debug(f"Evicted session {session_id}")
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        return {
+            "live_sessions": len(self._sessions),
+            "created": self.created,
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+        }
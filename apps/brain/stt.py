@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from apps.brain.metrics import span
+
+# Upper bound on transcriptions in flight at once (per brain process)
+STT_MAX_CONCURRENCY = int(os.getenv("BRAIN_STT_CONCURRENCY", "4"))
+STT_TIMEOUT = float(os.getenv("BRAIN_STT_TIMEOUT", "15"))
+
+
+class STTBackend:
+    """
+    Long-lived speech-to-text backend.
+
+    Subclasses implement `_transcribe`; callers use `transcribe`, which bounds
+    how many requests run concurrently so a burst of utterances queues here
+    instead of opening a connection per request.
+    """
+    name = "base"
+
+    def __init__(self, max_concurrency=STT_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def check(self):
+        """Return an error message if the backend cannot be used, else None."""
+        return None
+
+    async def transcribe(self, audio: bytes) -> str:
+        async with self._semaphore:
+            with span("stt.transcribe"):
+                return await self._transcribe(audio)
+
+    async def _transcribe(self, audio: bytes) -> str:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class DeepgramSTT(STTBackend):
+    """Deepgram pre-recorded API over one pooled async HTTP client."""
+    name = "deepgram"
+
+    def __init__(self, api_key=None, model="nova-2", max_concurrency=STT_MAX_CONCURRENCY, timeout=STT_TIMEOUT):
+        super().__init__(max_concurrency)
+        self.api_key = api_key or os.getenv("DEEPGRAM_API_KEY")
+        self.model = model
+        self.timeout = timeout
+        self._client = None
+
+    def check(self):
+        if not self.api_key:
+            return "Deepgram API Key missing"
+        return None
+
+    def _get_client(self):
+        # Created on first use so it binds to the running event loop;
+        # the httpx pool keeps connections warm between utterances.
+        if self._client is None:
+            import httpx
+            from deepgram import AsyncDeepgramClient
+
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._client = AsyncDeepgramClient(api_key=self.api_key, httpx_client=self._http)
+        return self._client
+
+    async def _transcribe(self, audio: bytes) -> str:
+        client = self._get_client()
+        logging.info("Sending audio to Deepgram...")
+        # Deepgram detects WAV/WebM automatically from the raw bytes
+        response = await client.listen.v1.media.transcribe_file(
+            request=bytes(audio),
+            model=self.model,
+            smart_format=True,
+        )
+        return str(response.results.channels[0].alternatives[0].transcript)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._http.aclose()
+            self._client = None
+
+
+class StubSTT(STTBackend):
+    """Offline stand-in: returns a fixed transcript after a simulated delay."""
+    name = "stub"
+
+    def __init__(self, transcript=None, latency_ms=None, max_concurrency=STT_MAX_CONCURRENCY):
+        super().__init__(max_concurrency)
+        self.transcript = transcript if transcript is not None else os.getenv("BRAIN_STUB_TRANSCRIPT", "What time is check-out?")
+        self.latency_ms = float(latency_ms if latency_ms is not None else os.getenv("BRAIN_STUB_STT_MS", "0"))
+
+    async def _transcribe(self, audio: bytes) -> str:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        return self.transcript
+
+
+BACKENDS = {
+    DeepgramSTT.name: DeepgramSTT,
+    StubSTT.name: StubSTT,
+}
+
+
+def get_stt_backend(name=None) -> STTBackend:
+    """Build the backend selected by `name` or BRAIN_STT_BACKEND (default: deepgram)."""
+    name = name or os.getenv("BRAIN_STT_BACKEND", DeepgramSTT.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend: {name}")
+    return BACKENDS[name]()
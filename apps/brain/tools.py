@@ -1,4 +1,4 @@
-from typing import List, Dict, Union
+from typing import List, Optional
 from langchain_core.tools import tool
 from apps.brain.database import Database
 from apps.brain.knowledge_base import search_manual
@@ -7,12 +7,16 @@ from apps.brain.knowledge_base import search_manual
 db = Database()
 
 @tool
-def check_room_availability() -> List[dict]:
+def check_room_availability(check_in: Optional[str] = None, check_out: Optional[str] = None) -> List[dict]:
     """
-    Check which rooms are available for booking. 
+    Check which rooms are available for booking.
+    Optionally pass check_in / check_out dates (YYYY-MM-DD) to check a future stay.
     Returns a list of room numbers and prices.
     """
-    return db.check_availability()
+    try:
+        return db.check_availability(check_in, check_out)
+    except ValueError as e:
+        return [{"error": str(e)}]
 
 @tool
 def describe_specific_room(room_number: str) -> str:
@@ -38,18 +42,23 @@ def get_hotel_amenities() -> str:
     """
 
 @tool
-def book_room(room_number: str, guest_name: str) -> str:
-    """Book a room for a guest. Returns success or failure message."""
-    success, msg = db.book_room(room_number, guest_name)
+def book_room(room_number: str, guest_name: str, check_in: Optional[str] = None, check_out: Optional[str] = None) -> str:
+    """
+    Book a room for a guest. Dates are YYYY-MM-DD; leave them empty to book tonight.
+    Returns success or failure message.
+    """
+    success, msg = db.book_room(room_number, guest_name, check_in, check_out)
     return msg
 
 @tool
-def lookup_hotel_policy(query: str) -> str:
+def lookup_hotel_policy(query: str, section: Optional[str] = None, language: Optional[str] = None) -> str:
     """
     Useful for answering questions about check-in, Wi-Fi, pool hours, and amenities.
     Input should be a specific question like 'when is the pool open?' or 'wifi password'.
+    Optionally narrow it to one section of the manuals (e.g. 'menus', 'local_guide')
+    or a language code ('en', 'fr') when the guest asked in that language.
     """
-    results = search_manual(query)
+    results = search_manual(query, section=section, language=language)
     if not results:
         return "I couldn't find that information in the guest manual."
     return "\n\n".join(results)
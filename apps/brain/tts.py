@@ -0,0 +1,371 @@
+import os
+import re
+import mmap
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from apps.brain.metrics import span
+
+VOICE = "en-US-AvaNeural"
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TTS_CACHE_DIR = os.getenv("BRAIN_TTS_CACHE_DIR", os.path.join(CURRENT_DIR, "tts_cache"))
+TTS_CACHE_MEMORY_BYTES = int(float(os.getenv("BRAIN_TTS_CACHE_MEMORY_MB", "32")) * 1024 * 1024)
+TTS_CACHE_DISK_BYTES = int(float(os.getenv("BRAIN_TTS_CACHE_DISK_MB", "256")) * 1024 * 1024)
+# Phrases up to this long go to disk on first synthesis; longer ones only once they come up again
+TTS_CACHE_PERSIST_CHARS = int(os.getenv("BRAIN_TTS_CACHE_PERSIST_CHARS", "40"))
+# How many not-yet-persisted phrases are remembered as seen once
+TTS_CACHE_SEEN_ENTRIES = 4096
+
+# A sentence ends at . ! or ? followed by whitespace. Very short fragments
+# ("Hi.", "Mr.") are merged into the next sentence so each TTS call is worth it.
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+MIN_SENTENCE_CHARS = 20
+
+
+async def stream_audio(text: str, voice: str = VOICE):
+    """Yield raw MP3 chunks for `text` as EdgeTTS produces them."""
+    # Imported here: edge_tts is slow to import and not needed until the first voice reply
+    import edge_tts
+
+    communicate = edge_tts.Communicate(text, voice)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def synthesize(text: str, voice: str = VOICE, stream=stream_audio) -> bytearray:
+    """Synthesize `text` into one MP3 buffer (appended in place, no re-copying)."""
+    mp3_data = bytearray()
+    with span("tts.synthesize"):
+        async for data in stream(text, voice):
+            mp3_data.extend(data)
+    return mp3_data
+
+
+def normalize_phrase(text: str) -> str:
+    """Cache key text: same words and punctuation -> same audio."""
+    text = unicodedata.normalize("NFKC", text).replace("\u2019", "'").replace("\u201c", '"').replace("\u201d", '"')
+    return " ".join(text.split())
+
+
+class PhraseCache:
+    """
+    Content-addressed MP3 cache keyed by (voice, normalized text).
+
+    Two tiers: an in-memory LRU bounded in bytes, and files under `directory`
+    bounded by `disk_bytes` (least recently used files are removed first,
+    tracked in an index built from one directory scan). Only short phrases and
+    phrases heard a second time are written to disk, so one-off sentences of
+    streamed replies don't push out the ones that recur. Disk hits are
+    memory-mapped rather than read, and the mapping is what the memory tier
+    keeps, so hot phrases cost neither a copy nor a synthesis.
+
+    `synth` is the TTS used on a miss (EdgeTTS unless overridden per call).
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_bytes=TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes=TTS_CACHE_DISK_BYTES, synth=synthesize, persist_chars=TTS_CACHE_PERSIST_CHARS):
+        self.directory = directory
+        self.synth = synth
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.persist_chars = persist_chars
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        # key -> file size, least recently used first; None until the directory is scanned
+        self._disk = None
+        self._disk_size = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bytes_saved": 0, "prerendered": 0}
+
+    @staticmethod
+    def key(text: str, voice: str = VOICE) -> str:
+        return hashlib.sha256(f"{voice}\0{normalize_phrase(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _remember(self, key, audio):
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = audio
+            self._memory_size += len(audio)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _map(self, key):
+        """Memory-map the cached file for `key`, or None if it isn't on disk."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Touch it so a later index scan sees it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if self._disk is not None and key in self._disk:
+                self._disk.move_to_end(key)
+        return memoryview(mapped)
+
+    def get(self, text: str, voice: str = VOICE):
+        """Cached audio for `text` (bytes-like), or None. Never synthesizes."""
+        return self._lookup(self.key(text, voice))
+
+    def _lookup(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                self.counters["bytes_saved"] += len(audio)
+                return audio
+
+        audio = self._map(key)
+        if audio is not None:
+            self._remember(key, audio)
+            with self._lock:
+                self.counters["disk_hits"] += 1
+                self.counters["bytes_saved"] += len(audio)
+        return audio
+
+    def _load_index(self):
+        """Build the disk index from the files already cached (oldest first). Call with _lock held."""
+        entries = []
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(".mp3")], stat.st_size))
+        self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._disk_size = sum(self._disk.values())
+
+    def _should_persist(self, key, text):
+        """Whether `key` belongs on disk: short, or asked for before."""
+        with self._lock:
+            if self._disk is None:
+                self._load_index()
+            if key in self._disk:
+                return False
+            if len(normalize_phrase(text)) <= self.persist_chars or key in self._seen:
+                self._seen.pop(key, None)
+                return True
+            self._seen[key] = True
+            if len(self._seen) > TTS_CACHE_SEEN_ENTRIES:
+                self._seen.popitem(last=False)
+            return False
+
+    def _store(self, key, audio):
+        """Write `audio` to the disk tier (atomically) and trim it to `disk_bytes`."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._disk is None:
+                self._load_index()
+            # An overwritten key replaces its old size
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            self._disk_size += len(audio)
+            for old, size in list(self._disk.items()):
+                if self._disk_size <= self.disk_bytes:
+                    break
+                if old == key:
+                    continue
+                try:
+                    os.remove(self._path(old))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue  # e.g. still mapped on Windows; try again next time
+                del self._disk[old]
+                self._disk_size -= size
+
+    async def _persist(self, key, audio):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._store, key, audio)
+        except OSError as e:
+            logging.warning(f"Could not write TTS cache entry: {e}")
+
+    async def synthesize(self, text: str, voice: str = VOICE, synth=None, persist=False):
+        """
+        Like `synthesize`, but served from the cache when this phrase was spoken
+        before. `persist` writes it to disk even if it is long and new.
+        """
+        key = self.key(text, voice)
+        audio = self._lookup(key)
+        if audio is not None:
+            # Second request for a phrase that so far lives only in memory
+            if self._should_persist(key, text):
+                await self._persist(key, audio)
+            return audio
+
+        loop = asyncio.get_running_loop()
+        # The same phrase requested twice at once is synthesized once
+        # (keyed per loop: warm-up pre-renders on its own loop)
+        pending = self._inflight.get((loop, key))
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        with self._lock:
+            self.counters["misses"] += 1
+        task = asyncio.ensure_future((synth or self.synth)(text, voice))
+        self._inflight[(loop, key)] = task
+        try:
+            audio = await task
+        finally:
+            self._inflight.pop((loop, key), None)
+
+        if audio:
+            # A view, like disk hits: the buffer goes to the cache and the encoder uncopied
+            audio = memoryview(audio)
+            self._remember(key, audio)
+            if persist or self._should_persist(key, text):
+                await self._persist(key, audio)
+        return audio
+
+    async def prerender(self, phrases, voice: str = VOICE, synth=None):
+        """Make sure every phrase in `phrases` is cached (synthesizing only the missing ones)."""
+        for text in phrases:
+            if self.get(text, voice) is None:
+                await self.synthesize(text, voice, synth, persist=True)
+                with self._lock:
+                    self.counters["prerendered"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk) if self._disk is not None else None,
+                "disk_bytes": self._disk_size if self._disk is not None else None,
+            }
+
+
+phrase_cache = PhraseCache()
+
+
+def split_sentences(deltas):
+    """
+    Turn a stream of LLM text deltas into a stream of whole sentences.
+    Whatever is left when the stream ends is flushed as the last sentence.
+    """
+    pending = ""
+    for delta in deltas:
+        pending += delta
+        parts = SENTENCE_END.split(pending)
+        # The last part may still be growing
+        pending = parts.pop()
+        sentence = ""
+        for part in parts:
+            sentence = f"{sentence} {part}" if sentence else part
+            if len(sentence) >= MIN_SENTENCE_CHARS:
+                yield sentence
+                sentence = ""
+        if sentence:
+            # A split only happens at whitespace, so keep one space after the carried text
+            pending = f"{sentence} {pending}"
+    if pending.strip():
+        yield pending.strip()
+
+
+async def speak_stream(deltas, emit, run_blocking, voice: str = VOICE, synth=None) -> str:
+    """
+    Streaming voice reply.
+
+    `deltas` is a blocking generator of reply text (e.g. Agent.stream_message);
+    it is drained on a worker thread via `run_blocking`. Each sentence is sent
+    to TTS as soon as it is complete (repeated sentences come from the
+    phrase cache), and audio goes out in order as TTS_AUDIO_CHUNK messages
+    through `emit`. Returns the full reply text. If synthesis or `emit`
+    fails, `deltas` is closed and drained before the error is re-raised.
+    """
+    synth = synth or phrase_cache.synthesize
+    loop = asyncio.get_running_loop()
+    sentences = asyncio.Queue()
+    done = object()
+    # Set when the reply is abandoned, so the worker stops pulling from the LLM
+    stop = threading.Event()
+
+    def until_stopped():
+        for delta in deltas:
+            if stop.is_set():
+                break
+            yield delta
+
+    def produce():
+        try:
+            for sentence in split_sentences(until_stopped()):
+                loop.call_soon_threadsafe(sentences.put_nowait, sentence)
+        finally:
+            if hasattr(deltas, "close"):
+                deltas.close()
+            loop.call_soon_threadsafe(sentences.put_nowait, done)
+
+    producer = asyncio.ensure_future(run_blocking(produce))
+
+    # Synthesis of sentence N+1 overlaps with sending sentence N; order is kept
+    # by awaiting the synthesis tasks in the order the sentences arrived.
+    pending = asyncio.Queue()
+
+    async def schedule():
+        while True:
+            sentence = await sentences.get()
+            if sentence is done:
+                await pending.put(done)
+                return
+            await pending.put((sentence, asyncio.ensure_future(synth(sentence, voice))))
+
+    scheduler = asyncio.ensure_future(schedule())
+
+    parts = []
+    seq = 0
+    try:
+        while True:
+            item = await pending.get()
+            if item is done:
+                break
+            sentence, task = item
+            audio = await task
+            emit({
+                "type": "TTS_AUDIO_CHUNK",
+                "seq": seq,
+                "text": sentence,
+                "audio": audio,
+            })
+            parts.append(sentence)
+            seq += 1
+        # Surface LLM errors raised on the worker thread
+        await producer
+    finally:
+        stop.set()
+        scheduler.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item is not done:
+                item[1].cancel()
+        # The caller may release the session once we return, so the agent
+        # must be finished with it by then
+        try:
+            await producer
+        except Exception:
+            pass
+
+    logging.info(f"Streamed {seq} audio chunks.")
+    return " ".join(parts)
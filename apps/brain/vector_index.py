@@ -0,0 +1,183 @@
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+# Rows upcast per step when searching a float16 matrix (NumPy has no float16 BLAS)
+UPCAST_BLOCK = 4096
+
+
+def to_chroma_where(where):
+    """{"section": "menus", "language": ["en", "fr"]} -> Chroma's where syntax (None if empty)."""
+    clauses = [{key: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value}
+               for key, value in (where or {}).items()]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class FlatIndex:
+    """
+    Exact cosine search over unit vectors kept in one NumPy matrix.
+
+    For a property with a few thousand chunks a single matrix-vector product
+    beats walking an HNSW graph, and recall is exact. float16 storage halves
+    the memory but each search has to upcast, so it is slower; use it when
+    many small properties are loaded at once. Built once and never mutated:
+    a refresh builds a new index and swaps it in.
+    """
+
+    def __init__(self, ids, texts, metadatas, vectors, dtype="float32"):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = [m or {} for m in metadatas]
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(self.ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = (matrix / norms).astype(dtype)
+        self._columns = {}
+        self._columns_lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store, dtype="float32"):
+        """Snapshot a Chroma store (embeddings included) into a flat index."""
+        data = store.get(include=["embeddings", "documents", "metadatas"])
+        vectors = data["embeddings"]
+        if vectors is None or len(vectors) == 0:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        return cls(data["ids"], data["documents"], data["metadatas"], vectors, dtype)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+    def _column(self, key):
+        column = self._columns.get(key)
+        if column is None:
+            with self._columns_lock:
+                column = self._columns.setdefault(
+                    key, np.array([m.get(key) for m in self.metadatas], dtype=object))
+        return column
+
+    def _mask(self, where):
+        mask = None
+        for key, value in (where or {}).items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            match = np.isin(self._column(key), values)
+            mask = match if mask is None else mask & match
+        return mask
+
+    def _scores(self, queries):
+        """(n_queries, n_chunks) cosine scores for unit `queries`."""
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+        return np.concatenate([queries @ self.matrix[i:i + UPCAST_BLOCK].astype(np.float32).T
+                               for i in range(0, len(self), UPCAST_BLOCK)], axis=1)
+
+    def search_batch(self, vectors, k=2, where=None):
+        """Top-`k` (text, metadata, score) per query vector; one matrix product for the batch."""
+        if not len(self):
+            return [[] for _ in vectors]
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = self._scores(queries / norms)
+
+        mask = self._mask(where)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+        k = min(k, len(self))
+        if k <= 0:
+            return [[] for _ in vectors]
+
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(self.texts[i], self.metadatas[i], float(row[i])) for i in top])
+        return results
+
+    def search(self, vector, k=2, where=None):
+        return self.search_batch([vector], k, where)[0]
+
+
+class _Batch:
+    __slots__ = ("items", "full")
+
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+
+
+class QueryBatcher:
+    """
+    Coalesces embed_query calls from concurrent requests into one
+    embed_documents call: the first caller of a batch waits up to
+    `window_ms` (or until `max_batch` queries joined), encodes everything
+    that arrived, and hands each caller its vector. Identical texts in a
+    batch are encoded once. `window_ms=0` encodes every query on its own.
+
+    `embeddings` is a zero-argument callable returning the embedding model,
+    so the model is still loaded lazily.
+    """
+
+    def __init__(self, embeddings, window_ms=2.0, max_batch=32):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._batch = None
+        self.counters = {"queries": 0, "batches": 0, "encoded": 0}
+
+    def embed(self, text):
+        if self.window <= 0:
+            with self._lock:
+                self.counters["queries"] += 1
+                self.counters["batches"] += 1
+                self.counters["encoded"] += 1
+            return self.embeddings().embed_query(text)
+
+        future = Future()
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.items.append((text, future))
+            if len(batch.items) >= self.max_batch:
+                # Closed: later callers start the next batch
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self._run(batch.items)
+        return future.result()
+
+    def _run(self, items):
+        texts = list(dict.fromkeys(text for text, _ in items))
+        try:
+            vectors = dict(zip(texts, self.embeddings().embed_documents(texts)))
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.counters["queries"] += len(items)
+            self.counters["batches"] += 1
+            self.counters["encoded"] += len(texts)
+        for text, future in items:
+            future.set_result(vectors[text])
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches = self.counters["batches"]
+            return {**self.counters,
+                    "avg_batch": round(self.counters["queries"] / batches, 2) if batches else 0.0}
@@ -2,15 +2,21 @@ import base64
 import cv2
 import numpy as np
 import pytesseract
-from PIL import Image
-import io
 import os
 import shutil
 import sys
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from apps.brain.warmup import timed
+from apps.brain.metrics import span, traced
+from apps.brain.id_fields import IDRecord, parse_fields, is_confident, vote
 
 # CRITICAL: Point to your Tesseract EXE (Update path if different)
 # Common path on Windows:
-# We will use the default path provided or try to find it. 
+# We will use the default path provided or try to find it.
 # Best practice: Check if it's in PATH, otherwise fallback to common location.
 common_paths = [
     r'C:\Program Files\Tesseract-OCR\tesseract.exe',
@@ -18,43 +24,305 @@ common_paths = [
     os.path.join(os.getenv('LOCALAPPDATA', ''), r'Tesseract-OCR\tesseract.exe')
 ]
 
-tesseract_cmd = shutil.which("tesseract")
-if not tesseract_cmd:
-    for path in common_paths:
-        if os.path.exists(path):
-            tesseract_cmd = path
+# An ID-1 card is 85.6mm wide; ~1000px across it is ~300 DPI, Tesseract's sweet spot
+OCR_TARGET_WIDTH = 1000
+CARD_ASPECT = 85.6 / 53.98
+# The card must cover at least this fraction of the frame to be cropped to
+MIN_CARD_AREA = 0.15
+OCR_TIMEOUT = float(os.getenv("BRAIN_OCR_TIMEOUT", "10"))
+# OCR worker processes; 0 runs OCR in the calling thread
+OCR_WORKERS = int(os.getenv("BRAIN_OCR_WORKERS", "2"))
+# Burst mode: frames below this Laplacian variance are too blurry to OCR
+BLUR_THRESHOLD = float(os.getenv("BRAIN_BLUR_THRESHOLD", "60"))
+# ...and at most this many of the sharpest frames are OCR'd
+BURST_MAX_OCR = int(os.getenv("BRAIN_BURST_MAX_OCR", "3"))
+
+_tesseract_cmd = None
+_tesseract_checked = False
+_tesseract_lock = threading.Lock()
+
+def configure_tesseract():
+    """Locate the Tesseract binary once (on first scan or during warm-up)."""
+    global _tesseract_cmd, _tesseract_checked
+    with _tesseract_lock:
+        if _tesseract_checked:
+            return _tesseract_cmd
+
+        with timed("tesseract"):
+            tesseract_cmd = shutil.which("tesseract")
+            if not tesseract_cmd:
+                for path in common_paths:
+                    if os.path.exists(path):
+                        tesseract_cmd = path
+                        break
+
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            print(f"Tesseract found and configured at: {tesseract_cmd}", file=sys.stderr)
+        else:
+            print("WARNING: Tesseract not found. OCR will fail.", file=sys.stderr)
+
+        _tesseract_cmd = tesseract_cmd
+        _tesseract_checked = True
+        return tesseract_cmd
+
+
+# --- Pre-processing -------------------------------------------------------
+
+def decode_image(image) -> np.ndarray:
+    """Decode base64 text (optionally a data: URL) or raw bytes straight to grayscale."""
+    if isinstance(image, str):
+        if "," in image:
+            image = image.split(",", 1)[1]
+        image = base64.b64decode(image)
+    buffer = np.frombuffer(image, dtype=np.uint8)
+    gray = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("Could not decode image")
+    return gray
+
+
+def _order_corners(points):
+    # top-left, top-right, bottom-right, bottom-left
+    points = points.reshape(4, 2).astype(np.float32)
+    s = points.sum(axis=1)
+    d = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(s)], points[np.argmin(d)], points[np.argmax(s)], points[np.argmax(d)]],
+                    dtype=np.float32)
+
+
+def find_card(gray: np.ndarray) -> np.ndarray:
+    """
+    Crop to the ID card if a large four-cornered outline is found
+    (perspective-corrected); otherwise return the frame unchanged.
+    """
+    # Work on a small copy: contour finding doesn't need full resolution
+    scale = 640.0 / max(gray.shape)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    scale = min(scale, 1.0)
+
+    edges = cv2.Canny(cv2.GaussianBlur(small, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, None, iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    frame_area = small.shape[0] * small.shape[1]
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < MIN_CARD_AREA * frame_area:
             break
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) != 4:
+            continue
+
+        corners = _order_corners(approx) / scale
+        width = int(max(np.linalg.norm(corners[1] - corners[0]), np.linalg.norm(corners[2] - corners[3])))
+        height = int(width / CARD_ASPECT)
+        target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(gray, matrix, (width, height))
+    return gray
+
+
+def resize_for_ocr(gray: np.ndarray, target_width=OCR_TARGET_WIDTH) -> np.ndarray:
+    height, width = gray.shape[:2]
+    if width == target_width:
+        return gray
+    interpolation = cv2.INTER_AREA if width > target_width else cv2.INTER_CUBIC
+    return cv2.resize(gray, (target_width, int(height * target_width / width)), interpolation=interpolation)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    # Adaptive threshold copes with glare and shadows where a fixed 150 cut-off doesn't
+    gray = cv2.medianBlur(gray, 3)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+
+def prepare(image) -> np.ndarray:
+    """Decode -> crop to card -> scale to ~300 DPI (grayscale, not yet binarized)."""
+    return resize_for_ocr(find_card(decode_image(image)))
+
+
+@traced("ocr.preprocess")
+def preprocess(image) -> np.ndarray:
+    """Decode -> crop to card -> scale to ~300 DPI -> adaptive threshold."""
+    return binarize(prepare(image))
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the Laplacian: low for motion-blurred or out-of-focus frames."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+# --- OCR ------------------------------------------------------------------
+
+# One tesserocr API per thread: PyTessBaseAPI is not thread-safe, and with
+# BRAIN_OCR_WORKERS=0 scans run on several dispatcher threads at once
+_tess_local = threading.local()
+
+def _ocr_image(image: np.ndarray, timeout=OCR_TIMEOUT) -> str:
+    """
+    OCR one preprocessed image. Uses tesserocr's in-process API when it is
+    installed (no process spawn per scan), otherwise pytesseract.
+    """
+    try:
+        import tesserocr
+        from PIL import Image
+    except ImportError:
+        tesserocr = None
+
+    if tesserocr is not None:
+        api = getattr(_tess_local, "api", None)
+        if api is None:
+            api = _tess_local.api = tesserocr.PyTessBaseAPI()
+        api.SetImage(Image.fromarray(image))
+        if not api.Recognize(int(timeout * 1000)):
+            raise TimeoutError(f"OCR took longer than {timeout}s")
+        return api.GetUTF8Text()
+
+    configure_tesseract()
+    return pytesseract.image_to_string(image, timeout=timeout)
+
+
+def _init_ocr_worker():
+    configure_tesseract()
+
+
+def _ocr_in_worker(image: np.ndarray, timeout=OCR_TIMEOUT) -> str:
+    # Exceptions travel back pickled, and some (pytesseract's TesseractNotFoundError)
+    # can't be rebuilt in the parent, which breaks the whole pool. Send plain ones.
+    try:
+        return _ocr_image(image, timeout)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def _get_ocr_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None and OCR_WORKERS > 0:
+            # Persistent workers: Tesseract setup is paid once per process, not per scan.
+            # Spawned, not forked: the brain has threads, whose locks a fork would copy held
+            _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_ocr_worker)
+        return _ocr_pool
+
+
+def _discard_broken_pool(pool, error):
+    """Drop `pool` if `error` says it broke, so the next scan starts fresh workers."""
+    global _ocr_pool
+    if isinstance(error, BrokenProcessPool):
+        logging.error("OCR worker pool broke; recreating it.")
+        with _ocr_pool_lock:
+            if _ocr_pool is pool:
+                _ocr_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_ocr(image: np.ndarray, timeout=OCR_TIMEOUT) -> str:
+    """OCR on the worker pool (or inline when disabled), bounded by `timeout`."""
+    pool = _get_ocr_pool()
+    if pool is None:
+        with span("ocr.tesseract"):
+            return _ocr_image(image, timeout)
+    try:
+        with span("ocr.tesseract"):
+            return pool.submit(_ocr_in_worker, image, timeout).result(timeout=timeout)
+    except FutureTimeout:
+        raise TimeoutError(f"OCR took longer than {timeout}s")
+    except Exception as e:
+        _discard_broken_pool(pool, e)
+        raise
+
+
+def _ranked_frames(frames, blur_threshold, max_ocr):
+    """Prepare every frame and keep the sharpest `max_ocr` that pass the blur filter."""
+    scored = []
+    for index, frame in enumerate(frames):
+        try:
+            card = prepare(frame)
+        except Exception as e:
+            logging.warning(f"Burst frame {index} unreadable: {e}")
+            continue
+        score = sharpness(card)
+        if score >= blur_threshold:
+            scored.append((score, index, card))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[:max_ocr]
+
+
+def scan_burst(frames, blur_threshold=BLUR_THRESHOLD, max_ocr=BURST_MAX_OCR, timeout=OCR_TIMEOUT) -> dict:
+    """
+    Scan a short burst of frames of the same ID.
+
+    Blurry frames are dropped before OCR; the sharpest few are OCR'd in
+    parallel and OCR stops early once one frame parses confidently. Field
+    values are merged by voting across the frames that were read into
+    `record` (an IDRecord).
+    """
+    configure_tesseract()
+    with span("ocr.preprocess"):
+        ranked = _ranked_frames(frames, blur_threshold, max_ocr)
+    result = {"frames": len(frames), "sharp": len(ranked), "ocr": 0, "early_exit": False,
+              "text": "", "record": IDRecord()}
+    if not ranked:
+        return result
+
+    texts, parses = [], []
+
+    def accept(text):
+        text = " ".join(text.split())
+        fields = parse_fields(text)
+        result["ocr"] += 1
+        if text:
+            texts.append((len(fields), text))
+        parses.append(fields)
+        return is_confident(fields)
+
+    pool = _get_ocr_pool()
+    try:
+        with span("ocr.burst"):
+            if pool is None:
+                for _, _, card in ranked:
+                    if accept(_ocr_image(binarize(card), timeout)):
+                        result["early_exit"] = True
+                        break
+            else:
+                futures = [pool.submit(_ocr_in_worker, binarize(card), timeout) for _, _, card in ranked]
+                try:
+                    for future in as_completed(futures, timeout=timeout):
+                        if accept(future.result()):
+                            result["early_exit"] = True
+                            break
+                except FutureTimeout:
+                    logging.warning(f"Burst OCR timed out after {timeout}s")
+                finally:
+                    for future in futures:
+                        future.cancel()
+    except Exception as e:
+        logging.error(f"Burst OCR failed: {e}")
+        if pool is not None:
+            _discard_broken_pool(pool, e)
+
+    if texts:
+        # The frame that yielded the most fields is the best free-text fallback
+        result["text"] = max(texts)[1]
+    result["record"] = IDRecord(vote(parses))
+    return result
 
-if tesseract_cmd:
-    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-    print(f"Tesseract found and configured at: {tesseract_cmd}", file=sys.stderr)
-else:
-    print("WARNING: Tesseract not found. OCR will fail.", file=sys.stderr)
 
 def scan_id_card(base64_image: str) -> str:
     """
-    Decodes a base64 image, preprocesses it for high contrast,
+    Decodes a base64 image, crops and cleans it up for OCR,
     and runs OCR to extract text.
     """
+    configure_tesseract()
+
     try:
-        # 1. Decode Base64 to Image
-        if "," in base64_image:
-            base64_image = base64_image.split(",")[1]
-            
-        image_data = base64.b64decode(base64_image)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # 2. Convert to CV2 format for processing
-        img_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-
-        # 3. Pre-processing (Grayscale + Thresholding for sharp text)
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-        # Apply simple thresholding to make text black and background white
-        _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-
-        # 4. Run OCR
-        text = pytesseract.image_to_string(thresh)
-        
+        image = preprocess(base64_image)
+        text = run_ocr(image)
+
         clean_text = " ".join(text.split())
         return clean_text
 
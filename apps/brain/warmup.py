@@ -0,0 +1,52 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# Seconds spent initializing each component, filled in as they come up
+TIMINGS = {}
+_lock = threading.Lock()
+_thread = None
+
+
+@contextmanager
+def timed(component: str):
+    """Record how long initializing `component` took."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            TIMINGS[component] = round(elapsed, 3)
+        logging.info(f"{component} ready in {elapsed:.2f}s")
+
+
+def timings() -> dict:
+    with _lock:
+        return dict(TIMINGS)
+
+
+def start_background_warmup(steps):
+    """
+    Run `(name, callable)` steps one after another on a daemon thread.
+    Each component still initializes lazily on first use if warm-up has not
+    reached it yet; the lazy getters are lock-protected, so nothing loads twice.
+    """
+    global _thread
+
+    def run():
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                logging.error(f"Warm-up of {name} failed: {e}")
+        logging.info("Background warm-up finished.")
+
+    _thread = threading.Thread(target=run, name="brain-warmup", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def is_warm() -> bool:
+    return _thread is not None and not _thread.is_alive()
@@ -18,6 +18,13 @@ export async function POST(req: Request) {
             throw new Error(`Manager responded with ${res.status}`);
         }
 
+        // Streamed voice replies are passed through line by line, not buffered
+        if (res.headers.get('Content-Type')?.includes('application/x-ndjson') && res.body) {
+            return new Response(res.body, {
+                headers: { 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-cache' },
+            });
+        }
+
         const data = await res.json();
         return NextResponse.json(data);
     } catch (error) {
@@ -13,6 +13,35 @@ interface Message {
     isNew?: boolean;
 }
 
+// The brain keeps one conversation (and serializes turns) per session id, so every
+// kiosk tab needs its own; sessionStorage keeps it across reloads of the same tab
+const SESSION_KEY = "kiosk-session-id";
+
+const getSessionId = (): string => {
+    let id = sessionStorage.getItem(SESSION_KEY);
+    if (!id) {
+        id = crypto.randomUUID();
+        sessionStorage.setItem(SESSION_KEY, id);
+    }
+    return id;
+};
+
+// Streamed replies arrive as newline-delimited JSON; hands each message over as soon as its line is complete
+const readLines = async (res: Response, onMessage: (msg: any) => void) => {
+    const reader = res.body!.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() || "";
+        lines.forEach(line => line.trim() && onMessage(JSON.parse(line)));
+    }
+    if (buffer.trim()) onMessage(JSON.parse(buffer));
+};
+
 export default function HotelKiosk() {
     const [messages, setMessages] = useState<Message[]>([
         {
@@ -32,6 +61,9 @@ export default function HotelKiosk() {
 
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const audioRef = useRef<HTMLAudioElement | null>(null);
+    // Sentence clips of a streamed reply wait here and play back to back
+    const audioQueueRef = useRef<string[]>([]);
+    const playingRef = useRef(false);
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
 
     useEffect(() => {
@@ -45,23 +77,54 @@ export default function HotelKiosk() {
     };
 
     // --- CAMERA LOGIC ---
-    const captureAndSend = useCallback(() => {
-        const imageSrc = webcamRef.current?.getScreenshot();
-        if (imageSrc) {
+    // A short burst of frames: the brain drops blurry ones and votes across the rest
+    const BURST_FRAMES = 5;
+    const BURST_INTERVAL_MS = 120;
+
+    const captureAndSend = useCallback(async () => {
+        const frames: string[] = [];
+        for (let i = 0; i < BURST_FRAMES; i++) {
+            const imageSrc = webcamRef.current?.getScreenshot();
+            if (imageSrc) frames.push(imageSrc);
+            if (i < BURST_FRAMES - 1) await new Promise(r => setTimeout(r, BURST_INTERVAL_MS));
+        }
+        if (frames.length) {
             setShowCamera(false);
-            // Send image to backend
-            handleSend(imageSrc, false, true); // isAudio=false, isImage=true
+            // Send frames to backend
+            handleSend(JSON.stringify(frames), false, true); // isAudio=false, isImage=true
         }
     }, [webcamRef]);
 
     // --- AUDIO LOGIC (Existing) ---
-    const playAudio = (base64Audio: string) => {
-        if (audioRef.current) { audioRef.current.pause(); }
-        const audio = new Audio(`data:audio/mp3;base64,${base64Audio}`);
+    const playNext = () => {
+        const next = audioQueueRef.current.shift();
+        playingRef.current = next !== undefined;
+        if (next === undefined) {
+            setIsPlaying(false);
+            return;
+        }
+        const audio = new Audio(`data:audio/mp3;base64,${next}`);
         audioRef.current = audio;
         audio.onplay = () => setIsPlaying(true);
-        audio.onended = () => setIsPlaying(false);
-        audio.play().catch(e => console.error("Playback error:", e));
+        audio.onended = playNext;
+        audio.play().catch(e => { console.error("Playback error:", e); playNext(); });
+    };
+
+    const queueAudio = (base64Audio: string) => {
+        audioQueueRef.current.push(base64Audio);
+        if (!playingRef.current) playNext();
+    };
+
+    const stopAudio = () => {
+        audioQueueRef.current = [];
+        playingRef.current = false;
+        if (audioRef.current) { audioRef.current.pause(); }
+        setIsPlaying(false);
+    };
+
+    const playAudio = (base64Audio: string) => {
+        stopAudio();
+        queueAudio(base64Audio);
     };
 
     const startRecording = async () => {
@@ -110,8 +173,9 @@ export default function HotelKiosk() {
 
         try {
             let payload: any = { text: content };
-            if (isAudio) payload = { audio: content };
-            if (isImage) payload = { image: content, type: "PROCESS_IMAGE" }; // Special flag
+            if (isAudio) payload = { audio: content, stream: true };
+            if (isImage) payload = { frames: JSON.parse(content), type: "PROCESS_IMAGE_BURST" }; // Special flag
+            payload.sessionId = getSessionId();
 
             const res = await fetch('/api/chat', {
                 method: 'POST',
@@ -119,7 +183,21 @@ export default function HotelKiosk() {
                 body: JSON.stringify(payload)
             });
 
-            const data = await res.json();
+            let data: any = {};
+            if (res.headers.get("Content-Type")?.includes("application/x-ndjson")) {
+                // Each sentence plays as soon as it arrives; the last line is the final message
+                stopAudio();
+                await readLines(res, msg => {
+                    if (msg.type === 'TTS_AUDIO_CHUNK') {
+                        setIsThinking(false);
+                        if (msg.audio) queueAudio(msg.audio);
+                    } else {
+                        data = msg;
+                    }
+                });
+            } else {
+                data = await res.json();
+            }
 
             const aiMsg: Message = {
                 id: (Date.now() + 1).toString(),
@@ -1,4 +1,5 @@
-import { Controller, Post, Body } from '@nestjs/common';
+import { Controller, Post, Body, Res } from '@nestjs/common';
+import { Response } from 'express';
 import { BrainService } from './brain/brain.service';
 
 @Controller('api')
@@ -6,19 +7,53 @@ export class AppController {
     constructor(private readonly brainService: BrainService) { }
 
     @Post('chat')
-    async chat(@Body() body: { text?: string; message?: string; audio?: string; type?: string }) {
+    async chat(@Body() body: { text?: string; message?: string; audio?: string; image?: string; frames?: string[]; type?: string; sessionId?: string; propertyId?: string; stream?: boolean }, @Res() res: Response) {
         if (body.audio) {
             console.log('[API] Received Audio Chunk');
-            return this.brainService.sendPayload({
+            const payload = {
                 type: 'PROCESS_AUDIO',
                 audio: body.audio,
+                session_id: body.sessionId,
+                property: body.propertyId,
+                stream: body.stream,
                 timestamp: Date.now()
-            });
+            };
+            if (!body.stream) {
+                res.json(await this.brainService.sendPayload(payload));
+                return;
+            }
+            await this.streamAudio(payload, res);
+            return;
+        }
+
+        if (body.frames?.length || body.image) {
+            // A burst lets the brain skip blurry frames and stop at the first clean read
+            const burst = !!body.frames?.length;
+            console.log(`[API] Received ID scan${burst ? ` (${body.frames!.length} frames)` : ''}`);
+            res.json(await this.brainService.sendPayload(burst
+                ? { type: 'PROCESS_IMAGE_BURST', frames: body.frames, session_id: body.sessionId, property: body.propertyId, timestamp: Date.now() }
+                : { type: 'PROCESS_IMAGE', image: body.image, session_id: body.sessionId, property: body.propertyId, timestamp: Date.now() }));
+            return;
         }
 
         const input = body.message || body.text || '';
         console.log('[API] Received chat:', input);
-        const response = await this.brainService.processInput(input);
-        return response;
+        const response = await this.brainService.processInput(input, body.sessionId, body.propertyId);
+        res.json(response);
+    }
+
+    // Stream mode: newline-delimited JSON, one TTS_AUDIO_CHUNK line per sentence as
+    // soon as the brain has it, then the final message (TTS_AUDIO_END, ERROR, ...)
+    private async streamAudio(payload: any, res: Response) {
+        res.status(200);
+        res.setHeader('Content-Type', 'application/x-ndjson');
+        res.setHeader('Cache-Control', 'no-cache');
+        res.flushHeaders();
+        try {
+            const response = await this.brainService.sendPayload(payload, chunk => res.write(JSON.stringify(chunk) + '\n'));
+            res.end(JSON.stringify(response) + '\n');
+        } catch (e) {
+            res.end(JSON.stringify({ type: 'ERROR', text: String(e) }) + '\n');
+        }
     }
 }
@@ -1,11 +1,17 @@
 import { Injectable, OnModuleInit, OnModuleDestroy } from '@nestjs/common';
 import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import * as path from 'path';
+import { encodeFrame, FrameReader } from './framing';
+
+// 'binary': length-prefixed frames with raw media bytes (see framing.ts); 'json': newline-delimited JSON.
+// Always passed to the brain explicitly (its own default is json); the brain keeps its stdout for frames only.
+const BRAIN_TRANSPORT = process.env.BRAIN_TRANSPORT === 'json' ? 'json' : 'binary';
 
 @Injectable()
 export class BrainService implements OnModuleInit, OnModuleDestroy {
     private pythonProcess: ChildProcessWithoutNullStreams;
     private buffer = ''; // <--- NEW: Buffer to store incomplete data chunks
+    private frameReader = new FrameReader(msg => this.handleBrainMessage(msg));
 
     onModuleInit() {
         this.spawnBrain();
@@ -20,11 +26,18 @@ export class BrainService implements OnModuleInit, OnModuleDestroy {
     private spawnBrain() {
         const scriptPath = path.resolve(__dirname, '../../../brain/main.py');
         const venvPython = path.resolve(__dirname, '../../../../.venv/Scripts/python.exe'); // Ensure path is correct for your OS
-        console.log(`[BrainService] Spawning Python Brain using: ${venvPython}`);
+        console.log(`[BrainService] Spawning Python Brain using: ${venvPython} (transport: ${BRAIN_TRANSPORT})`);
 
-        this.pythonProcess = spawn(venvPython, [scriptPath]);
+        this.pythonProcess = spawn(venvPython, [scriptPath], {
+            env: { ...process.env, BRAIN_TRANSPORT },
+        });
+
+        this.pythonProcess.stdout.on('data', (data: Buffer) => {
+            if (BRAIN_TRANSPORT === 'binary') {
+                this.frameReader.push(data);
+                return;
+            }
 
-        this.pythonProcess.stdout.on('data', (data) => {
             // 1. Append new data to the buffer
             this.buffer += data.toString();
 
@@ -59,43 +72,60 @@ export class BrainService implements OnModuleInit, OnModuleDestroy {
 
         this.pythonProcess.on('close', (code) => {
             console.log(`[BrainService] Brain process exited with code ${code}`);
+            // Fail any callers still waiting so HTTP requests don't hang forever
+            this.pendingRequests.forEach(resolve => resolve({ type: 'ERROR', text: 'Brain process exited' }));
+            this.pendingRequests.clear();
+            this.chunkHandlers.clear();
         });
     }
 
-    // --- Message Handling (No Changes Needed Below) ---
+    // --- Message Handling ---
+    // Every request carries an id; the brain echoes it back so concurrent
+    // callers each get their own answer regardless of completion order.
     private pendingRequests = new Map<string, (response: any) => void>();
+    private chunkHandlers = new Map<string, (chunk: any) => void>();
+    private nextRequestId = 0;
 
-    async sendPayload(payload: any): Promise<any> {
+    // `onChunk` receives streamed TTS_AUDIO_CHUNK messages; the promise resolves with the final message.
+    async sendPayload(payload: any, onChunk?: (chunk: any) => void): Promise<any> {
         return new Promise((resolve, reject) => {
             if (!this.pythonProcess) {
                 return reject('Brain process not running');
             }
 
-            const handler = (msg: any) => {
-                if (msg.type === 'ASSISTANT_TEXT' || msg.type === 'TTS_AUDIO' || msg.type === 'ERROR') {
-                    resolve(msg);
-                    this.removeListener(handler);
-                }
-            };
-            this.addListener(handler);
+            const id = `req-${++this.nextRequestId}`;
+            this.pendingRequests.set(id, resolve);
+            if (onChunk) this.chunkHandlers.set(id, onChunk);
 
-            this.pythonProcess.stdin.write(JSON.stringify(payload) + '\n');
+            if (BRAIN_TRANSPORT === 'binary') {
+                // Media goes over the pipe as raw bytes instead of base64 inside JSON
+                encodeFrame({ ...payload, id }).forEach(part => this.pythonProcess.stdin.write(part));
+            } else {
+                this.pythonProcess.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+            }
         });
     }
 
-    async processInput(text: string): Promise<any> {
-        return this.sendPayload({ type: 'PROCESS_TEXT', text, timestamp: Date.now() });
+    async processInput(text: string, sessionId?: string, propertyId?: string): Promise<any> {
+        return this.sendPayload({ type: 'PROCESS_TEXT', text, session_id: sessionId, property: propertyId, timestamp: Date.now() });
     }
 
-    private listeners: ((msg: any) => void)[] = [];
-    private addListener(fn: (msg: any) => void) {
-        this.listeners.push(fn);
-    }
-    private removeListener(fn: (msg: any) => void) {
-        this.listeners = this.listeners.filter(l => l !== fn);
-    }
     private handleBrainMessage(msg: any) {
-        const listener = this.listeners.shift();
-        if (listener) listener(msg);
+        if (msg.type === 'READY') {
+            console.log(`[BrainService] Brain ready in ${msg.startup_seconds}s`);
+            return;
+        }
+        if (msg.type === 'TTS_AUDIO_CHUNK') {
+            this.chunkHandlers.get(msg.id)?.(msg);
+            return;
+        }
+        this.chunkHandlers.delete(msg.id);
+        const resolve = msg.id !== undefined ? this.pendingRequests.get(msg.id) : undefined;
+        if (resolve) {
+            this.pendingRequests.delete(msg.id);
+            resolve(msg);
+            return;
+        }
+        console.warn(`[BrainService] Unmatched brain message: ${msg.type}`);
     }
 }
\ No newline at end of file
@@ -0,0 +1,89 @@
+// Length-prefixed binary framing shared with apps/brain/framing.py:
+//
+//   u32 frame length | u32 header length | header JSON | blob 0 | blob 1 | ...
+//
+// (big-endian). The header is the message minus its blob fields, plus a
+// `_blobs` list of [field, index | null, length] for the raw bytes that follow.
+
+// Fields that carry base64 media in the JSON protocol
+export const BLOB_FIELDS = ['audio', 'image', 'frames'];
+
+const toBytes = (value: string): Buffer =>
+    // Webcam screenshots arrive as data: URLs
+    Buffer.from(value.startsWith('data:') ? value.slice(value.indexOf(',') + 1) : value, 'base64');
+
+// Returns the pieces to write in order, so large blobs are not copied into one buffer
+export function encodeFrame(message: any): Buffer[] {
+    const header: any = {};
+    const blobs: Buffer[] = [];
+    const specs: [string, number | null, number][] = [];
+
+    for (const [key, value] of Object.entries(message)) {
+        if (BLOB_FIELDS.includes(key) && typeof value === 'string') {
+            const bytes = toBytes(value);
+            specs.push([key, null, bytes.length]);
+            blobs.push(bytes);
+        } else if (BLOB_FIELDS.includes(key) && Array.isArray(value) && value.length && value.every(v => typeof v === 'string')) {
+            value.forEach((item: string, index: number) => {
+                const bytes = toBytes(item);
+                specs.push([key, index, bytes.length]);
+                blobs.push(bytes);
+            });
+        } else if (value !== undefined) {
+            header[key] = value;
+        }
+    }
+    if (specs.length) header._blobs = specs;
+
+    const encoded = Buffer.from(JSON.stringify(header), 'utf8');
+    const prefix = Buffer.alloc(8);
+    prefix.writeUInt32BE(4 + encoded.length + blobs.reduce((n, b) => n + b.length, 0), 0);
+    prefix.writeUInt32BE(encoded.length, 4);
+    return [prefix, encoded, ...blobs];
+}
+
+// Blob fields come back as base64 strings, which is what HTTP callers expect
+export function decodeFrame(frame: Buffer): any {
+    const headerLength = frame.readUInt32BE(0);
+    const message = JSON.parse(frame.toString('utf8', 4, 4 + headerLength));
+    let offset = 4 + headerLength;
+    for (const [key, index, length] of message._blobs || []) {
+        const blob = frame.toString('base64', offset, offset + length);
+        offset += length;
+        if (index === null) {
+            message[key] = blob;
+        } else {
+            (message[key] = message[key] || []).push(blob);
+        }
+    }
+    delete message._blobs;
+    return message;
+}
+
+// Reassembles frames from arbitrary stdout chunks; chunks are joined once per frame
+export class FrameReader {
+    private chunks: Buffer[] = [];
+    private buffered = 0;
+
+    constructor(private readonly onMessage: (message: any) => void) { }
+
+    push(data: Buffer) {
+        this.chunks.push(data);
+        this.buffered += data.length;
+
+        while (this.buffered >= 4) {
+            if (this.chunks[0].length < 4) {
+                this.chunks = [Buffer.concat(this.chunks, this.buffered)];
+            }
+            const size = this.chunks[0].readUInt32BE(0);
+            if (this.buffered < 4 + size) return;
+
+            const all = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks, this.buffered);
+            const frame = all.subarray(4, 4 + size);
+            const rest = all.subarray(4 + size);
+            this.chunks = rest.length ? [rest] : [];
+            this.buffered = rest.length;
+            this.onMessage(decodeFrame(frame));
+        }
+    }
+}